@@ -0,0 +1,8 @@
+'''
+apstra_tools
+    Tools that work with Juniper Apstra over its REST API, and the shared
+    library they're built on.  Each tool is a module with main( argv ),
+    run as a subcommand of apstra-tools (see cli.py).  Importing the
+    package is cheap: requests and NumPy are only loaded when a module
+    first needs them.
+'''
@@ -0,0 +1,10 @@
+'''
+__main__.py
+    python -m apstra_tools <command> ..., the same as apstra-tools.
+'''
+
+import sys
+
+from apstra_tools.cli import main
+
+sys.exit( main() )
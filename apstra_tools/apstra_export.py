@@ -0,0 +1,199 @@
+'''
+apstra_export.py
+    Export the rendered config context of every system in a blueprint, for
+    audits and offline analysis.  Contexts are fetched several at a time
+    and written as they arrive, one JSON line per system, to a gzipped
+    NDJSON file:
+        { "blueprint": ..., "system_id": ..., "context": { ... } }
+    Only a few contexts are held at once, however many systems there are.
+
+    The file is flushed every FLUSH_LINES lines, so everything up to the
+    last flush survives a crash.  --resume keeps the complete lines of an
+    earlier, interrupted export and fetches only the systems missing from
+    it.
+
+        apstra-tools export dc1 -o dc1.ndjson.gz
+        zcat dc1.ndjson.gz | jq .system_id
+'''
+
+import gzip
+import json
+import os
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from apstra_tools import apstra_utils as aosUtil
+
+EXPORT_WORKERS = 8
+# Contexts in flight (being fetched or waiting to be written) per worker
+EXPORT_WINDOW = 2
+FLUSH_LINES = 100
+PROGRESS_SECONDS = 5
+
+
+#
+# The complete lines of an export, as ( system ID, line ).  A line cut
+# short by a crash, and anything after it, is left out.
+#
+def read_export( path ):
+    try:
+        with gzip.open( path, 'rt' ) as f:
+            for line in f:
+                try:
+                    record = json.loads( line )
+
+                except ValueError:
+                    return
+
+                yield( record[ 'system_id' ], line if line.endswith( '\n' ) else line + '\n' )
+
+    except ( EOFError, OSError, zlib.error ):
+        return
+
+#
+# One system's context as an export line, or None if it has none (e.g. an
+# unmanaged generic system)
+#
+def context_line( token, url, bp_id, sys_id ):
+    try:
+        context = aosUtil.get_dev_context( token, url, bp_id, sys_id )
+
+    except aosUtil.NotFoundError:
+        return( None )
+
+    return( json.dumps( { 'blueprint': bp_id, 'system_id': sys_id, 'context': context },
+                        separators = ( ',', ':' ) ) + '\n' )
+
+#
+# Export every system's context in bp_id to path.  With resume, the
+# complete lines already in path are kept and those systems skipped.
+# Returns the stats: systems written, kept, without a context, bytes
+# before and after compression, and seconds.
+#
+def export_contexts( token, url, bp_id, path, workers = EXPORT_WORKERS, resume = False ):
+    stats = { 'written': 0, 'kept': 0, 'missing': 0, 'bytes': 0, 'compressed': 0, 'seconds': 0.0 }
+    partial = path + '.partial'
+    done = set()
+    start = time.monotonic()
+    last_report = start
+
+    # Salvage from the earlier export, moved aside first so a crash while
+    # copying it doesn't lose it
+    if resume and os.path.exists( path ) and not os.path.exists( partial ):
+        os.replace( path, partial )
+
+    with gzip.open( path, 'wt' ) as out:
+        def write( line ):
+            out.write( line )
+            stats[ 'bytes' ] += len( line.encode() )
+
+            if ( stats[ 'written' ] + stats[ 'kept' ] ) % FLUSH_LINES == 0:
+                out.flush()
+
+        if resume and os.path.exists( partial ):
+            for sys_id, line in read_export( partial ):
+                if sys_id not in done:
+                    done.add( sys_id )
+                    stats[ 'kept' ] += 1
+                    write( line )
+
+            out.flush()
+            os.remove( partial )
+            print( 'Kept ' + str( stats[ 'kept' ] ) + ' contexts from the earlier export.\n' )
+
+        with ThreadPoolExecutor( max_workers = workers ) as pool:
+            running = set()
+
+            def finish( futures ):
+                nonlocal last_report
+
+                for future in futures:
+                    line = future.result()
+
+                    if line is None:
+                        stats[ 'missing' ] += 1
+                        continue
+
+                    stats[ 'written' ] += 1
+                    write( line )
+
+                if time.monotonic() - last_report >= PROGRESS_SECONDS:
+                    last_report = time.monotonic()
+                    print( '  ' + str( stats[ 'written' ] ) + ' contexts, ' +
+                           f'{stats[ "written" ] / ( last_report - start ):.1f}' + '/s' )
+
+            for sys_id in aosUtil.iter_systems_in_bp( token, url, bp_id ):
+                if sys_id in done:
+                    continue
+
+                if len( running ) >= workers * EXPORT_WINDOW:
+                    finished, running = wait( running, return_when = FIRST_COMPLETED )
+                    finish( finished )
+
+                running.add( pool.submit( context_line, token, url, bp_id, sys_id ) )
+
+            finish( wait( running )[ 0 ] )
+
+    stats[ 'seconds' ] = round( time.monotonic() - start, 2 )
+    stats[ 'compressed' ] = os.path.getsize( path )
+
+    return( stats )
+
+#
+# One line on what an export did
+#
+def export_summary( stats ):
+    seconds = max( stats[ 'seconds' ], 0.001 )
+
+    return( 'Exported ' + str( stats[ 'written' ] ) + ' contexts in ' + f'{seconds:.1f}' + 's (' +
+            f'{stats[ "written" ] / seconds:.1f}' + '/s, ' + f'{stats[ "bytes" ] / 2**20 / seconds:.2f}' +
+            ' MiB/s), kept ' + str( stats[ 'kept' ] ) + ', ' + str( stats[ 'missing' ] ) +
+            ' systems without a context.  ' + f'{stats[ "bytes" ] / 2**20:.2f}' + ' MiB written as ' +
+            f'{stats[ "compressed" ] / 2**20:.2f}' + ' MiB.' )
+
+#
+# Export one blueprint from the command line.  Returns the exit status.
+#
+def main( argv = None ):
+    parser = aosUtil.build_arg_parser( 'Export the config context of every system in a blueprint to gzipped NDJSON.' )
+    parser.add_argument( 'blueprint', type=str, help='UUID or name of the blueprint' )
+    parser.add_argument( '-o', '--output', type=str,
+                         help='File to write (default <blueprint label>_contexts.ndjson.gz)' )
+    parser.add_argument( '-w', '--workers', type=int, default=EXPORT_WORKERS,
+                         help='Contexts to fetch at the same time (default ' + str( EXPORT_WORKERS ) + ')' )
+    parser.add_argument( '--rate', type=float,
+                         help='Config context requests per second (default ' +
+                              str( aosUtil.ENDPOINT_LIMITS[ 'config-context' ][ 'rate' ] ) + ')' )
+    parser.add_argument( '--resume', action='store_true',
+                         help='Keep what an interrupted export to the same file got, and fetch the rest' )
+    args = parser.parse_args( argv )
+
+    if args.rate:
+        aosUtil.configure_scheduler( { 'config-context': { 'rate': args.rate, 'burst': max( 1, int( args.rate ) ) } } )
+
+    try:
+        login_dict = aosUtil.complete_login_dict( aosUtil.login_dict_from_args( args ) )
+        base_url = aosUtil.build_base_url( login_dict )
+        token = aosUtil.login( base_url, login_dict[ 'user' ], login_dict[ 'password' ] )
+
+        bp = aosUtil.find_bp( token, base_url, args.blueprint )
+        if bp is None:
+            raise aosUtil.NotFoundError( 'No blueprint found with UUID or name ' + args.blueprint + '.' )
+
+        path = args.output or bp[ 'label' ] + '_contexts.ndjson.gz'
+        print( 'Exporting config contexts of ' + bp[ 'label' ] + ' to ' + path + '...\n' )
+        stats = export_contexts( token, base_url, bp[ 'id' ], path, args.workers, args.resume )
+        print( export_summary( stats ) + '\n' )
+
+        aosUtil.logout( token, base_url )
+
+    except aosUtil.ApstraError as e:
+        print( 'Error.  ' + str( e ) + '  Quitting.\n' )
+        return( 1 )
+
+    return( 0 )
+
+
+if __name__ == '__main__':
+    quit( main() )
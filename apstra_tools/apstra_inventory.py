@@ -0,0 +1,391 @@
+'''
+apstra_inventory.py
+    A local SQLite copy of the blueprint entities the tools ask about:
+    systems (role, ASN, loopback), virtual networks, security zones, tags
+    and property sets, for one blueprint or hundreds.  Questions like
+    "which VNs are tagged peer_to_fw" or "who has ASN 65101" across every
+    blueprint are then indexed queries instead of API sweeps.
+
+    sync() is incremental.  One blueprint list call gives every
+    blueprint's version, and only blueprints whose version changed since
+    they were stored are fetched again.  Each one is fetched in a few
+    requests (VN and property set pages, the zone list, four graph
+    queries), several blueprints at a time, and replaced in one
+    transaction, so readers never see half a blueprint.
+
+    The generators read their inputs from it with --inventory FILE.
+
+        apstra-tools inventory sync -t 10.0.0.1 -u admin
+        apstra-tools inventory tag 'border*'
+        apstra-tools inventory asn 65101
+'''
+
+import argparse as ap
+import json
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from apstra_tools import apstra_utils as aosUtil
+from apstra_tools.apstra_models import PropertySet, System, VirtualNetwork, sz_index_from_api
+
+# Bump when the tables change.  An inventory from another version is
+# dropped and filled again on the next sync; it's only a cache.
+INVENTORY_SCHEMA = 1
+# Blueprints fetched at the same time during a sync
+SYNC_WORKERS = 4
+# Only reference designs have VNs and security zones
+REFERENCE_DESIGNS = ( 'two_stage_l3clos', )
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS blueprints (
+    id TEXT PRIMARY KEY, label TEXT, design TEXT, version INTEGER, synced REAL );
+CREATE TABLE IF NOT EXISTS systems (
+    bp_id TEXT, id TEXT, label TEXT, role TEXT, asn TEXT, loopback TEXT,
+    PRIMARY KEY ( bp_id, id ) );
+CREATE TABLE IF NOT EXISTS virtual_networks (
+    bp_id TEXT, id TEXT, label TEXT, security_zone_id TEXT, reserved_vlan_id INTEGER,
+    ipv4_subnet TEXT, svi_ips TEXT, floating_ips TEXT,
+    PRIMARY KEY ( bp_id, id ) );
+CREATE TABLE IF NOT EXISTS security_zones (
+    bp_id TEXT, id TEXT, label TEXT, vrf_name TEXT, sz_type TEXT, vni_id INTEGER,
+    import_rts TEXT, export_rts TEXT,
+    PRIMARY KEY ( bp_id, id ) );
+CREATE TABLE IF NOT EXISTS tags (
+    bp_id TEXT, kind TEXT, id TEXT, tag TEXT,
+    PRIMARY KEY ( bp_id, kind, id, tag ) );
+CREATE TABLE IF NOT EXISTS property_sets (
+    bp_id TEXT, id TEXT, label TEXT, vals TEXT,
+    PRIMARY KEY ( bp_id, id ) );
+CREATE INDEX IF NOT EXISTS blueprints_by_label ON blueprints ( label );
+CREATE INDEX IF NOT EXISTS systems_by_asn ON systems ( asn );
+CREATE INDEX IF NOT EXISTS systems_by_label ON systems ( label );
+CREATE INDEX IF NOT EXISTS vns_by_zone ON virtual_networks ( bp_id, security_zone_id );
+CREATE INDEX IF NOT EXISTS tags_by_tag ON tags ( tag, kind );
+CREATE INDEX IF NOT EXISTS property_sets_by_label ON property_sets ( label );
+'''
+
+TABLES = ( 'blueprints', 'systems', 'virtual_networks', 'security_zones', 'tags', 'property_sets' )
+
+
+class Inventory:
+    #
+    # Open (or create) the inventory at path.  Open one per thread.
+    def __init__( self, path ):
+        self.path = path
+        self.db = sqlite3.connect( path )
+        self.db.execute( 'PRAGMA journal_mode = WAL' )
+        self.db.execute( 'PRAGMA synchronous = NORMAL' )
+
+        if self.db.execute( 'PRAGMA user_version' ).fetchone()[ 0 ] != INVENTORY_SCHEMA:
+            with self.db:
+                for table in TABLES:
+                    self.db.execute( 'DROP TABLE IF EXISTS ' + table )
+
+                self.db.executescript( SCHEMA )
+                self.db.execute( 'PRAGMA user_version = ' + str( INVENTORY_SCHEMA ) )
+
+    def __enter__( self ):
+        return( self )
+
+    def __exit__( self, *exc ):
+        self.close()
+
+    def close( self ):
+        self.db.close()
+
+    #
+    # { bp_id: version } of what's stored
+    def versions( self ):
+        return( dict( self.db.execute( 'SELECT id, version FROM blueprints' ) ) )
+
+    #
+    # Replace everything stored for a blueprint with what fetch_blueprint()
+    # got, in one transaction
+    def store( self, fetched ):
+        bp = fetched[ 'blueprint' ]
+        bp_id = bp[ 'id' ]
+
+        with self.db:
+            self.forget( bp_id, commit = False )
+            self.db.execute( 'INSERT INTO blueprints VALUES ( ?, ?, ?, ?, ? )',
+                             ( bp_id, bp[ 'label' ], bp[ 'design' ], bp[ 'version' ], time.time() ) )
+            self.db.executemany( 'INSERT INTO systems VALUES ( ?, ?, ?, ?, ?, ? )',
+                                 [ ( bp_id, system.node_id, system.label, system.role, system.asn, system.loopback )
+                                   for system in fetched[ 'systems' ] ] )
+            self.db.executemany( 'INSERT INTO virtual_networks VALUES ( ?, ?, ?, ?, ?, ?, ?, ? )',
+                                 [ ( bp_id, vn.id, vn.label, vn.security_zone_id, vn.reserved_vlan_id,
+                                     vn.ipv4_subnet,
+                                     json.dumps( [ [ svi.system_id, svi.ipv4_addr ] for svi in vn.svi_ips ] ),
+                                     json.dumps( [ [ fip.ipv4_addr, fip.generic_system_ids ]
+                                                   for fip in vn.floating_ips ] ) )
+                                   for vn in fetched[ 'vns' ] ] )
+            self.db.executemany( 'INSERT INTO security_zones VALUES ( ?, ?, ?, ?, ?, ?, ?, ? )',
+                                 [ ( bp_id, sz.id, sz.label, sz.vrf_name, sz.sz_type, sz.vni_id,
+                                     json.dumps( sz.import_rts ), json.dumps( sz.export_rts ) )
+                                   for sz in fetched[ 'zones' ].values() ] )
+            self.db.executemany( 'INSERT OR IGNORE INTO tags VALUES ( ?, ?, ?, ? )',
+                                 [ ( bp_id, 'system', system.node_id, tag )
+                                   for system in fetched[ 'systems' ] for tag in system.tags ] +
+                                 [ ( bp_id, 'vn', vn.id, tag ) for vn in fetched[ 'vns' ] for tag in vn.tags ] )
+            self.db.executemany( 'INSERT INTO property_sets VALUES ( ?, ?, ?, ? )',
+                                 [ ( bp_id, ps.id, ps.label, json.dumps( ps.values ) )
+                                   for ps in fetched[ 'prop_sets' ] ] )
+
+    #
+    # Drop a blueprint from the inventory
+    def forget( self, bp_id, commit = True ):
+        for table in TABLES:
+            self.db.execute( 'DELETE FROM ' + table + ' WHERE ' + ( 'id' if table == 'blueprints' else 'bp_id' ) +
+                             ' = ?', ( bp_id, ) )
+
+        if commit:
+            self.db.commit()
+
+    #
+    # The VN's in a blueprint, as models, optionally only those carrying tag
+    def virtual_networks( self, bp_id, tag = None ):
+        query = 'SELECT id, label, security_zone_id, reserved_vlan_id, ipv4_subnet, svi_ips, floating_ips ' \
+                'FROM virtual_networks WHERE bp_id = ?'
+        params = [ bp_id ]
+
+        if tag is not None:
+            query += ' AND id IN ( SELECT id FROM tags WHERE tag = ? AND kind = \'vn\' AND bp_id = ? )'
+            params += [ tag, bp_id ]
+
+        tags = self.tags_of( bp_id, 'vn' )
+
+        # rowid order is the order the controller listed them in
+        for vn_id, label, sz_id, vlan_id, subnet, svi_ips, floating_ips in self.db.execute( query + ' ORDER BY rowid',
+                                                                                            params ):
+            yield( VirtualNetwork.from_api( {
+                'id': vn_id, 'label': label, 'security_zone_id': sz_id, 'reserved_vlan_id': vlan_id,
+                'ipv4_subnet': subnet, 'tags': tags.get( vn_id, [ ] ),
+                'svi_ips': [ { 'system_id': system_id, 'ipv4_addr': addr }
+                             for system_id, addr in json.loads( svi_ips ) ],
+                'floating_ips': [ { 'ipv4_addr': addr, 'generic_system_ids': system_ids }
+                                  for addr, system_ids in json.loads( floating_ips ) ] } ) )
+
+    #
+    # All security zones in a blueprint, keyed by ID, like sz_index_from_api
+    def sz_index( self, bp_id ):
+        rows = self.db.execute( 'SELECT id, label, vrf_name, sz_type, vni_id, import_rts, export_rts '
+                                'FROM security_zones WHERE bp_id = ? ORDER BY rowid', ( bp_id, ) )
+
+        return( sz_index_from_api( { 'items': {
+            sz_id: { 'label': label, 'vrf_name': vrf_name, 'sz_type': sz_type, 'vni_id': vni_id,
+                     'rt_policy': { 'import_RTs': json.loads( import_rts ), 'export_RTs': json.loads( export_rts ) } }
+            for sz_id, label, vrf_name, sz_type, vni_id, import_rts, export_rts in rows } } ) )
+
+    #
+    # Systems in a blueprint with a tag matching pattern (fnmatch style),
+    # optionally of one role.  Each system's role becomes its first
+    # matching tag, and they're sorted by it, the way the collectors do.
+    def systems_tagged( self, bp_id, pattern, role = None ):
+        query = 'SELECT s.id, s.label, s.asn, s.loopback, MIN( t.tag ) FROM systems s ' \
+                'JOIN tags t ON t.bp_id = s.bp_id AND t.kind = \'system\' AND t.id = s.id ' \
+                'WHERE s.bp_id = ? AND t.tag GLOB ?'
+        params = [ bp_id, pattern ]
+
+        if role is not None:
+            query += ' AND s.role = ?'
+            params.append( role )
+
+        systems = [ System( node_id = sys_id, label = label, tags = ( tag, ), asn = asn, role = tag,
+                            loopback = loopback )
+                    for sys_id, label, asn, loopback, tag in self.db.execute( query + ' GROUP BY s.id', params ) ]
+
+        return( sorted( systems, key = lambda system: system.role ) )
+
+    #
+    # { id: [ tags ] } for one kind of object in a blueprint
+    def tags_of( self, bp_id, kind ):
+        tags = { }
+
+        for obj_id, tag in self.db.execute( 'SELECT id, tag FROM tags WHERE bp_id = ? AND kind = ? ORDER BY tag',
+                                            ( bp_id, kind ) ):
+            tags.setdefault( obj_id, [ ] ).append( tag )
+
+        return( tags )
+
+    #
+    # ( blueprint label, kind, id, label, tag ) of everything, in every
+    # blueprint, with a tag matching pattern
+    def find_tagged( self, pattern ):
+        return( self.db.execute(
+            'SELECT b.label, t.kind, t.id, COALESCE( s.label, v.label, \'\' ), t.tag FROM tags t '
+            'JOIN blueprints b ON b.id = t.bp_id '
+            'LEFT JOIN systems s ON t.kind = \'system\' AND s.bp_id = t.bp_id AND s.id = t.id '
+            'LEFT JOIN virtual_networks v ON t.kind = \'vn\' AND v.bp_id = t.bp_id AND v.id = t.id '
+            'WHERE t.tag GLOB ? ORDER BY b.label, t.kind, t.tag', ( pattern, ) ).fetchall() )
+
+    #
+    # ( blueprint label, system id, label, role, asn ) of every system,
+    # or only those with one ASN
+    def find_asn( self, asn = None ):
+        query = 'SELECT b.label, s.id, s.label, s.role, s.asn FROM systems s JOIN blueprints b ON b.id = s.bp_id ' \
+                'WHERE s.asn != \'\''
+        params = [ ]
+
+        if asn is not None:
+            query += ' AND s.asn = ?'
+            params.append( asn )
+
+        return( self.db.execute( query + ' ORDER BY b.label, s.asn, s.label', params ).fetchall() )
+
+#
+# Every system in a blueprint with its role, tags, ASN and default
+# loopback, from four graph queries.  The results are cached against
+# version, like any run_query().
+#
+def fetch_systems( token, url, bp_id, version ):
+    systems = { }
+    sys_node = aosUtil.qe_node( 'system', name = 'sys' )
+
+    def query( *steps ):
+        return( aosUtil.run_query( token, url, bp_id, aosUtil.graph_query( *steps ), version ) )
+
+    for item in query( sys_node ):
+        systems[ item[ 'sys' ][ 'id' ] ] = System( node_id = item[ 'sys' ][ 'id' ],
+                                                   label = item[ 'sys' ].get( 'label' ) or '',
+                                                   role = item[ 'sys' ].get( 'role' ) or '' )
+
+    for item in query( aosUtil.qe_node( 'tag', name = 'tag' ), aosUtil.qe_out( 'tag' ), sys_node ):
+        if item[ 'sys' ][ 'id' ] in systems:
+            system = systems[ item[ 'sys' ][ 'id' ] ]
+            system.tags = tuple( sorted( set( system.tags ) | { item[ 'tag' ][ 'label' ] } ) )
+
+    for item in query( sys_node, aosUtil.qe_in(), aosUtil.qe_node( 'domain', name = 'bgp' ) ):
+        if item[ 'sys' ][ 'id' ] in systems:
+            systems[ item[ 'sys' ][ 'id' ] ].asn = str( item[ 'bgp' ][ 'domain_id' ] )
+
+    for item in query( sys_node, aosUtil.qe_out( 'hosted_interfaces' ),
+                       aosUtil.qe_node( 'interface', name = 'lo', if_type = 'loopback', loopback_id = 0 ) ):
+        if item[ 'sys' ][ 'id' ] in systems:
+            systems[ item[ 'sys' ][ 'id' ] ].loopback = item[ 'lo' ].get( 'ipv4_addr' ) or ''
+
+    return( list( systems.values() ) )
+
+#
+# Everything the inventory keeps about one blueprint, as models
+#
+def fetch_blueprint( token, url, bp ):
+    fetched = { 'blueprint': bp, 'vns': [ ], 'zones': { },
+                'systems': fetch_systems( token, url, bp[ 'id' ], bp[ 'version' ] ),
+                'prop_sets': [ PropertySet.from_api( ps ) for ps in aosUtil.iter_ps_list( token, url, bp[ 'id' ] ) ] }
+
+    if bp[ 'design' ] in REFERENCE_DESIGNS:
+        fetched[ 'vns' ] = [ VirtualNetwork.from_api( vn_data, vn_id )
+                             for vn_id, vn_data in aosUtil.iter_vn_list( token, url, bp[ 'id' ] ) ]
+        fetched[ 'zones' ] = sz_index_from_api( aosUtil.get_sz_list( token, url, bp[ 'id' ] ) )
+
+    return( fetched )
+
+#
+# Bring the inventory at path up to date with the blueprints given (UUIDs
+# or labels), or with every blueprint on the controller.  Only blueprints
+# whose version changed are fetched.  When syncing everything, blueprints
+# that are gone are dropped.  Returns { 'fetched': [ ids ], 'current':
+# [ ids ], 'dropped': [ ids ] }.
+#
+def sync( token, url, path, blueprints = None, workers = SYNC_WORKERS ):
+    bp_index = aosUtil.get_bp_index( token, url, refresh = True )
+    summary = { 'fetched': [ ], 'current': [ ], 'dropped': [ ] }
+
+    if blueprints is None:
+        wanted = list( bp_index[ 'by_id' ].values() )
+
+    else:
+        wanted = [ ]
+        for name in blueprints:
+            bp = aosUtil.find_bp( token, url, name )
+
+            if bp is None:
+                raise aosUtil.NotFoundError( 'No blueprint found with UUID or name ' + name + '.' )
+
+            wanted.append( bp )
+
+    with Inventory( path ) as inventory:
+        stored = inventory.versions()
+        stale = [ bp for bp in wanted if stored.get( bp[ 'id' ] ) != bp[ 'version' ] ]
+        summary[ 'current' ] = [ bp[ 'id' ] for bp in wanted if bp not in stale ]
+
+        # Fetch in parallel, store one at a time as they come in
+        with ThreadPoolExecutor( max_workers = workers ) as pool:
+            futures = [ pool.submit( fetch_blueprint, token, url, bp ) for bp in stale ]
+
+            for future in as_completed( futures ):
+                fetched = future.result()
+                inventory.store( fetched )
+                summary[ 'fetched' ].append( fetched[ 'blueprint' ][ 'id' ] )
+
+        if blueprints is None:
+            for bp_id in stored:
+                if bp_id not in bp_index[ 'by_id' ]:
+                    inventory.forget( bp_id )
+                    summary[ 'dropped' ].append( bp_id )
+
+    return( summary )
+
+#
+# Sync, or answer a question from what's stored.  Returns the exit status.
+#
+def main( argv = None ):
+    parser = ap.ArgumentParser( description = 'Keep a local SQLite inventory of blueprint entities.' )
+    parser.add_argument( '-i', '--inventory', type=str, default='apstra_inventory.db',
+                         help='Inventory file (default apstra_inventory.db)' )
+    actions = parser.add_subparsers( dest = 'action', required = True )
+
+    sync_parser = actions.add_parser( 'sync', help='Fetch the blueprints that changed since the last sync' )
+    aosUtil.add_login_args( sync_parser )
+    sync_parser.add_argument( 'blueprints', nargs='*', help='Blueprint UUIDs or labels (default: all of them)' )
+    sync_parser.add_argument( '-w', '--workers', type=int, default=SYNC_WORKERS,
+                              help='Blueprints to fetch at the same time (default ' + str( SYNC_WORKERS ) + ')' )
+
+    tag_parser = actions.add_parser( 'tag', help='Systems and VNs with a tag matching a pattern' )
+    tag_parser.add_argument( 'pattern', type=str, help='Tag or pattern, e.g. \'border*\'' )
+
+    asn_parser = actions.add_parser( 'asn', help='Systems with an ASN (default: every ASN)' )
+    asn_parser.add_argument( 'asn', type=str, nargs='?', help='ASN to look for' )
+    args = parser.parse_args( argv )
+
+    if args.action == 'tag':
+        with Inventory( args.inventory ) as inventory:
+            rows = inventory.find_tagged( args.pattern )
+
+        for bp_label, kind, obj_id, label, tag in rows:
+            print( f'{bp_label:<24}{kind:<8}{tag:<20}{label:<24}' + obj_id )
+
+        return( 0 if rows else 1 )
+
+    if args.action == 'asn':
+        with Inventory( args.inventory ) as inventory:
+            rows = inventory.find_asn( args.asn )
+
+        for bp_label, sys_id, label, role, asn in rows:
+            print( f'{bp_label:<24}{asn:<12}{role:<10}{label:<24}' + sys_id )
+
+        return( 0 if rows else 1 )
+
+    try:
+        login_dict = aosUtil.complete_login_dict( aosUtil.login_dict_from_args( args ) )
+        base_url = aosUtil.build_base_url( login_dict )
+        token = aosUtil.login( base_url, login_dict[ 'user' ], login_dict[ 'password' ] )
+
+        start = time.monotonic()
+        summary = sync( token, base_url, args.inventory, args.blueprints or None, args.workers )
+        print( 'Fetched ' + str( len( summary[ 'fetched' ] ) ) + ' blueprints, ' + str( len( summary[ 'current' ] ) ) +
+               ' already current, dropped ' + str( len( summary[ 'dropped' ] ) ) + ', in ' +
+               f'{time.monotonic() - start:.1f}' + 's.\n' )
+
+        aosUtil.logout( token, base_url )
+
+    except aosUtil.ApstraError as e:
+        print( 'Error.  ' + str( e ) + '  Quitting.\n' )
+        return( 1 )
+
+    return( 0 )
+
+
+if __name__ == '__main__':
+    quit( main() )
@@ -0,0 +1,106 @@
+'''
+apstra_job.py
+    Thin client for the resident worker in apstra_service.py.  Sends one
+    job and prints the result.  It only uses the standard library and never
+    logs in itself, so each job costs a local round trip plus whatever the
+    warm service has to do on the controller.
+
+    Start the service first:
+        apstra-tools service -u admin -t 10.0.0.1 -P 443
+    then, for example:
+        apstra-tools job generate -s dc1 -d srx
+        apstra-tools job commit-check srx
+        apstra-tools job set-timers dc1 --timers bgp=33,route=33
+        apstra-tools job status
+'''
+
+import argparse as ap
+import getpass
+import json
+import urllib.error
+import urllib.request
+
+SERVICE_URL = 'http://127.0.0.1:8765'
+SERVICE_TIMERS = 'bgp=33,route=33,interface=10,lldp=10'
+
+
+#
+# POST a job (or GET the status) and return the decoded reply
+#
+def send( service_url, kind, job = None ):
+    if kind == 'status':
+        request = urllib.request.Request( service_url + '/status' )
+
+    else:
+        request = urllib.request.Request( service_url + '/jobs/' + kind, data = json.dumps( job ).encode(),
+                                          headers = { 'Content-Type': 'application/json' } )
+
+    try:
+        with urllib.request.urlopen( request ) as r:
+            return( json.loads( r.read() ) )
+
+    except urllib.error.HTTPError as e:
+        return( json.loads( e.read() or b'{}' ) )
+
+#
+# Parse the job off the command line, send it and print the reply.
+# Returns the exit status.
+#
+def main( argv = None ):
+    parser = ap.ArgumentParser( description = 'Send a job to the resident Apstra worker.' )
+    parser.add_argument( '--service', type=str, default=SERVICE_URL,
+                         help='Where the worker is listening (default ' + SERVICE_URL + ')' )
+    parser.add_argument( '-u', '--user', type=str, help='Apstra username, to use a controller other than the default' )
+    parser.add_argument( '-p', '--password', type=str, help='Apstra password' )
+    parser.add_argument( '-t', '--target', type=str, help='IP/hostname of Apstra instance' )
+    parser.add_argument( '-P', '--port', type=str, default='443', help='TCP port of Apstra instance (default 443)' )
+    jobs = parser.add_subparsers( dest = 'job', required = True )
+
+    generate = jobs.add_parser( 'generate', help='Generate and publish property sets' )
+    generate.add_argument( '-s', '--src', type=str, required=True, help='UUID or name of source (reference) blueprint' )
+    generate.add_argument( '-d', '--dst', type=str, required=True, help='UUID or name of SRX (freeform) blueprint' )
+    generate.add_argument( '-o', '--outputs', type=str, default='vrf', help='Comma-separated property sets (default vrf)' )
+    generate.add_argument( '--no-publish', action='store_true', help='Build but don\'t publish' )
+
+    commit_check = jobs.add_parser( 'commit-check', help='Commit-check a blueprint' )
+    commit_check.add_argument( 'bp', type=str, help='UUID or name of the blueprint' )
+
+    set_timers = jobs.add_parser( 'set-timers', help='Set service timers on every system in a blueprint' )
+    set_timers.add_argument( 'bp', type=str, help='UUID or name of the blueprint' )
+    set_timers.add_argument( '--timers', type=str, default=SERVICE_TIMERS,
+                             help='service=seconds,... (default ' + SERVICE_TIMERS + ')' )
+
+    jobs.add_parser( 'status', help='Show what the worker has warm' )
+    args = parser.parse_args( argv )
+
+    if args.job == 'generate':
+        job = { 'src': args.src, 'dst': args.dst, 'outputs': args.outputs.split( ',' ),
+                'publish': not args.no_publish }
+
+    elif args.job == 'set-timers':
+        job = { 'bp': args.bp,
+                'timers': { name: int( secs ) for name, secs in
+                            ( timer.split( '=' ) for timer in args.timers.split( ',' ) ) } }
+
+    else:
+        job = { 'bp': getattr( args, 'bp', '' ) }
+
+    if args.target:
+        job[ 'login' ] = { 'user': args.user or input( 'API username: ' ),
+                           'password': args.password or getpass.getpass( 'Password: ' ),
+                           'target': args.target, 'port': args.port }
+
+    try:
+        reply = send( args.service, args.job.replace( '-', '_' ), job )
+
+    except urllib.error.URLError as e:
+        print( 'Error.  No worker at ' + args.service + ' (' + str( e.reason ) + ').  Quitting.\n' )
+        return( 1 )
+
+    print( json.dumps( reply, indent = 2 ) )
+
+    return( 0 if reply.get( 'ok' ) else 1 )
+
+
+if __name__ == '__main__':
+    quit( main() )
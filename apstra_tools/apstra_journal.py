@@ -0,0 +1,104 @@
+'''
+apstra_journal.py
+    Checkpoints for long batch jobs.  A journal is an append-only file with
+    one JSON line per finished unit of work (a timer on a system, a deployed
+    blueprint, a property set write), along with a fingerprint of the
+    inputs it was done with.  When a sweep dies partway through, rerunning
+    it with --resume skips every unit the journal says is done with the
+    same inputs, so only the rest is redone.
+
+    Lines are flushed to disk as each unit finishes.  A line cut short by
+    a crash is ignored when the journal is read back.
+'''
+
+import json
+import os
+import threading
+import time
+
+
+class Journal:
+    #
+    # Open the journal at path.  With resume, the units already in it
+    # count as done; without, it's started afresh.
+    def __init__( self, path, resume = False ):
+        self.path = path
+        self.done_units = { }
+        self.skipped = 0
+        self.lock = threading.Lock()
+
+        if resume:
+            self.done_units = read_journal( path )
+
+        self.file = open( path, 'a' if resume else 'w' )
+
+    #
+    # Has unit already been done with inputs matching fingerprint?
+    def done( self, unit, fingerprint ):
+        with self.lock:
+            if self.done_units.get( unit ) == fingerprint:
+                self.skipped += 1
+                return( True )
+
+        return( False )
+
+    #
+    # Note that unit is done.  Safe to call from several threads.
+    def record( self, unit, fingerprint ):
+        line = json.dumps( { 'unit': unit, 'fingerprint': fingerprint, 'time': round( time.time(), 3 ) } )
+
+        with self.lock:
+            self.file.write( line + '\n' )
+            self.file.flush()
+            os.fsync( self.file.fileno() )
+            self.done_units[ unit ] = fingerprint
+
+    def close( self ):
+        self.file.close()
+
+        if self.skipped:
+            print( 'Skipped ' + str( self.skipped ) + ' units already done according to ' + self.path + '.\n' )
+
+#
+# { unit: fingerprint } for every complete line in a journal.  A missing
+# journal is just an empty one.
+#
+def read_journal( path ):
+    done_units = { }
+
+    try:
+        with open( path ) as f:
+            for line in f:
+                try:
+                    entry = json.loads( line )
+
+                except ValueError:
+                    continue
+
+                done_units[ entry[ 'unit' ] ] = entry[ 'fingerprint' ]
+
+    except FileNotFoundError:
+        pass
+
+    return( done_units )
+
+#
+# Add --journal and --resume to a tool's argument parser
+#
+def add_journal_args( parser ):
+    parser.add_argument( '--journal', type=str, metavar='FILE',
+                         help='Record each finished unit of work in FILE, so a failed run can be resumed' )
+    parser.add_argument( '--resume', action='store_true',
+                         help='Skip the units the --journal file says are already done' )
+
+#
+# The journal the parsed arguments ask for, or None
+#
+def journal_from_args( parser, args ):
+    if args.resume and not args.journal:
+        parser.error( '--resume needs --journal' )
+
+    if not args.journal:
+        return( None )
+
+    return( Journal( args.journal, args.resume ) )
@@ -0,0 +1,201 @@
+'''
+apstra_memprofile.py
+    Where a run's memory goes, phase by phase.  A MemProfile traces
+    allocations with tracemalloc, and at the end of each phase (login,
+    collecting the VN list, building, publishing, ...) notes how much was
+    held when it started and ended, its peak, and the lines that allocated
+    the most during it.  The report prints as a table and saves as JSON,
+    and compare_reports() diffs two saved reports so a change that makes a
+    phase peak higher shows up before it reaches a big fabric.
+
+    tracemalloc counts every thread together, so the phases have to run
+    one at a time to be told apart.  The tools run their task graph with a
+    single worker when profiling, which is slower but attributes memory
+    properly.  Tracing itself costs time and memory too: compare profiled
+    runs with profiled runs, not with normal ones.
+
+        profile = MemProfile()
+        with profile.phase( 'collect' ):
+            ...
+        profile.print_report()
+        profile.save( 'mem.json' )
+'''
+
+import argparse as ap
+import json
+import os
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+
+# Allocation sites kept per phase in the report
+MEMPROFILE_TOP = 10
+# Phases that grow by less than this are never called a regression
+REGRESSION_MIN_BYTES = 1024 * 1024
+
+# Leave the profiler's own bookkeeping and the import machinery out
+_IGNORED = ( tracemalloc.Filter( False, tracemalloc.__file__ ),
+             tracemalloc.Filter( False, __file__ ),
+             tracemalloc.Filter( False, '<frozen importlib._bootstrap>' ),
+             tracemalloc.Filter( False, '<frozen importlib._bootstrap_external>' ),
+             tracemalloc.Filter( False, '<unknown>' ) )
+
+
+def mib( size ):
+    return( f'{size / 2**20:.1f}' )
+
+
+class MemProfile:
+    def __init__( self, top = MEMPROFILE_TOP ):
+        self.top = top
+        self.phases = [ ]
+        tracemalloc.start()
+        self.snapshot = self.take_snapshot()
+
+    def take_snapshot( self ):
+        return( tracemalloc.take_snapshot().filter_traces( _IGNORED ) )
+
+    #
+    # Count everything allocated in the with block as the phase name
+    @contextmanager
+    def phase( self, name ):
+        start_bytes = tracemalloc.get_traced_memory()[ 0 ]
+        tracemalloc.reset_peak()
+        start = time.monotonic()
+
+        try:
+            yield
+
+        finally:
+            seconds = time.monotonic() - start
+            end_bytes, peak_bytes = tracemalloc.get_traced_memory()
+            snapshot = self.take_snapshot()
+            sites = snapshot.compare_to( self.snapshot, 'lineno' )
+            self.snapshot = snapshot
+
+            self.phases.append( {
+                'phase': name, 'seconds': round( seconds, 3 ),
+                'start_bytes': start_bytes, 'end_bytes': end_bytes, 'peak_bytes': peak_bytes,
+                'top': [ { 'site': site_name( stat.traceback[ 0 ] ), 'size_diff': stat.size_diff,
+                           'count_diff': stat.count_diff, 'size': stat.size }
+                         for stat in sites[ :self.top ] ] } )
+
+    #
+    # The same task graph with every task run as a phase of its own
+    def wrap_tasks( self, tasks ):
+        def wrap( name, fn ):
+            def run( *args ):
+                with self.phase( name ):
+                    return( fn( *args ) )
+
+            return( run )
+
+        return( { name: ( wrap( name, fn ), inputs ) for name, ( fn, inputs ) in tasks.items() } )
+
+    def report( self ):
+        return( { 'argv': sys.argv, 'python': sys.version.split()[ 0 ], 'time': round( time.time(), 3 ),
+                  'peak_bytes': max( ( phase[ 'peak_bytes' ] for phase in self.phases ), default = 0 ),
+                  'phases': self.phases } )
+
+    def print_report( self, sites = 3 ):
+        print( '\nMemory by phase (MiB), with the sites that grew most\n' )
+        print( f'{"Phase":<24}{"Seconds":>9}{"Start":>9}{"Peak":>9}{"End":>9}' )
+        print( f'{"-----":<24}{"-------":>9}{"-----":>9}{"----":>9}{"---":>9}' )
+
+        for phase in self.phases:
+            print( f'{phase[ "phase" ]:<24}{phase[ "seconds" ]:>9.2f}{mib( phase[ "start_bytes" ] ):>9}' +
+                   f'{mib( phase[ "peak_bytes" ] ):>9}{mib( phase[ "end_bytes" ] ):>9}' )
+
+            for site in phase[ 'top' ][ :sites ]:
+                if site[ 'size_diff' ] > 0:
+                    print( f'{"+" + str( site[ "size_diff" ] // 1024 ):>10} KiB  ' + site[ 'site' ] )
+
+        print()
+
+    def save( self, path ):
+        with open( path, 'w' ) as f:
+            json.dump( self.report(), f, indent = 2 )
+
+    def stop( self ):
+        tracemalloc.stop()
+
+#
+# profile.phase( name ), or nothing when we aren't profiling
+#
+def profile_phase( profile, name ):
+    return( profile.phase( name ) if profile else nullcontext() )
+
+#
+# 'file:line' for a traceback frame, relative to where we're running from
+#
+def site_name( frame ):
+    filename = frame.filename
+    if filename.startswith( os.getcwd() + os.sep ):
+        filename = os.path.relpath( filename )
+
+    return( filename + ':' + str( frame.lineno ) )
+
+#
+# Phases whose peak rose (over what they started with) by more than
+# tolerance, as a fraction, and at least min_bytes, from the old report to
+# the new one.  Phases only one of them has are left out.
+#
+def compare_reports( old, new, tolerance = 0.10, min_bytes = REGRESSION_MIN_BYTES ):
+    old_phases = { phase[ 'phase' ]: phase for phase in old[ 'phases' ] }
+    regressions = [ ]
+
+    for phase in new[ 'phases' ]:
+        before = old_phases.get( phase[ 'phase' ] )
+        if before is None:
+            continue
+
+        old_growth = before[ 'peak_bytes' ] - before[ 'start_bytes' ]
+        new_growth = phase[ 'peak_bytes' ] - phase[ 'start_bytes' ]
+
+        if new_growth - old_growth > max( min_bytes, old_growth * tolerance ):
+            regressions.append( phase[ 'phase' ] + ': peak grew by ' + mib( new_growth ) + ' MiB, was ' +
+                                mib( old_growth ) + ' MiB' )
+
+    return( regressions )
+
+#
+# Add --memprofile to a tool's argument parser
+#
+def add_memprofile_args( parser ):
+    parser.add_argument( '--memprofile', type=str, metavar='FILE',
+                         help='Trace memory per phase, print the top allocation sites and save a JSON report '
+                              'to FILE (slower)' )
+
+#
+# Compare two saved reports.  Returns 1 if any phase regressed.
+#
+def main( argv = None ):
+    parser = ap.ArgumentParser( description = 'Compare two --memprofile reports.' )
+    parser.add_argument( 'old', type=str, help='Report from the known-good run' )
+    parser.add_argument( 'new', type=str, help='Report from the run to check' )
+    parser.add_argument( '--tolerance', type=float, default=10,
+                         help='Percent a phase\'s peak may grow before it counts (default 10)' )
+    args = parser.parse_args( argv )
+
+    with open( args.old ) as f:
+        old = json.load( f )
+
+    with open( args.new ) as f:
+        new = json.load( f )
+
+    regressions = compare_reports( old, new, args.tolerance / 100 )
+
+    for phase in new[ 'phases' ]:
+        print( f'{phase[ "phase" ]:<24}' + mib( phase[ 'peak_bytes' ] - phase[ 'start_bytes' ] ) + ' MiB peak growth' )
+
+    if regressions:
+        print( '\nRegressions:\n  ' + '\n  '.join( regressions ) + '\n' )
+        return( 1 )
+
+    print( '\nNo regressions.\n' )
+    return( 0 )
+
+
+if __name__ == '__main__':
+    quit( main() )
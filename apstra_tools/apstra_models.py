@@ -0,0 +1,156 @@
+'''
+apstra_models.py
+    Compact, slot-based models for the blueprint entities our tools work
+    with.  Each model is decoded straight from an API response and keeps
+    only the fields the tools actually read, so large fabrics don't carry
+    the full nested JSON of every VN, zone and system around in memory.
+'''
+
+import sys
+from dataclasses import dataclass
+
+
+#
+# Strip the prefix length off an 'a.b.c.d/nn' address
+#
+def host_addr( addr ):
+    if not addr:
+        return( '' )
+
+    return( addr.split( '/' )[ 0 ] )
+
+#
+# Tags repeat across thousands of objects, so share one copy of each
+#
+def intern_tags( tags ):
+    return( tuple( sys.intern( tag ) for tag in ( tags or () ) ) )
+
+
+@dataclass( slots=True )
+class Interface:
+    system_id: str = ''
+    ipv4_addr: str = ''
+
+    #
+    # An SVI entry from a VN's 'svi_ips' list
+    @classmethod
+    def from_svi( cls, svi ):
+        return( cls( system_id = svi[ 'system_id' ],
+                     ipv4_addr = host_addr( svi.get( 'ipv4_addr' ) ) ) )
+
+
+@dataclass( slots=True )
+class FloatingIP:
+    ipv4_addr: str = ''
+    generic_system_ids: tuple = ()
+
+    @classmethod
+    def from_api( cls, float_ip ):
+        return( cls( ipv4_addr = host_addr( float_ip.get( 'ipv4_addr' ) ),
+                     generic_system_ids = tuple( float_ip.get( 'generic_system_ids' ) or () ) ) )
+
+
+@dataclass( slots=True )
+class VirtualNetwork:
+    id: str
+    label: str = ''
+    security_zone_id: str = ''
+    reserved_vlan_id: int = 0
+    ipv4_subnet: str = ''
+    tags: tuple = ()
+    svi_ips: tuple = ()
+    floating_ips: tuple = ()
+
+    @classmethod
+    def from_api( cls, vn_data, vn_id = '' ):
+        return( cls( id = vn_data.get( 'id', vn_id ),
+                     label = vn_data.get( 'label', '' ),
+                     security_zone_id = vn_data.get( 'security_zone_id', '' ),
+                     reserved_vlan_id = vn_data.get( 'reserved_vlan_id' ),
+                     ipv4_subnet = vn_data.get( 'ipv4_subnet' ) or '',
+                     tags = intern_tags( vn_data.get( 'tags' ) ),
+                     svi_ips = tuple( Interface.from_svi( svi )
+                                      for svi in vn_data.get( 'svi_ips' ) or () ),
+                     floating_ips = tuple( FloatingIP.from_api( float_ip )
+                                           for float_ip in vn_data.get( 'floating_ips' ) or () ) ) )
+
+    #
+    # The prefix length of the VN's subnet, or None if it has no IPv4
+    # subnet (an L2-only VN, say)
+    @property
+    def prefix_bits( self ):
+        if '/' not in self.ipv4_subnet:
+            return( None )
+
+        return( self.ipv4_subnet.split( '/' )[ 1 ] )
+
+
+@dataclass( slots=True )
+class SecurityZone:
+    id: str
+    label: str = ''
+    vrf_name: str = ''
+    sz_type: str = ''
+    vni_id: int = 0
+    import_rts: tuple = ()
+    export_rts: tuple = ()
+
+    @classmethod
+    def from_api( cls, sz_data, sz_id = '' ):
+        rt_policy = sz_data.get( 'rt_policy' ) or {}
+
+        return( cls( id = sz_data.get( 'id', sz_id ),
+                     label = sz_data.get( 'label', '' ),
+                     vrf_name = sz_data[ 'vrf_name' ],
+                     sz_type = sz_data.get( 'sz_type', '' ),
+                     vni_id = sz_data.get( 'vni_id' ) or 0,
+                     import_rts = tuple( rt_policy.get( 'import_RTs' ) or () ),
+                     export_rts = tuple( rt_policy.get( 'export_RTs' ) or () ) ) )
+
+
+@dataclass( slots=True )
+class System:
+    node_id: str
+    label: str = ''
+    tags: tuple = ()
+    asn: str = ''
+    role: str = ''
+    loopback: str = ''
+
+    #
+    # Decode the parts of a system config context we use
+    @classmethod
+    def from_context( cls, sys_context ):
+        return( cls( node_id = sys_context[ 'node_id' ],
+                     label = sys_context.get( 'hostname', '' ),
+                     tags = intern_tags( sys_context.get( 'system_tags' ) ),
+                     asn = ( sys_context.get( 'bgpService' ) or {} ).get( 'asn', '' ) ) )
+
+
+@dataclass( slots=True )
+class PropertySet:
+    id: str
+    label: str = ''
+    values: dict = None
+
+    @classmethod
+    def from_api( cls, ps_data ):
+        return( cls( id = ps_data.get( 'property_set_id', ps_data.get( 'id', '' ) ),
+                     label = ps_data.get( 'label', '' ),
+                     values = ps_data.get( 'values' ) ) )
+
+
+#
+# Decode the 'virtual_networks' dict from get_vn_list
+#
+def vn_list_from_api( vn_json ):
+    return( [ VirtualNetwork.from_api( vn_data, vn_id )
+              for vn_id, vn_data in vn_json[ 'virtual_networks' ].items() ] )
+
+#
+# Decode the 'items' dict from get_sz_list, keyed by zone ID
+#
+def sz_index_from_api( sz_json ):
+    return( { sz_id: SecurityZone.from_api( sz_data, sz_id )
+              for sz_id, sz_data in sz_json[ 'items' ].items() } )
+
@@ -0,0 +1,367 @@
+'''
+apstra_orchestrate.py
+    Commit-check and deploy many blueprints at once.  Commit-checks run
+    concurrently across every blueprint, the ones that pass are deployed in
+    parallel, and the ones that fail can be reverted.  Deploys can also be
+    followed out to every system, through the blueprint's config and
+    deployment anomalies, until each has taken the new config, failed, or
+    run out of time.  Everything ends up in one report.
+'''
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from apstra_tools import apstra_utils as aosUtil
+
+# Seconds between rollout polls: back to 'initial' whenever a system moves,
+# doubling up to 'max' while none do
+ROLLOUT_POLL = { 'initial': 2.0, 'max': 30.0 }
+# Anomalies show up a little after a deploy, so a system without any new
+# ones only counts as having taken it this many seconds after the deploy
+ROLLOUT_SETTLE = 30.0
+# A system in one of these states is done with a rollout
+ROLLOUT_DONE = ( 'succeeded', 'failed', 'stale' )
+# Anomalies that say a system hasn't taken (config) or couldn't take
+# (deployment) the deployed config
+ROLLOUT_ANOMALIES = ( 'config', 'deployment' )
+
+
+#
+# Run fn( token, url, bp_id ) for each blueprint, at most workers at a time,
+# and return { bp_id: result }.  A blueprint whose call raises an
+# ApstraError gets False, so one bad blueprint doesn't sink the rest.  Pass
+# a dict as errors to have { bp_id: message } filled in for those.
+#
+def run_on_all( fn, token, url, bp_ids, workers, errors = None ):
+    results = { }
+
+    if not bp_ids:
+        return( results )
+
+    def run_one( bp_id ):
+        try:
+            return( fn( token, url, bp_id ) )
+
+        except aosUtil.ApstraError as e:
+            print( 'Error on blueprint ' + bp_id + '.  ' + str( e ) + '\n' )
+
+            if errors is not None:
+                errors[ bp_id ] = str( e )
+
+            return( False )
+
+    with ThreadPoolExecutor( max_workers = workers ) as pool:
+        for bp_id, result in zip( bp_ids, pool.map( run_one, bp_ids ) ):
+            results[ bp_id ] = result
+
+    return( results )
+
+#
+# What tells one raising of an anomaly from another: its ID and when it
+# was last changed (or, if the controller doesn't say, what it found)
+#
+def anomaly_key( anomaly ):
+    return( ( anomaly.get( 'id' ), anomaly.get( 'last_modified_at' ) or repr( anomaly.get( 'actual' ) ) ) )
+
+#
+# The keys of the config and deployment anomalies raised in a blueprint
+# right now.  Taken just before a deploy, it tells the anomalies left over
+# from earlier deploys from the ones this deploy raises.
+#
+def anomaly_snapshot( token, url, bp_id ):
+    return( { anomaly_key( anomaly ) for anomaly in aosUtil.get_anomalies( token, url, bp_id, ROLLOUT_ANOMALIES ) } )
+
+#
+# Where each system stands in a rollout, from the blueprint's anomalies:
+# { sys_id: ( state, error ) }.  A deployment anomaly means the system
+# failed to take the config, and a config anomaly that its config doesn't
+# match the blueprint yet.  An anomaly whose key is in before was already
+# there before the deploy, so it only makes the system 'stale'.  Systems
+# without any aren't listed.
+#
+def rollout_anomalies( anomalies, before = None ):
+    states = { }
+    before = before or set()
+    rank = { 'stale': 0, 'deploying': 1, 'failed': 2 }
+
+    for anomaly in anomalies:
+        sys_id = ( anomaly.get( 'identity' ) or { } ).get( 'system_id' ) or anomaly.get( 'system_id' )
+        actual = anomaly.get( 'actual' )
+        error = str( actual.get( 'value', actual ) if isinstance( actual, dict ) else actual or '' )
+
+        if not sys_id:
+            continue
+
+        if anomaly_key( anomaly ) in before:
+            state = ( 'stale', error )
+
+        elif anomaly[ 'anomaly_type' ] == 'deployment':
+            state = ( 'failed', error )
+
+        else:
+            state = ( 'deploying', '' )
+
+        # The worst anomaly a system has is where it stands
+        if sys_id not in states or rank[ state[ 0 ] ] > rank[ states[ sys_id ][ 0 ] ]:
+            states[ sys_id ] = state
+
+    return( states )
+
+#
+# Did every system take the deploy?
+#
+def rollout_ok( rollout ):
+    return( bool( rollout ) and not ( rollout[ 'failed' ] or rollout[ 'stale' ] or rollout[ 'timed_out' ] ) )
+
+#
+# Follow a deployed version of a blueprint out to each of its systems until
+# every one has taken it or failed, or timeout seconds have passed.  Each
+# poll is one read of the blueprint's config and deployment anomalies (see
+# rollout_anomalies).  before is anomaly_snapshot() from just before the
+# deploy, so anomalies left from an earlier deploy aren't taken for this
+# one's.  Each change of state is printed as it's seen.
+#
+# Once settle seconds have gone by for anomalies to show up, and only
+# while the blueprint's deployed version is still version:
+#   - a system without any anomaly has taken the deploy
+#   - a system whose only anomalies are from before the deploy hasn't
+#     moved, so we stop waiting on it and report it as stale
+#
+# If a later version is deployed meanwhile, the systems still waited on
+# are given up on as timed out.  Returns { 'succeeded': [ sys_id, ... ],
+# 'failed': { sys_id: error }, 'stale': { sys_id: error },
+# 'timed_out': [ sys_id, ... ] }.
+#
+def wait_for_rollout( token, url, bp_id, version, timeout, settle = None, before = None ):
+    settle = ROLLOUT_SETTLE if settle is None else settle
+    start = time.monotonic()
+    deadline = start + timeout
+    waiting = list( aosUtil.iter_systems_in_bp( token, url, bp_id ) )
+    states = { }
+    rollout = { 'succeeded': [ ], 'failed': { }, 'stale': { }, 'timed_out': [ ] }
+    pause = ROLLOUT_POLL[ 'initial' ]
+
+    print( 'Waiting up to ' + str( timeout ) + 's for ' + str( len( waiting ) ) + ' systems in ' + bp_id +
+           ' to take version ' + str( version ) + '...\n' )
+
+    while waiting:
+        moved = False
+
+        # If we can't hear from the controller right now, just poll again later
+        try:
+            anomalies = rollout_anomalies( aosUtil.get_anomalies( token, url, bp_id, ROLLOUT_ANOMALIES ), before )
+            settled = time.monotonic() - start >= settle
+
+            # Nothing can be put down to version once a later one is deployed
+            if settled and any( sys_id not in anomalies or anomalies[ sys_id ][ 0 ] == 'stale'
+                                for sys_id in waiting ):
+                deployed = aosUtil.get_deploy_status( token, url, bp_id )
+
+                if deployed != '' and deployed != version:
+                    print( 'Blueprint ' + bp_id + ' is at version ' + str( deployed ) + ' now, so the systems ' +
+                           'left can\'t be put down to version ' + str( version ) + '.\n' )
+                    break
+
+                settled = deployed == version
+
+        except aosUtil.TransientError:
+            anomalies = None
+
+        for sys_id in waiting:
+            if anomalies is None:
+                break
+
+            state, error = anomalies.get( sys_id, ( 'pending', '' ) )
+
+            if state == 'pending' and settled:
+                state = 'succeeded'
+
+            elif state == 'stale' and not settled:
+                state, error = 'pending', ''
+
+            if states.get( sys_id ) != state:
+                states[ sys_id ] = state
+                moved = True
+                print( '  ' + bp_id + '/' + sys_id + ': ' + state + ( ' (' + error + ')' if error else '' ) )
+
+            if state == 'succeeded':
+                rollout[ 'succeeded' ].append( sys_id )
+
+            elif state in ( 'failed', 'stale' ):
+                rollout[ state ][ sys_id ] = error
+
+        waiting = [ sys_id for sys_id in waiting if states.get( sys_id ) not in ROLLOUT_DONE ]
+        left = deadline - time.monotonic()
+
+        if not waiting or left <= 0:
+            break
+
+        pause = ROLLOUT_POLL[ 'initial' ] if moved else min( ROLLOUT_POLL[ 'max' ], pause * 2 )
+        time.sleep( min( pause, left ) )
+
+    rollout[ 'timed_out' ] = waiting
+    print( '\nRollout of ' + bp_id + ': ' + str( len( rollout[ 'succeeded' ] ) ) + ' succeeded, ' +
+           str( len( rollout[ 'failed' ] ) ) + ' failed, ' + str( len( rollout[ 'stale' ] ) ) +
+           ' stale, ' + str( len( waiting ) ) + ' timed out.\n' )
+
+    return( rollout )
+
+#
+# Follow the version of a blueprint that was just deployed out to its
+# systems (see wait_for_rollout).  before is anomaly_snapshot() from just
+# before the deploy.
+#
+def wait_for_deploy( token, url, bp_id, timeout, before = None ):
+    version = aosUtil.get_deploy_status( token, url, bp_id )
+
+    if version == '':
+        raise aosUtil.TransientError( 'Could not get the deployed version of ' + bp_id + '.' )
+
+    return( wait_for_rollout( token, url, bp_id, version, timeout, before = before ) )
+
+#
+# What the journal records for a deployed blueprint: its version, or once
+# the deploy has been followed out to every system, the version and
+# 'rolled_out'
+#
+def deploy_fingerprint( version, rolled_out = False ):
+    return( [ version, 'rolled_out' ] if rolled_out else version )
+
+#
+# Commit-check every blueprint, deploy the ones that pass, and optionally
+# revert the ones that don't.  Returns a report keyed by blueprint ID with
+# 'commit_check', 'deployed', 'rollout' and 'reverted' for each (None where
+# a step didn't run).
+#
+# Only a blueprint whose commit-check found errors in its config counts as
+# failed and is reverted.  One that couldn't be checked at all (a pending
+# operation, a 5xx, the controller out of reach) keeps its staged changes:
+# its 'commit_check' stays None and 'check_error' says what went wrong.
+#
+# With wait set, each deploy is followed out to the blueprint's systems for
+# up to wait seconds.  'rollout' is then True if every system took it, and
+# 'devices' holds what wait_for_rollout found.
+#
+# With a journal, each deploy is recorded against the blueprint's version,
+# and blueprints the journal has as deployed at their current version are
+# left out (and reported as deployed).  With wait set, a deploy is only
+# recorded once every system has taken it, and only blueprints recorded
+# that way are left out, so a rollout that failed or ran out of time is
+# done again on --resume.
+#
+def check_and_deploy( token, url, bp_ids, workers = 4, revert_failed = False, journal = None, wait = 0 ):
+    report = { bp_id: { 'commit_check': None, 'deployed': None, 'rollout': None, 'reverted': None }
+               for bp_id in bp_ids }
+    versions = { }
+
+    if journal:
+        for bp_id in bp_ids:
+            bp = aosUtil.find_bp( token, url, bp_id )
+            versions[ bp_id ] = bp[ 'version' ] if bp else None
+
+        done = set()
+        for bp_id in bp_ids:
+            unit = 'deploy/' + bp_id
+
+            if journal.done( unit, deploy_fingerprint( versions[ bp_id ], True ) ):
+                report[ bp_id ].update( deployed = True, rollout = True )
+                done.add( bp_id )
+
+            elif not wait and journal.done( unit, deploy_fingerprint( versions[ bp_id ] ) ):
+                report[ bp_id ][ 'deployed' ] = True
+                done.add( bp_id )
+
+        bp_ids = [ bp_id for bp_id in bp_ids if bp_id not in done ]
+
+    print( 'Running commit-check on ' + str( len( bp_ids ) ) + ' blueprints...\n' )
+    check_errors = { }
+    checks = run_on_all( aosUtil.commit_check_result, token, url, bp_ids, workers, check_errors )
+    passed = [ bp_id for bp_id in bp_ids if checks[ bp_id ] ]
+    failed = [ bp_id for bp_id in bp_ids if not checks[ bp_id ] and bp_id not in check_errors ]
+
+    for bp_id in bp_ids:
+        if bp_id in check_errors:
+            report[ bp_id ][ 'check_error' ] = check_errors[ bp_id ]
+
+        else:
+            report[ bp_id ][ 'commit_check' ] = checks[ bp_id ]
+
+    # What's raised before the deploy, to tell old anomalies from new ones
+    befores = run_on_all( anomaly_snapshot, token, url, passed, workers ) if wait else { }
+
+    print( 'Deploying ' + str( len( passed ) ) + ' blueprints that passed commit-check...\n' )
+    for bp_id, deployed in run_on_all( aosUtil.deploy_bp, token, url, passed, workers ).items():
+        report[ bp_id ][ 'deployed' ] = deployed
+
+        if journal and deployed and not wait:
+            journal.record( 'deploy/' + bp_id, deploy_fingerprint( versions[ bp_id ] ) )
+
+    deployed = [ bp_id for bp_id in passed if report[ bp_id ][ 'deployed' ] ]
+    if wait and deployed:
+        def follow( token, url, bp_id ):
+            return( wait_for_deploy( token, url, bp_id, wait, befores.get( bp_id ) or None ) )
+
+        for bp_id, rollout in run_on_all( follow, token, url, deployed, workers ).items():
+            report[ bp_id ][ 'rollout' ] = rollout_ok( rollout )
+
+            if rollout:
+                report[ bp_id ][ 'devices' ] = rollout
+
+            if journal and report[ bp_id ][ 'rollout' ]:
+                journal.record( 'deploy/' + bp_id, deploy_fingerprint( versions[ bp_id ], True ) )
+
+    if revert_failed and failed:
+        print( 'Reverting ' + str( len( failed ) ) + ' blueprints that failed commit-check...\n' )
+        for bp_id, reverted in run_on_all( aosUtil.revert_bp, token, url, failed, workers ).items():
+            report[ bp_id ][ 'reverted' ] = reverted
+
+    return( report )
+
+#
+# The blueprints where a step that ran failed, or that couldn't be
+# commit-checked
+#
+def failed_blueprints( report ):
+    return( [ bp_id for bp_id, result in report.items()
+              if 'check_error' in result or
+                 False in ( result[ 'commit_check' ], result[ 'deployed' ], result[ 'rollout' ],
+                            result[ 'reverted' ] ) ] )
+
+#
+# Print the report as a table.  labels maps blueprint ID -> label.
+#
+def print_report( report, labels = None ):
+    labels = labels or { }
+    marks = { True: 'ok', False: 'FAILED', None: '-' }
+
+    print( f'{"BP Name":<24}' + f'{"Commit-check":<14}' + f'{"Deploy":<10}' + f'{"Rollout":<10}' +
+           f'{"Revert":<10}' + 'UUID' )
+    print( f'{"-------":<24}' + f'{"------------":<14}' + f'{"------":<10}' + f'{"-------":<10}' +
+           f'{"------":<10}' + '----' )
+
+    for bp_id, result in report.items():
+        check_mark = 'ERROR' if 'check_error' in result else marks[ result[ 'commit_check' ] ]
+
+        print( f'{labels.get( bp_id, "" ):<24}' +
+               f'{check_mark:<14}' +
+               f'{marks[ result[ "deployed" ] ]:<10}' +
+               f'{marks[ result[ "rollout" ] ]:<10}' +
+               f'{marks[ result[ "reverted" ] ]:<10}' + bp_id )
+
+    for bp_id, result in report.items():
+        devices = result.get( 'devices' ) or { }
+
+        if 'check_error' in result:
+            print( labels.get( bp_id, bp_id ) + ': could not commit-check, left as staged.  ' +
+                   result[ 'check_error' ] )
+
+        for sys_id, error in devices.get( 'failed', { } ).items():
+            print( labels.get( bp_id, bp_id ) + ': ' + sys_id + ' failed' + ( ', ' + error if error else '' ) )
+
+        for sys_id, error in devices.get( 'stale', { } ).items():
+            print( labels.get( bp_id, bp_id ) + ': ' + sys_id + ' never moved from an earlier deploy' +
+                   ( ', ' + error if error else '' ) )
+
+        for sys_id in devices.get( 'timed_out', [ ] ):
+            print( labels.get( bp_id, bp_id ) + ': ' + sys_id + ' timed out' )
+    print( '\n' )
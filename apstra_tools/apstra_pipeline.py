@@ -0,0 +1,1071 @@
+'''
+apstra_pipeline.py
+    Shared collect -> transform -> publish pipeline for the SRX property
+    set generators.
+
+    Collection reads what the outputs need from the reference design
+    blueprint (peering VN's, security zones, borders, firewalls), once.
+    Each output generator then turns that collection into the values of a
+    property set, and publish installs each property set in the freeform
+    blueprint.  Several outputs can run off the same collection in one go,
+    so adding an output costs no extra controller reads.
+
+    To add an output, write a build function that takes the collection and
+    its cache from the last run and returns ( values, cache ), and register
+    it in GENERATORS along with the collection items it needs.
+'''
+
+import hashlib
+import json
+import os
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import astuple, dataclass
+from fnmatch import fnmatchcase
+from functools import partial
+
+from apstra_tools import apstra_utils as aosUtil
+from apstra_tools import apstra_journal as journaling
+from apstra_tools.apstra_inventory import Inventory, sync as sync_inventory
+from apstra_tools import apstra_memprofile as memprofile
+from apstra_tools import apstra_orchestrate as orchestrate
+from apstra_tools.apstra_models import System, VirtualNetwork, PropertySet, host_addr, sz_index_from_api
+from apstra_tools.apstra_tasks import TASK_WORKERS, run_tasks, timing_summary
+from apstra_tools.apstra_validate import AddressTable, check_vrf_entries
+
+B1_TAG = 'border1'
+B2_TAG = 'border2'
+FW1_TAG = 'fw_node1'
+FW2_TAG = 'fw_node2'
+BORDER_TAGS = 'border*'
+FW_TAGS = 'fw_node*'
+PEER_PROP_SET_NAME = 'peer_properties'
+TYPE5_PROP_SET_NAME = 'type5_properties'
+# Bump this when the shape of a vrfs entry changes so cached entries from
+# older runs are rebuilt instead of spliced in.
+VRF_ENTRY_VERSION = 3
+# Flat keys the original two-border, two-firewall schema used.  We keep
+# filling them in so existing config templates don't break.
+LEGACY_ASN_KEYS = { B1_TAG: 'leaf1', B2_TAG: 'leaf2', FW1_TAG: 'fw_node1', FW2_TAG: 'fw_node2' }
+LEGACY_IP4_KEYS = { B1_TAG: 'leaf1_ip4', B2_TAG: 'leaf2_ip4', FW1_TAG: 'fw1_ip4', FW2_TAG: 'fw2_ip4' }
+
+DEFAULT_OPTIONS = { 'border_tags': BORDER_TAGS, 'fw_tags': FW_TAGS,
+                    'shard_bytes': 0, 'publish_workers': 4, 'remove_unsharded': False,
+                    'stream_dir': '', 'validate': True, 'inventory': '' }
+
+
+#
+# A property set that was streamed to a file rather than built in memory.
+# Two of them are equal when they hold the same bytes.  violations is what
+# IP validation found while it was written (None if it couldn't run).
+#
+@dataclass( slots=True )
+class StreamedPropSet:
+    path: str
+    fingerprint: str
+    vrf_count: int = 0
+    violations: list = None
+
+
+####################
+# Collection stage #
+####################
+
+#
+# Yield the VN's that service firewall connections, as models
+#
+def iter_fw_vns( token, url, bp_id ):
+    print( 'Getting virtual network list from blueprint...\n' )
+    for vn_id, vn_data in aosUtil.iter_vn_list( token, url, bp_id ):
+        if 'peer_to_fw' in vn_data[ 'tags' ]:
+            yield( VirtualNetwork.from_api( vn_data, vn_id ) )
+
+#
+# Re-reads the peering VN's each time it's iterated, page by page, instead
+# of holding them all
+#
+class LazyFwVns:
+    def __init__( self, token, url, bp_id ):
+        self.args = ( token, url, bp_id )
+
+    def __iter__( self ):
+        return( iter_fw_vns( *self.args ) )
+
+#
+# VN's that service firewall connections, as models.  When streaming, a
+# lazy view that pages through them as the generator consumes it.
+#
+def collect_fw_vns( token, url, bp_id, options ):
+    if options[ 'stream_dir' ]:
+        return( LazyFwVns( token, url, bp_id ) )
+
+    return( list( iter_fw_vns( token, url, bp_id ) ) )
+
+#
+# All security zones, keyed by ID, from one bulk request
+#
+def collect_sz_index( token, url, bp_id, options ):
+    return( sz_index_from_api( aosUtil.get_sz_list( token, url, bp_id ) ) )
+
+#
+# Get the context for systems in the source BP and find the ones with a
+# tag matching border_tags ('border1', 'border2', ...).  Each border's role
+# is its (first) matching tag.
+#
+def collect_borders( token, url, bp_id, options ):
+    borders = [ ]
+    border_tags = options[ 'border_tags' ]
+
+    print( 'Searching for leaves tagged ' + border_tags + ' in source blueprint...\n' )
+    for sys in aosUtil.iter_systems_in_bp( token, url, bp_id ):
+        sys_context = System.from_context( aosUtil.get_dev_context( token, url, bp_id, sys ) )
+        roles = sorted( tag for tag in sys_context.tags if fnmatchcase( tag, border_tags ) )
+
+        if roles:
+            sys_context.role = roles[ 0 ]
+            borders.append( sys_context )
+
+    return( sorted( borders, key = lambda border: border.role ) )
+
+#
+# Find every generic system with a tag matching fw_tags, and its ASN, with
+# a single graph query.  Each firewall's role is its (first) matching tag.
+# The query result is cached per blueprint version, so this is free until
+# the source blueprint changes.
+#
+def collect_firewalls( token, url, bp_id, options ):
+    firewalls = { }
+    fw_tags = options[ 'fw_tags' ]
+    query = aosUtil.graph_query( aosUtil.qe_node( 'tag', name = 'tag' ),
+                                 aosUtil.qe_out( 'tag' ),
+                                 aosUtil.qe_node( 'system', name = 'fw', role = 'generic' ),
+                                 aosUtil.qe_in(),
+                                 aosUtil.qe_node( 'domain', name = 'bgp' ) )
+
+    print( 'Searching for firewalls tagged ' + fw_tags + ' in source blueprint...\n' )
+    for item in aosUtil.run_query( token, url, bp_id, query ):
+        fw_tag = item[ 'tag' ][ 'label' ]
+        fw_id = item[ 'fw' ][ 'id' ]
+
+        if not fnmatchcase( fw_tag, fw_tags ):
+            continue
+
+        if fw_id in firewalls and firewalls[ fw_id ].role < fw_tag:
+            continue
+
+        firewalls[ fw_id ] = System( node_id = fw_id, label = item[ 'fw' ].get( 'label', '' ),
+                                     tags = ( fw_tag, ), asn = item[ 'bgp' ][ 'domain_id' ],
+                                     role = fw_tag )
+
+    return( sorted( firewalls.values(), key = lambda fw: fw.role ) )
+
+#
+# Find every leaf with a tag matching border_tags, with its ASN and its
+# default loopback address, in one graph query instead of a config context
+# per system.  Each border's role is its (first) matching tag.
+#
+def collect_border_loopbacks( token, url, bp_id, options ):
+    borders = { }
+    border_tags = options[ 'border_tags' ]
+    query = aosUtil.qe_match(
+        aosUtil.graph_query( aosUtil.qe_node( 'tag', name = 'tag' ),
+                             aosUtil.qe_out( 'tag' ),
+                             aosUtil.qe_node( 'system', name = 'leaf', role = 'leaf' ),
+                             aosUtil.qe_out( 'hosted_interfaces' ),
+                             aosUtil.qe_node( 'interface', name = 'lo', if_type = 'loopback', loopback_id = 0 ) ),
+        aosUtil.graph_query( aosUtil.qe_node( name = 'leaf' ),
+                             aosUtil.qe_in(),
+                             aosUtil.qe_node( 'domain', name = 'bgp' ) ) )
+
+    print( 'Searching for border loopbacks tagged ' + border_tags + ' in source blueprint...\n' )
+    for item in aosUtil.run_query( token, url, bp_id, query ):
+        border_tag = item[ 'tag' ][ 'label' ]
+        leaf_id = item[ 'leaf' ][ 'id' ]
+
+        if not fnmatchcase( border_tag, border_tags ):
+            continue
+
+        if leaf_id in borders and borders[ leaf_id ].role < border_tag:
+            continue
+
+        borders[ leaf_id ] = System( node_id = leaf_id, label = item[ 'leaf' ].get( 'label', '' ),
+                                     tags = ( border_tag, ), asn = item[ 'bgp' ][ 'domain_id' ],
+                                     role = border_tag, loopback = item[ 'lo' ][ 'ipv4_addr' ] )
+
+    return( sorted( borders.values(), key = lambda border: border.role ) )
+
+COLLECTORS = {
+    'fw_vns': collect_fw_vns,
+    'sz_index': collect_sz_index,
+    'borders': collect_borders,
+    'border_loopbacks': collect_border_loopbacks,
+    'firewalls': collect_firewalls,
+}
+
+#
+# The peering VN's as stored in a local inventory (apstra_inventory.py), read
+# again each time it's iterated
+#
+class InventoryVns:
+    def __init__( self, path, bp_id ):
+        self.path = path
+        self.bp_id = bp_id
+
+    def __iter__( self ):
+        with Inventory( self.path ) as inventory:
+            yield from inventory.virtual_networks( self.bp_id, 'peer_to_fw' )
+
+#
+# Collect one item from the inventory at the 'inventory' option instead of
+# from the controller.  It has to have been synced first.
+#
+def read_inventory( need, bp_id, options, synced = None ):
+    if need == 'fw_vns':
+        return( InventoryVns( options[ 'inventory' ], bp_id ) )
+
+    with Inventory( options[ 'inventory' ] ) as inventory:
+        if need == 'sz_index':
+            return( inventory.sz_index( bp_id ) )
+
+        if need == 'firewalls':
+            return( inventory.systems_tagged( bp_id, options[ 'fw_tags' ], 'generic' ) )
+
+        if need == 'border_loopbacks':
+            return( inventory.systems_tagged( bp_id, options[ 'border_tags' ], 'leaf' ) )
+
+        return( inventory.systems_tagged( bp_id, options[ 'border_tags' ] ) )
+
+
+########################
+# Transformation stage #
+########################
+
+#
+# Index the borders and firewalls once by system ID and firewall node ID,
+# and work out the ASN part of the property set and the topology that every
+# VRF entry's fingerprint includes
+#
+def peer_topology( borders, firewalls ):
+    border_index = { border.node_id: border for border in borders }
+    fw_index = { fw.node_id: fw for fw in firewalls }
+
+    asn_dict = { 'asn': { } }
+    for node in borders + firewalls:
+        asn_dict[ 'asn' ][ node.role ] = node.asn
+
+        if node.role in LEGACY_ASN_KEYS:
+            asn_dict[ 'asn' ][ LEGACY_ASN_KEYS[ node.role ] ] = node.asn
+
+    topology = [ VRF_ENTRY_VERSION ] + \
+               [ [ node.role, node.node_id, node.asn ] for node in borders + firewalls ]
+
+    return( border_index, fw_index, asn_dict, topology )
+
+#
+# Build one VRF entry from a VN's full payload.  Each VRF entry lists its
+# 'leaves' and 'firewalls'; the flat leaf1_ip4, fw1_ip4, ... keys are still
+# filled in for the border1/2 and fw_node1/2 tags.
+#
+def build_vrf_entry( vn_data, sz_data, border_index, fw_index ):
+    leaves = [ ]
+    fws = [ ]
+
+    for svi in vn_data.svi_ips:
+        border = border_index.get( svi.system_id )
+
+        if border:
+            leaves.append( { 'tag': border.role, 'ip4': svi.ipv4_addr } )
+
+    for fip in vn_data.floating_ips:
+        fw = fw_index.get( fip.generic_system_ids[ 0 ] ) if fip.generic_system_ids else None
+
+        if fw:
+            fws.append( { 'tag': fw.role, 'ip4': fip.ipv4_addr } )
+
+    leaves.sort( key = lambda leaf: leaf[ 'tag' ] )
+    fws.sort( key = lambda fw: fw[ 'tag' ] )
+
+    vrf_entry = {'name': sz_data.vrf_name,
+                 'vlan_id': vn_data.reserved_vlan_id,
+                 'prefix_bits': vn_data.prefix_bits,
+                 'ipv4_subnet': vn_data.ipv4_subnet,
+                 'fw1_ip4': '',
+                 'fw2_ip4': '',
+                 'leaf1_ip4': '',
+                 'leaf2_ip4': '',
+                 'leaves': leaves,
+                 'firewalls': fws }
+
+    for peer in leaves + fws:
+        if peer[ 'tag' ] in LEGACY_IP4_KEYS:
+            vrf_entry[ LEGACY_IP4_KEYS[ peer[ 'tag' ] ] ] = peer[ 'ip4' ]
+
+    return( vrf_entry )
+
+#
+# Yield the VRF entries for fw_vn_list one VN at a time, so fw_vn_list can
+# be a lazy iterable that is never held whole.  The VN list pages already
+# carry everything an entry is built from (SVI's and floating IP's
+# included), so nothing more is fetched per VN.
+#
+# vrf_cache maps VN ID -> { 'fingerprint', 'vrf' } from an earlier run.  A VN
+# whose inputs (the VN as listed, its security zone, and the border and
+# firewall IDs/ASNs) hash to the same fingerprint keeps its old entry.
+# Pass a dict as new_cache to have it filled in for the next run, and a
+# dict as counts to get 'rebuilt', 'total' and 'skipped'.
+#
+# A VN without an IPv4 subnet (an L2-only VN) has nothing to peer over, so
+# it gets no entry.  It's reported and counted as skipped.
+#
+def iter_vrf_entries( token, url, bp_id, fw_vn_list, sz_index, borders, firewalls,
+                      vrf_cache = None, new_cache = None, counts = None ):
+    vrf_cache = vrf_cache or { }
+    counts = counts if counts is not None else { }
+    counts.update( rebuilt = 0, total = 0, skipped = 0 )
+    border_index, fw_index, asn_dict, topology = peer_topology( borders, firewalls )
+
+    for vn in fw_vn_list:
+        if vn.prefix_bits is None:
+            print( 'Skipping VN ' + vn.label + ' (' + vn.id + '), it has no IPv4 subnet.\n' )
+            counts[ 'skipped' ] += 1
+            continue
+
+        sz_data = sz_index[ vn.security_zone_id ]
+        vn_fp = aosUtil.fingerprint( [ topology, astuple( vn ), astuple( sz_data ) ] )
+        cached = vrf_cache.get( vn.id )
+
+        if not cached or cached[ 'fingerprint' ] != vn_fp:
+            cached = { 'fingerprint': vn_fp,
+                       'vrf': build_vrf_entry( vn, sz_data, border_index, fw_index ) }
+            counts[ 'rebuilt' ] += 1
+
+        if new_cache is not None:
+            new_cache[ vn.id ] = cached
+
+        counts[ 'total' ] += 1
+        yield( cached[ 'vrf' ] )
+
+#
+# Build the peer_properties property set that we'll install in the SRX
+# blueprint: the ASN's of every border and firewall, and a 'vrfs' entry for
+# each peering VN.  Any number of borders and firewalls is fine.
+#
+# Only VN's whose fingerprint changed since vrf_cache was made are
+# rebuilt (see iter_vrf_entries).  The updated cache is returned
+# alongside the property set.
+#
+def build_proto_prop_set( token, url, bp_id, fw_vn_list, sz_index, borders, firewalls,
+                          vrf_cache = None ):
+    new_cache = { }
+    counts = { }
+    peer_prop_set = dict( peer_topology( borders, firewalls )[ 2 ] )
+    vrf_dict_items = list( iter_vrf_entries( token, url, bp_id, fw_vn_list, sz_index, borders,
+                                             firewalls, vrf_cache, new_cache, counts ) )
+
+    print( 'Rebuilt ' + str( counts[ 'rebuilt' ] ) + ' of ' + str( counts[ 'total' ] ) +
+           ' VRF entries, reused the rest.\n' )
+
+    vrf_dict = { 'vrfs': vrf_dict_items }
+    peer_prop_set.update(vrf_dict )
+
+    return( peer_prop_set, new_cache )
+
+#
+# Like build_proto_prop_set, but the property set is written to a file at
+# path as it's built, one VRF entry at a time, so neither the VN's nor the
+# entries are ever held in memory.  The file is swapped in whole once it's
+# complete.
+#
+# Keeping a cache entry per VRF would grow with the fabric, so streaming
+# doesn't use one: every entry is rebuilt.  With validate set, the
+# addresses are packed into an AddressTable on the way.  Duplicates and
+# overlaps can be anywhere in the set, so the table does grow with it, by
+# about a hundred bytes per VN.  Returns a StreamedPropSet.
+#
+def stream_proto_prop_set( token, url, bp_id, fw_vn_list, sz_index, borders, firewalls,
+                           path, validate = True ):
+    counts = { }
+    digest = hashlib.sha256()
+    table = AddressTable() if validate else None
+    asn_dict = peer_topology( borders, firewalls )[ 2 ]
+
+    with open( path + '.tmp', 'w' ) as f:
+        def write( text ):
+            f.write( text )
+            digest.update( text.encode() )
+
+        write( json.dumps( asn_dict )[ :-1 ] + ', "vrfs": [' )
+
+        for vrf_entry in iter_vrf_entries( token, url, bp_id, fw_vn_list, sz_index, borders,
+                                           firewalls, counts = counts ):
+            write( ( ', ' if counts[ 'total' ] > 1 else '' ) + json.dumps( vrf_entry ) )
+
+            if table is not None:
+                table.add( vrf_entry )
+
+        write( ']}' )
+
+    os.replace( path + '.tmp', path )
+    print( 'Streamed ' + str( counts[ 'total' ] ) + ' VRF entries to ' + path + '.\n' )
+
+    return( StreamedPropSet( path, digest.hexdigest(), counts[ 'total' ],
+                             table.check() if table is not None else None ) )
+
+#
+# Per-VRF BGP peering between the SRX's and the border leaves.  With a
+# stream_dir option it streams to '<stream_dir>/peer_properties.json'
+# instead of building the property set in memory, and leaves the cache as
+# it was.
+#
+def build_vrf_peering( collection, cache ):
+    options = collection[ 'options' ]
+    args = ( collection[ 'token' ], collection[ 'url' ], collection[ 'bp_id' ],
+             collection[ 'fw_vns' ], collection[ 'sz_index' ],
+             collection[ 'borders' ], collection[ 'firewalls' ] )
+
+    if options[ 'stream_dir' ]:
+        path = os.path.join( options[ 'stream_dir' ], PEER_PROP_SET_NAME + '.json' )
+
+        return( stream_proto_prop_set( *args, path, options[ 'validate' ] ), cache )
+
+    return( build_proto_prop_set( *args, cache ) )
+
+#
+# EVPN type-5 interconnect between the SRX's and the fabric: the ASN's and
+# loopbacks of the borders, the firewall ASN's, and the L3 VNI and route
+# targets of every EVPN VRF.  It's built from the bulk security zone list
+# and the border loopback query alone, so it costs the same few requests
+# however many VRFs there are.  Nothing here is worth caching.
+#
+def build_type5( collection, cache ):
+    borders = collection[ 'border_loopbacks' ]
+    firewalls = collection[ 'firewalls' ]
+    type5 = dict( peer_topology( borders, firewalls )[ 2 ] )
+
+    type5[ 'borders' ] = [ { 'tag': border.role, 'asn': border.asn,
+                             'loopback': host_addr( border.loopback ) }
+                           for border in borders ]
+    type5[ 'firewalls' ] = [ { 'tag': fw.role, 'asn': fw.asn } for fw in firewalls ]
+    type5[ 'vrfs' ] = [ { 'name': sz.vrf_name,
+                          'l3_vni': sz.vni_id,
+                          'import_rts': list( sz.import_rts ),
+                          'export_rts': list( sz.export_rts ) }
+                        for sz in sorted( collection[ 'sz_index' ].values(), key = lambda sz: sz.vrf_name )
+                        if sz.sz_type == 'evpn' and sz.vni_id ]
+
+    print( 'Built type-5 parameters for ' + str( len( type5[ 'vrfs' ] ) ) + ' VRFs.\n' )
+
+    return( type5, cache )
+
+GENERATORS = {
+    'vrf': { 'ps_label': PEER_PROP_SET_NAME,
+             'needs': ( 'fw_vns', 'sz_index', 'borders', 'firewalls' ),
+             'build': build_vrf_peering },
+    'type5': { 'ps_label': TYPE5_PROP_SET_NAME,
+               'needs': ( 'sz_index', 'border_loopbacks', 'firewalls' ),
+               'build': build_type5 },
+}
+
+
+####################
+# Validation stage #
+####################
+
+#
+# Check the peering addresses of every output with a 'vrfs' list (see
+# apstra_validate), print every problem, and raise ValidationError if
+# there were any, so nothing bad gets published.  Skipped, with a note,
+# if NumPy isn't installed.
+#
+def validate( results ):
+    problems = 0
+
+    for output, values in results.items():
+        if isinstance( values, StreamedPropSet ):
+            violations = values.violations
+
+        elif 'vrfs' in values:
+            violations = check_vrf_entries( values[ 'vrfs' ] )
+
+        else:
+            continue
+
+        if violations is None:
+            print( 'NumPy isn\'t installed, skipping IP validation of ' + output + '.\n' )
+            continue
+
+        for violation in violations:
+            print( 'Invalid ' + GENERATORS[ output ][ 'ps_label' ] + ': ' + violation )
+
+        problems += len( violations )
+
+    if problems:
+        raise aosUtil.ValidationError( str( problems ) + ' IP allocation problems found, nothing published.' )
+
+    return( results )
+
+
+#################
+# Publish stage #
+#################
+
+#
+# The property sets already in the destination BP, by label, from one
+# listing.  Only their IDs are kept; their values can be large and
+# publishing doesn't need them.
+#
+def existing_prop_sets( token, url, dst_uuid ):
+    return( { ps[ 'label' ]: PropertySet.from_api( dict( ps, values = None ) )
+              for ps in aosUtil.iter_ps_list( token, url, dst_uuid ) } )
+
+#
+# Install a property set in the destination BP.  POST if the property set
+# doesn't already exist.  PATCH if it does.
+#
+# Pass the existing PropertySet if the caller already looked it up, or
+# None if they know there isn't one, to skip the lookup.
+#
+def publish_ps( token, url, dst_uuid, ps_label, values, existing = False ):
+    ps_id = ''
+
+    if existing:
+        ps_id = existing.id
+
+    elif existing is False:
+        for ps in aosUtil.iter_ps_list( token, url, dst_uuid ):
+            if ps[ 'label' ] == ps_label:
+                ps_id = PropertySet.from_api( ps ).id
+                break
+
+    if ps_id == '' :
+        aosUtil.post_ps( token, url, dst_uuid, values, ps_label )
+
+    else:
+        aosUtil.patch_ps( token, url, dst_uuid, values, ps_id, ps_label )
+
+#
+# Split a property set into shard_count shards by a hash of the VRF name,
+# so every entry for a VRF lands in the same shard and a VRF stays in the
+# same shard from run to run.  Everything but the 'vrfs' list (the ASN's)
+# is small and goes into every shard.
+#
+def shard_values( values, shard_count ):
+    common = { key: value for key, value in values.items() if key != 'vrfs' }
+    shards = [ dict( common, vrfs = [ ] ) for shard in range( shard_count ) ]
+
+    for vrf in values.get( 'vrfs', [ ] ):
+        shards[ zlib.crc32( vrf[ 'name' ].encode() ) % shard_count ][ 'vrfs' ].append( vrf )
+
+    return( shards )
+
+#
+# Smallest power of two that keeps each shard under shard_bytes on
+# average.  Sticking to powers of two keeps the shard count, and so every
+# VRF's shard, from changing on small growth.
+#
+def shard_count_for( values, shard_bytes ):
+    shard_count = 1
+    total_bytes = len( json.dumps( values ) )
+
+    while total_bytes / shard_count > shard_bytes:
+        shard_count *= 2
+
+    return( shard_count )
+
+#
+# Publish a large property set as shard_count shards plus a compact index.
+#
+# Shard i goes to '<ps_label>_shard_<i>' and the index to
+# '<ps_label>_index', which lists each shard's label and fingerprint.  The
+# fingerprints in the index from the last publish tell us which shards
+# changed; only those are written, in parallel.  A shard the journal has
+# as written is only skipped if it's still there.  The index is written
+# last, and shards left over from a larger shard count are removed.
+#
+# An unsharded property set from before sharding was turned on may still
+# be read by config templates, so it's left alone, with a warning, unless
+# remove_unsharded is set.
+#
+def publish_sharded( token, url, dst_uuid, ps_label, values, shard_count, workers, journal = None,
+                     remove_unsharded = False ):
+    index_label = ps_label + '_index'
+    shard_label = ps_label + '_shard_'
+    existing = { }
+    old_prints = { }
+
+    for ps in aosUtil.iter_ps_list( token, url, dst_uuid ):
+        label = ps[ 'label' ]
+
+        if label in ( ps_label, index_label ) or \
+           ( label.startswith( shard_label ) and label[ len( shard_label ): ].isdigit() ):
+            # Only the index's values are read, the rest can be large
+            existing[ label ] = PropertySet.from_api( ps if label == index_label else dict( ps, values = None ) )
+
+    if index_label in existing and existing[ index_label ].values:
+        for shard in existing[ index_label ].values.get( 'shards', [ ] ):
+            old_prints[ shard[ 'label' ] ] = shard[ 'fingerprint' ]
+
+    shards = shard_values( values, shard_count )
+    index = { 'shard_count': len( shards ), 'shards': [ ] }
+    writes = [ ]
+
+    for shard_num, shard in enumerate( shards ):
+        label = shard_label + str( shard_num )
+        shard_fp = aosUtil.fingerprint( shard )
+        index[ 'shards' ].append( { 'label': label, 'fingerprint': shard_fp,
+                                    'vrf_count': len( shard[ 'vrfs' ] ) } )
+
+        if label in existing and ( old_prints.get( label ) == shard_fp or
+                                   journal and journal.done( 'ps/' + dst_uuid + '/' + label, shard_fp ) ):
+            continue
+
+        writes.append( ( label, shard, shard_fp ) )
+
+    print( 'Publishing ' + str( len( writes ) ) + ' of ' + str( len( shards ) ) +
+           ' shards of ' + ps_label + '.\n' )
+
+    def write_shard( write ):
+        label, shard, shard_fp = write
+        publish_ps( token, url, dst_uuid, label, shard, existing.get( label ) )
+
+        if journal:
+            journal.record( 'ps/' + dst_uuid + '/' + label, shard_fp )
+
+    with ThreadPoolExecutor( max_workers = workers ) as pool:
+        list( pool.map( write_shard, writes ) )
+
+    if index_label not in existing or existing[ index_label ].values != index:
+        publish_ps( token, url, dst_uuid, index_label, index, existing.get( index_label ) )
+
+    for label, ps in existing.items():
+        if label.startswith( shard_label ) and int( label[ len( shard_label ): ] ) >= len( shards ):
+            aosUtil.delete_ps( token, url, dst_uuid, ps.id, label )
+
+    if ps_label in existing and remove_unsharded:
+        print( 'Sharding is on, removing the unsharded ' + ps_label + '.  Config templates have to read ' +
+               index_label + ' and the shards now.\n' )
+        aosUtil.delete_ps( token, url, dst_uuid, existing[ ps_label ].id, ps_label )
+
+    elif ps_label in existing:
+        print( 'Warning.  The unsharded ' + ps_label + ' is still there and is no longer updated.  ' +
+               'Point config templates at ' + index_label + ' and the shards, then remove it ' +
+               '(--remove-unsharded does that).\n' )
+
+#
+# Publish each output's property set.  With a shard_bytes option, property
+# sets larger than that are split into shards published in parallel (see
+# publish_sharded), and smaller ones are published whole.  Streamed
+# property sets are uploaded straight from their file.  With a journal,
+# writes it has as done with the same values are skipped, and each write
+# is recorded.  Pass existing_ps from existing_prop_sets() if you already
+# have it, to skip looking each property set up.
+#
+def publish( token, url, dst_uuid, results, options = None, journal = None, existing_ps = None ):
+    options = dict( DEFAULT_OPTIONS, **( options or {} ) )
+
+    for output, values in results.items():
+        ps_label = GENERATORS[ output ][ 'ps_label' ]
+        unit = 'ps/' + dst_uuid + '/' + ps_label
+        existing = existing_ps.get( ps_label ) if existing_ps is not None else False
+        shard_count = 1
+
+        if options[ 'shard_bytes' ] and isinstance( values, dict ) and 'vrfs' in values:
+            shard_count = shard_count_for( values, options[ 'shard_bytes' ] )
+
+        if journal:
+            values_fp = values.fingerprint if isinstance( values, StreamedPropSet ) else aosUtil.fingerprint( values )
+
+            if journal.done( unit, values_fp ):
+                continue
+
+        if isinstance( values, StreamedPropSet ):
+            publish_ps( token, url, dst_uuid, ps_label, values.path, existing )
+
+        elif shard_count > 1:
+            publish_sharded( token, url, dst_uuid, ps_label, values, shard_count,
+                             options[ 'publish_workers' ], journal, options[ 'remove_unsharded' ] )
+
+        else:
+            publish_ps( token, url, dst_uuid, ps_label, values, existing )
+
+        if journal:
+            journal.record( unit, values_fp )
+
+
+##########################
+# Running the whole show #
+##########################
+
+#
+# The whole run as a task graph (see apstra_tasks): a task per collector,
+# a 'build:<output>' task per output that starts once the collectors it
+# needs are done, then 'results' and 'validated'.  Nothing waits on
+# anything it doesn't need, so e.g. the firewall query, the border lookup
+# and the VN listing all run at the same time.
+#
+# With a destination BP, 'existing_ps' lists the property sets already
+# there while the source is being read, and 'published' publishes the
+# validated results.  caches is updated in place as outputs are built.
+#
+def pipeline_tasks( token, url, src_uuid, outputs, caches, options = None, dst_uuid = None, journal = None ):
+    options = dict( DEFAULT_OPTIONS, **( options or {} ) )
+    base = { 'token': token, 'url': url, 'bp_id': src_uuid, 'options': options }
+    tasks = { need: ( partial( collector, token, url, src_uuid, options ), [ ] )
+              for need, collector in COLLECTORS.items() }
+
+    # With an inventory, bring the source blueprint up to date in it (one
+    # blueprint list call if its version hasn't moved) and collect from it
+    if options[ 'inventory' ]:
+        tasks[ 'inventory' ] = ( partial( sync_inventory, token, url, options[ 'inventory' ], [ src_uuid ] ), [ ] )
+        tasks.update( { need: ( partial( read_inventory, need, src_uuid, options ), [ 'inventory' ] )
+                        for need in COLLECTORS } )
+
+    def build_task( output ):
+        needs = list( GENERATORS[ output ][ 'needs' ] )
+
+        def build( *collected ):
+            collection = dict( base, **dict( zip( needs, collected ) ) )
+            values, caches[ output ] = GENERATORS[ output ][ 'build' ]( collection, caches.get( output ) )
+
+            return( values )
+
+        return( ( build, needs ) )
+
+    def check( results ):
+        return( validate( results ) if options[ 'validate' ] else results )
+
+    for output in outputs:
+        tasks[ 'build:' + output ] = build_task( output )
+
+    tasks[ 'results' ] = ( lambda *built: dict( zip( outputs, built ) ),
+                           [ 'build:' + output for output in outputs ] )
+    tasks[ 'validated' ] = ( check, [ 'results' ] )
+
+    if dst_uuid:
+        tasks[ 'existing_ps' ] = ( partial( existing_prop_sets, token, url, dst_uuid ), [ ] )
+        tasks[ 'published' ] = ( lambda results, existing_ps: publish( token, url, dst_uuid, results, options,
+                                                                       journal, existing_ps ),
+                                 [ 'validated', 'existing_ps' ] )
+
+    return( tasks )
+
+#
+# Collect once for every requested output, build them all, validate them
+# (unless the validate option is off) and return the results without
+# publishing
+#
+def generate( token, url, src_uuid, outputs, caches, options = None ):
+    tasks = pipeline_tasks( token, url, src_uuid, outputs, caches, options )
+
+    return( run_tasks( tasks, [ 'validated' ] )[ 'validated' ] )
+
+#
+# Load the per-output caches for a source BP from a state file, if we have one
+#
+def load_caches( state_path, src_uuid ):
+    state = {}
+
+    if state_path:
+        state = aosUtil.load_state( state_path )
+
+    if state.get( 'src_uuid' ) != src_uuid:
+        return( {} )
+
+    return( state.get( 'outputs', {} ) )
+
+#
+# Save the per-output caches for the next run
+#
+def save_caches( state_path, src_uuid, caches ):
+    if state_path:
+        aosUtil.save_state( state_path, { 'src_uuid': src_uuid, 'outputs': caches } )
+
+#
+# Poll the version of the source BP and regenerate the outputs only when it
+# changes.  A burst of edits keeps bumping the version, so we wait until it
+# has held still for 'debounce' seconds before rebuilding.  Only outputs
+# whose values changed are published.  Transient errors are reported and
+# retried on the next poll, and a version that fails validation is skipped;
+# anything else ends the watch.
+#
+def watch( token, url, src_uuid, dst_uuid, outputs, interval, debounce,
+           state_path = None, options = None ):
+    caches = load_caches( state_path, src_uuid )
+    last_version = aosUtil.get_bp_version( token, url, src_uuid )
+    last_results = generate( token, url, src_uuid, outputs, caches, options )
+    save_caches( state_path, src_uuid, caches )
+    publish( token, url, dst_uuid, last_results, options )
+    seen_version = last_version
+    seen_at = time.monotonic()
+
+    print( 'Watching source blueprint at version ' + str( last_version ) +
+           ', polling every ' + str( interval ) + 's.  Ctrl-C to stop.\n' )
+
+    try:
+        while True:
+            time.sleep( interval )
+            bp_version = aosUtil.get_bp_version( token, url, src_uuid )
+
+            if bp_version == '' or bp_version == last_version:
+                continue
+
+            if bp_version != seen_version:
+                print( 'Source blueprint changed to version ' + str( bp_version ) + '.\n' )
+                seen_version = bp_version
+                seen_at = time.monotonic()
+
+            if time.monotonic() - seen_at < debounce:
+                continue
+
+            # A hiccup on the controller shouldn't end the watch.  We try
+            # again on the next poll.
+            try:
+                results = generate( token, url, src_uuid, outputs, caches, options )
+                save_caches( state_path, src_uuid, caches )
+                last_version = bp_version
+                changed = { output: values for output, values in results.items()
+                            if values != last_results.get( output ) }
+
+                if not changed:
+                    print( 'No change to any property set, nothing to publish.\n' )
+                    continue
+
+                publish( token, url, dst_uuid, changed, options )
+                last_results.update( changed )
+
+            except aosUtil.TransientError as e:
+                print( str( e ) + '  Will try again on the next poll.\n' )
+
+            # No point rebuilding this version again.  Wait for a fix.
+            except aosUtil.ValidationError as e:
+                print( str( e ) + '  Waiting for the source blueprint to change.\n' )
+                last_version = bp_version
+
+    except KeyboardInterrupt:
+        print( '\nStopped watching.\n' )
+
+
+#########################################
+# Command line shared by the generators #
+#########################################
+
+#
+# Let the user commit-check the SRX blueprint, and deploy it if they like.
+# With wait, follow the deploy out to the SRX's for up to wait seconds, and
+# only call it a success if they all took it.
+#
+def commit_and_deploy( token, url, dst_uuid, wait = 0 ):
+    cc_success = aosUtil.commit_check( token, url, dst_uuid )
+    while not cc_success:
+        choice = ''
+        print( 'How would you like to proceed?' )
+        print( '  [ 1 ] Re-run the commit-check operation' )
+        print( '  [ 2 ] Revert staged changes back to the current deployed blueprint\n' )
+        print( '  Any other entry will do nothing and just quit.\n' )
+
+        while choice == '':
+            choice = input( 'Choice: ' )
+
+        if choice == '1':
+            cc_success = aosUtil.commit_check( token, url, dst_uuid )
+
+        elif choice == '2':
+            choice = ''
+            aosUtil.revert_bp( token, url, dst_uuid )
+
+        else:
+            return( False )
+
+    choice = ''
+    while choice == '':
+        choice = input( 'Would you like to commit changes to the SRX blueprint? [y|n]:  ')
+
+    if choice != 'y' and choice != 'Y':
+        return( False )
+
+    before = orchestrate.anomaly_snapshot( token, url, dst_uuid ) if wait else None
+
+    if not aosUtil.deploy_bp( token, url, dst_uuid ):
+        return( False )
+
+    if wait:
+        return( orchestrate.rollout_ok( orchestrate.wait_for_deploy( token, url, dst_uuid, wait, before ) ) )
+
+    return( True )
+
+#
+# Resolve a blueprint UUID or name to a UUID from the blueprint index,
+# checking it's freeform (or isn't, for a source).  Raises NotFoundError
+# or ValidationError.
+#
+def resolve_bp( token, url, bp_name, freeform ):
+    bp = aosUtil.find_bp( token, url, bp_name )
+
+    if bp is None:
+        raise aosUtil.NotFoundError( 'No blueprint found with UUID or name ' + bp_name + '.' )
+
+    if freeform and bp[ 'design' ] != 'freeform':
+        raise aosUtil.ValidationError( 'Destination blueprint must be a freeform design.' )
+
+    if not freeform and bp[ 'design' ] == 'freeform':
+        raise aosUtil.ValidationError( 'Source blueprint must be a reference design.' )
+
+    return( bp[ 'id' ] )
+
+#
+# Same, but keep asking until we get a usable blueprint.  Everything comes
+# from the blueprint index, so this costs at most one list call.
+#
+def choose_bp( token, url, bp_name, prompt, freeform ):
+    bp_id = ''
+
+    while bp_id == '':
+        if bp_name == '':
+            bp_name = input( prompt )
+            continue
+
+        try:
+            bp_id = resolve_bp( token, url, bp_name, freeform )
+
+        except ( aosUtil.NotFoundError, aosUtil.ValidationError ) as e:
+            print( 'Error.  ' + str( e ) + '\n' )
+
+        bp_name = ''
+
+    return( bp_id )
+
+#
+# The whole command line tool: login, pick the blueprints, generate and
+# publish the requested outputs (or watch), then commit-check and deploy.
+# argv is the arguments to parse, sys.argv[ 1: ] by default.
+#
+def main( description, default_outputs, argv = None ):
+    print( '\n\n' )
+
+    parser = aosUtil.build_arg_parser( description )
+    parser.add_argument( '-s', '--src', type=str, help='UUID or name of source (reference) blueprint' )
+    parser.add_argument( '-d', '--dst', type=str, help='UUID or name of SRX (freeform) blueprint' )
+    parser.add_argument( '-o', '--outputs', type=str, default=','.join( default_outputs ),
+                         help='Comma-separated property sets to generate from one collection: ' +
+                              ', '.join( GENERATORS ) + ' (default ' + ','.join( default_outputs ) + ')' )
+    parser.add_argument( '-w', '--watch', action='store_true',
+                         help='Keep running and republish whenever the source blueprint changes' )
+    parser.add_argument( '-i', '--interval', type=float, default=30,
+                         help='Seconds between version polls in watch mode (default 30)' )
+    parser.add_argument( '--debounce', type=float, default=10,
+                         help='Seconds the source must be unchanged before rebuilding (default 10)' )
+    parser.add_argument( '--border-tags', type=str, default=BORDER_TAGS,
+                         help='Tag pattern for border leaves (default ' + BORDER_TAGS + ')' )
+    parser.add_argument( '--fw-tags', type=str, default=FW_TAGS,
+                         help='Tag pattern for firewalls (default ' + FW_TAGS + ')' )
+    parser.add_argument( '--state', type=str,
+                         help='File that keeps per-VRF fingerprints between runs, so only changed VRFs are rebuilt' )
+    parser.add_argument( '--shard-bytes', type=int, default=0,
+                         help='Split property sets larger than this into shards plus an index (default: no sharding)' )
+    parser.add_argument( '--remove-unsharded', action='store_true',
+                         help='With --shard-bytes, delete the unsharded property set once the shards are published' )
+    parser.add_argument( '--publish-workers', type=int, default=4,
+                         help='Shards to publish in parallel (default 4)' )
+    parser.add_argument( '--no-validate', action='store_true',
+                         help='Publish without checking the peering addresses first' )
+    parser.add_argument( '--stream', type=str, metavar='DIR',
+                         help='Stream property sets to files in DIR as they are built, and upload from there, '
+                              'so the property set is never held in memory on very large fabrics' )
+    parser.add_argument( '--wait', type=float, default=0, metavar='SECONDS',
+                         help='After deploying, follow the rollout to every system for up to SECONDS' )
+    parser.add_argument( '--inventory', type=str, metavar='FILE',
+                         help='Sync the source blueprint into this SQLite inventory and read the inputs from it' )
+    journaling.add_journal_args( parser )
+    memprofile.add_memprofile_args( parser )
+    args = parser.parse_args( argv )
+
+    if args.stream and args.shard_bytes:
+        parser.error( '--stream and --shard-bytes can\'t be used together' )
+
+    if args.remove_unsharded and not args.shard_bytes:
+        parser.error( '--remove-unsharded only goes with --shard-bytes' )
+
+    if args.stream and not os.path.isdir( args.stream ):
+        parser.error( 'no such directory ' + args.stream )
+
+    outputs = [ output for output in args.outputs.split( ',' ) if output ]
+    for output in outputs:
+        if output not in GENERATORS:
+            parser.error( 'unknown output ' + output + ', choose from ' + ', '.join( GENERATORS ) )
+
+    if args.watch and args.journal:
+        parser.error( '--journal is for one-shot runs, watch mode only publishes what changed anyway' )
+
+    if args.watch and args.memprofile:
+        parser.error( '--memprofile is for one-shot runs' )
+
+    journal = journaling.journal_from_args( parser, args )
+    options = { 'border_tags': args.border_tags, 'fw_tags': args.fw_tags,
+                'shard_bytes': args.shard_bytes, 'publish_workers': args.publish_workers,
+                'remove_unsharded': args.remove_unsharded,
+                'stream_dir': args.stream or '',
+                'validate': not args.no_validate, 'inventory': args.inventory or '' }
+
+    profile = memprofile.MemProfile() if args.memprofile else None
+
+    #
+    # Let's login to the Apstra instance
+    #
+    with memprofile.profile_phase( profile, 'login' ):
+        login_dict = aosUtil.login_dict_from_args( args )
+        login_dict = aosUtil.complete_login_dict( login_dict )
+        base_url = aosUtil.build_base_url( login_dict )
+        token = aosUtil.login( base_url, login_dict[ 'user' ], login_dict ['password' ] )
+
+        if not ( args.src and args.dst ):
+            aosUtil.get_bp_list( token, base_url )
+
+        #
+        # We need a reference fabric as the source and a freeform fabric as
+        # the destination for our operations here.
+        #
+        src_uuid = choose_bp( token, base_url, args.src or '',
+                              'Enter UUID or name of source (reference) blueprint: ', False )
+        dst_uuid = choose_bp( token, base_url, args.dst or '',
+                              'Enter UUID or name of SRX (freeform) blueprint: ', True )
+
+    #
+    # In watch mode we just keep the property sets in sync.  Commit-check
+    # and deploy stay a deliberate, interactive step.
+    #
+    if args.watch:
+        watch( token, base_url, src_uuid, dst_uuid, outputs, args.interval, args.debounce,
+               args.state, options )
+
+    else:
+        caches = load_caches( args.state, src_uuid )
+        timings = { }
+        tasks = pipeline_tasks( token, base_url, src_uuid, outputs, caches, options, dst_uuid, journal )
+        tasks[ 'caches_saved' ] = ( lambda results: save_caches( args.state, src_uuid, caches ), [ 'validated' ] )
+        workers = TASK_WORKERS
+
+        # Each task is a phase of its own, run one at a time so its memory
+        # can be told apart
+        if profile:
+            tasks = profile.wrap_tasks( tasks )
+            workers = 1
+
+        run_tasks( tasks, [ 'published', 'caches_saved' ], workers, timings )
+        print( timing_summary( timings ) + '\n' )
+
+        if journal:
+            journal.close()
+
+        with memprofile.profile_phase( profile, 'deploy' ):
+            commit_and_deploy( token, base_url, dst_uuid, args.wait )
+
+        if profile:
+            profile.print_report()
+            profile.save( args.memprofile )
+            profile.stop()
+
+    #
+    # Time to declare victory and logout!
+    #
+    aosUtil.logout( token, base_url )
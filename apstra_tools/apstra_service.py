@@ -0,0 +1,376 @@
+'''
+apstra_service.py
+    A resident worker for the tools in this repo.  It stays logged in to
+    each controller it talks to and keeps the pooled session, the
+    blueprint index and the per-VRF generator caches warm between jobs.
+    A job then only costs the requests for whatever actually changed,
+    instead of interpreter start, imports, login and a cold rebuild.
+
+    Jobs are JSON POSTs to a small HTTP API on localhost:
+        POST /jobs/generate       { src, dst, outputs, options, publish }
+        POST /jobs/set_timers     { bp, timers }
+        POST /jobs/commit_check   { bp }
+        GET  /status
+    Any job can carry a 'login' dict ( user, password, target, port ) to
+    use a controller other than the one the service was started with.
+    Jobs are checked against JOB_FIELDS before they run, and a generate
+    job can only set the options in JOB_OPTIONS: nothing that names a
+    local file or directory.  apstra_job.py is a thin command line client.
+
+    The API has no authentication of its own and jobs carry controller
+    passwords, so it only listens on a loopback address unless started
+    with --allow-remote.
+
+    Run it with:
+        apstra-tools service [ -u USER -p PASSWORD -t TARGET -P PORT ] [ --listen HOST:PORT ]
+'''
+
+import ipaddress
+import json
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from apstra_tools import apstra_utils as aosUtil
+from apstra_tools import apstra_pipeline as pipeline
+
+SERVICE_LISTEN = '127.0.0.1:8765'
+# HTTP status for each kind of failure a job can hit
+ERROR_HTTP_STATUS = { 'AuthError': 502, 'NotFoundError': 404, 'ConflictError': 409,
+                      'TransientError': 503, 'ValidationError': 400 }
+# The fields each job takes, as name -> ( type, required ).  Any job can
+# also carry a login.
+JOB_FIELDS = {
+    'generate': { 'src': ( str, True ), 'dst': ( str, True ), 'outputs': ( list, False ),
+                  'options': ( dict, False ), 'publish': ( bool, False ) },
+    'set_timers': { 'bp': ( str, True ), 'timers': ( dict, True ) },
+    'commit_check': { 'bp': ( str, True ) },
+}
+LOGIN_FIELDS = { 'user': ( str, True ), 'password': ( str, True ), 'target': ( str, True ),
+                 'port': ( str, False ) }
+# The generator options a job may set.  Paths on the service's host
+# (stream_dir, inventory) are for whoever runs the service, not for anyone
+# who can reach its port.
+JOB_OPTIONS = { 'border_tags': str, 'fw_tags': str, 'shard_bytes': int, 'publish_workers': int,
+                'remove_unsharded': bool, 'validate': bool }
+
+
+#
+# Everything the service keeps between jobs
+#
+class Worker:
+    def __init__( self, default_login = None ):
+        self.default_login = default_login
+        self.logins = { }
+        self.caches = { }
+        self.last_results = { }
+        self.locks = { }
+        self.lock = threading.Lock()
+        self.jobs_run = 0
+
+    #
+    # Token and base URL for a login dict, logging in only the first time
+    # we see that controller and user (or if the password changed)
+    def connect( self, login_dict = None ):
+        login_dict = login_dict or self.default_login
+
+        if not login_dict:
+            raise aosUtil.ValidationError( 'Job has no login and the service has no default controller.' )
+
+        base_url = aosUtil.build_base_url( dict( { 'port': '443' }, **login_dict ) )
+        key = ( base_url, login_dict[ 'user' ] )
+        password_fp = aosUtil.fingerprint( login_dict[ 'password' ] )
+
+        with self.lock_for( key ):
+            known = self.logins.get( key )
+
+            if not known or known[ 'password_fp' ] != password_fp:
+                token = aosUtil.login( base_url, login_dict[ 'user' ], login_dict[ 'password' ] )
+                self.logins[ key ] = { 'password_fp': password_fp, 'token': token }
+
+        return( self.logins[ key ][ 'token' ], base_url )
+
+    #
+    # One lock per key, so jobs on the same thing queue up and the rest
+    # run side by side
+    def lock_for( self, key ):
+        with self.lock:
+            return( self.locks.setdefault( key, threading.Lock() ) )
+
+    def run( self, kind, job ):
+        check_job( kind, job )
+        token, url = self.connect( job.get( 'login' ) )
+        result = JOBS[ kind ]( self, token, url, job )
+
+        with self.lock:
+            self.jobs_run += 1
+
+        return( result )
+
+    def logout_all( self ):
+        for ( base_url, user ), known in self.logins.items():
+            aosUtil.logout( known[ 'token' ], base_url )
+
+
+############
+# The jobs #
+############
+
+#
+# Raise a ValidationError unless data is a dict holding only the given
+# fields ( name -> ( type, required ) ), each of the right type.  what
+# names data in the message.
+#
+def check_fields( what, data, fields ):
+    if not isinstance( data, dict ):
+        raise aosUtil.ValidationError( what + ' has to be a JSON object.' )
+
+    unknown = sorted( set( data ) - set( fields ) )
+    if unknown:
+        raise aosUtil.ValidationError( what + ' can\'t have ' + ', '.join( unknown ) + ', only ' +
+                                       ', '.join( fields ) + '.' )
+
+    for name, ( kind, required ) in fields.items():
+        if name not in data:
+            if required:
+                raise aosUtil.ValidationError( what + ' needs ' + name + '.' )
+
+        # JSON true and false would pass for numbers otherwise
+        elif not isinstance( data[ name ], kind ) or ( kind is int and isinstance( data[ name ], bool ) ):
+            raise aosUtil.ValidationError( what + ' ' + name + ' has to be a ' + kind.__name__ + '.' )
+
+#
+# Check that a job is one we know and has the shape it should, before any
+# of it runs
+#
+def check_job( kind, job ):
+    if kind not in JOBS:
+        raise aosUtil.ValidationError( 'Unknown job ' + kind + ', choose from ' + ', '.join( JOBS ) + '.' )
+
+    check_fields( 'Job ' + kind, job, dict( JOB_FIELDS[ kind ], login = ( dict, False ) ) )
+
+    if 'login' in job:
+        check_fields( 'Job login', job[ 'login' ], LOGIN_FIELDS )
+
+    if 'options' in job:
+        check_fields( 'Job options', job[ 'options' ],
+                      { name: ( option_type, False ) for name, option_type in JOB_OPTIONS.items() } )
+
+    for output in job.get( 'outputs' ) or [ ]:
+        if not isinstance( output, str ) or output not in pipeline.GENERATORS:
+            raise aosUtil.ValidationError( 'Unknown output ' + str( output ) + ', choose from ' +
+                                           ', '.join( pipeline.GENERATORS ) + '.' )
+
+    for name, interval in ( job.get( 'timers' ) or { } ).items():
+        if not isinstance( interval, int ) or isinstance( interval, bool ):
+            raise aosUtil.ValidationError( 'Timer ' + name + ' has to be a whole number of seconds.' )
+
+#
+# Generate property sets from a source blueprint and publish the ones
+# that changed since the last job for the same source, destination and
+# outputs.  The per-VRF caches stay in memory, so only changed VN's are
+# rebuilt.
+#
+def job_generate( worker, token, url, job ):
+    src_uuid = pipeline.resolve_bp( token, url, job[ 'src' ], False )
+    dst_uuid = pipeline.resolve_bp( token, url, job[ 'dst' ], True )
+    outputs = job.get( 'outputs' ) or [ 'vrf' ]
+    options = dict( pipeline.DEFAULT_OPTIONS, **( job.get( 'options' ) or { } ) )
+    key = ( url, src_uuid, dst_uuid, tuple( outputs ) )
+    summary = { }
+
+    with worker.lock_for( key ):
+        caches = worker.caches.setdefault( key, { } )
+        last_results = worker.last_results.setdefault( key, { } )
+        results = pipeline.generate( token, url, src_uuid, outputs, caches, options )
+        changed = { output: values for output, values in results.items()
+                    if values != last_results.get( output ) }
+
+        if changed and job.get( 'publish', True ):
+            pipeline.publish( token, url, dst_uuid, changed, options )
+            last_results.update( changed )
+
+    for output, values in results.items():
+        streamed = isinstance( values, pipeline.StreamedPropSet )
+        summary[ output ] = { 'vrf_count': values.vrf_count if streamed else len( values.get( 'vrfs', [ ] ) ),
+                              'changed': output in changed,
+                              'published': output in changed and job.get( 'publish', True ) }
+
+    return( summary )
+
+#
+# Set service timers on every system in a blueprint
+#
+def job_set_timers( worker, token, url, job ):
+    bp = aosUtil.find_bp( token, url, job[ 'bp' ] )
+
+    if bp is None:
+        raise aosUtil.NotFoundError( 'No blueprint found with UUID or name ' + job[ 'bp' ] + '.' )
+
+    systems = [ ]
+    for system in aosUtil.iter_systems_in_bp( token, url, bp[ 'id' ] ):
+        aosUtil.set_service_timers( token, url, system, job[ 'timers' ] )
+        systems.append( system )
+
+    return( { 'systems': systems } )
+
+#
+# Commit-check a blueprint
+#
+def job_commit_check( worker, token, url, job ):
+    bp = aosUtil.find_bp( token, url, job[ 'bp' ] )
+
+    if bp is None:
+        raise aosUtil.NotFoundError( 'No blueprint found with UUID or name ' + job[ 'bp' ] + '.' )
+
+    return( { 'passed': aosUtil.commit_check( token, url, bp[ 'id' ] ) } )
+
+JOBS = {
+    'generate': job_generate,
+    'set_timers': job_set_timers,
+    'commit_check': job_commit_check,
+}
+
+
+###############
+# The service #
+###############
+
+class ServiceHandler( BaseHTTPRequestHandler ):
+    worker = None
+
+    def log_message( self, format, *args ):
+        pass
+
+    def send_json( self, status, body ):
+        payload = json.dumps( body ).encode()
+        self.send_response( status )
+        self.send_header( 'Content-Type', 'application/json' )
+        self.send_header( 'Content-Length', str( len( payload ) ) )
+        self.end_headers()
+        self.wfile.write( payload )
+
+    def do_GET( self ):
+        if self.path != '/status':
+            return( self.send_json( 404, { 'ok': False, 'message': 'Not found' } ) )
+
+        self.send_json( 200, { 'ok': True,
+                               'controllers': sorted( url for url, user in self.worker.logins ),
+                               'jobs_run': self.worker.jobs_run,
+                               'scheduler': aosUtil.scheduler_stats(),
+                               'query_cache': aosUtil.query_cache_stats(),
+                               'transfer': aosUtil.transfer_stats() } )
+
+    def do_POST( self ):
+        if not self.path.startswith( '/jobs/' ):
+            return( self.send_json( 404, { 'ok': False, 'message': 'Not found' } ) )
+
+        kind = self.path[ len( '/jobs/' ): ]
+        start = time.monotonic()
+
+        try:
+            length = int( self.headers.get( 'Content-Length' ) or 0 )
+            job = json.loads( self.rfile.read( length ) ) if length else { }
+            result = self.worker.run( kind, job )
+
+        except aosUtil.ApstraError as e:
+            error = type( e ).__name__
+            print( 'Job ' + kind + ' failed.  ' + str( e ) + '\n' )
+            return( self.send_json( ERROR_HTTP_STATUS.get( error, 500 ),
+                                    { 'ok': False, 'error': error, 'message': str( e ) } ) )
+
+        except ( KeyError, ValueError ) as e:
+            return( self.send_json( 400, { 'ok': False, 'error': 'ValidationError',
+                                           'message': 'Bad job: ' + repr( e ) } ) )
+
+        # Anything else is a bug or a local problem, but the client still
+        # gets an answer and the service carries on
+        except Exception as e:
+            print( 'Job ' + kind + ' failed unexpectedly.  ' + repr( e ) + '\n' )
+            return( self.send_json( 500, { 'ok': False, 'error': type( e ).__name__,
+                                           'message': 'Job failed: ' + repr( e ) } ) )
+
+        self.send_json( 200, { 'ok': True, 'result': result,
+                               'seconds': round( time.monotonic() - start, 3 ) } )
+
+#
+# Is the host part of a --listen address a loopback address?
+#
+def is_loopback( host ):
+    if host == 'localhost':
+        return( True )
+
+    try:
+        return( ipaddress.ip_address( host.strip( '[]' ) ).is_loopback )
+
+    except ValueError:
+        return( False )
+
+#
+# Start the service on a background thread.  Returns the server (call
+# shutdown() when done) and its base URL.
+#
+def start_service( worker, listen = SERVICE_LISTEN ):
+    host, port = listen.rsplit( ':', 1 )
+    handler = type( 'Handler', ( ServiceHandler, ), { 'worker': worker } )
+    server = ThreadingHTTPServer( ( host, int( port ) ), handler )
+    threading.Thread( target = server.serve_forever, daemon = True ).start()
+    base_url = 'http://' + host + ':' + str( server.server_address[ 1 ] )
+
+    return( server, base_url )
+
+#
+# Run the worker until Ctrl-C.  Returns the exit status.
+#
+def main( argv = None ):
+    parser = aosUtil.build_arg_parser( 'Resident worker for the Apstra tools.' )
+    parser.add_argument( '--listen', type=str, default=SERVICE_LISTEN,
+                         help='Address to take jobs on (default ' + SERVICE_LISTEN + ')' )
+    parser.add_argument( '--allow-remote', action='store_true',
+                         help='Allow a --listen address other than loopback.  Anyone who can reach it can run '
+                              'jobs, and job requests carry passwords in the clear.' )
+    args = parser.parse_args( argv )
+    worker = Worker()
+    server = None
+
+    if ':' not in args.listen:
+        parser.error( '--listen takes HOST:PORT' )
+
+    host = args.listen.rsplit( ':', 1 )[ 0 ]
+    if not is_loopback( host ):
+        if not args.allow_remote:
+            parser.error( 'the service has no authentication, so it only listens on loopback.  '
+                          'Pass --allow-remote to listen on ' + host + ' anyway.' )
+
+        print( '*' * 72 )
+        print( 'WARNING: taking jobs on ' + host + ' with no authentication.  Anyone who can reach it' )
+        print( 'can run jobs against your controllers, and passwords in job requests cross' )
+        print( 'the network unencrypted.' )
+        print( '*' * 72 + '\n' )
+
+    try:
+        # With a controller on the command line, log in now so the first
+        # job is warm too
+        if args.target:
+            worker.default_login = aosUtil.complete_login_dict( aosUtil.login_dict_from_args( args ) )
+            worker.connect()
+
+        server, base_url = start_service( worker, args.listen )
+        print( 'Taking jobs at ' + base_url + '.  Ctrl-C to stop.\n' )
+        threading.Event().wait()
+
+    except aosUtil.ApstraError as e:
+        print( 'Error.  ' + str( e ) + '  Quitting.\n' )
+        return( 1 )
+
+    except KeyboardInterrupt:
+        if server:
+            server.shutdown()
+
+        worker.logout_all()
+
+    return( 0 )
+
+
+if __name__ == '__main__':
+    quit( main() )
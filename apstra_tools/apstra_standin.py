@@ -0,0 +1,409 @@
+'''
+apstra_standin.py
+    A small local stand-in for the Apstra REST API, for exercising the
+    library without a controller.  It serves a synthetic fabric from memory
+    and honors the 'page' and 'page_size' parameters on the collection
+    endpoints the same way the iter_* helpers in apstra_utils expect.
+    With the fixture's 'paging_fields' off, pages come back without the
+    'page' and 'total_count' fields, like servers that don't echo them.
+    GET replies carry an ETag and answer a matching If-None-Match with a
+    304, and larger bodies are gzipped for clients that accept it.  The
+    body bytes it sends are counted in the fixture's 'bytes_sent'.
+
+    Commit-checks pass, except on the blueprints in the fixture's
+    'failing_checks', and a blueprint in 'check_errors' answers the
+    commit-check itself with the status given there.  Reverts are listed
+    in 'reverts'.  A deploy rolls out to the systems one after another
+    over the fixture's 'rollout_seconds', and the systems listed in
+    'failing_systems' fail it.  The blueprint's anomalies show where each
+    system is: a config anomaly until it has taken the deploy, and a
+    deployment anomaly if it failed.  'old_anomalies' are deployment
+    anomalies left from an earlier deploy, and 'stuck_systems' never take
+    a deploy at all.
+
+    Run it on its own with:
+        apstra-tools standin [ port ] [ number_of_vns ]
+    and point the library at http://127.0.0.1:<port>/api
+'''
+
+import argparse as ap
+import gzip
+import hashlib
+import json
+import re
+import secrets
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+
+#
+# Build a synthetic fabric: a reference design blueprint with vn_count
+# VN's (every other one tagged 'peer_to_fw'), a pair of border leaves and
+# a pair of tagged firewalls, plus an empty freeform blueprint
+#
+def make_fixture( vn_count = 100, sys_count = 4, bp_count = 2 ):
+    vns = {}
+    systems = {}
+
+    for i in range( vn_count ):
+        vn_id = 'vn-' + str( i )
+        net = '10.' + str( i // 256 ) + '.' + str( i % 256 ) + '.'
+        vns[ vn_id ] = {
+            'id': vn_id,
+            'label': 'vn_' + str( i ),
+            'security_zone_id': 'sz-' + str( i % 8 ),
+            'reserved_vlan_id': 100 + i % 3900,
+            'ipv4_subnet': net + '0/29',
+            'tags': [ 'peer_to_fw' ] if i % 2 == 0 else [],
+            'svi_ips': [ { 'system_id': 'leaf-1', 'ipv4_addr': net + '2/29' },
+                         { 'system_id': 'leaf-2', 'ipv4_addr': net + '3/29' } ],
+            'floating_ips': [ { 'ipv4_addr': net + '4/29', 'generic_system_ids': [ 'fw-1' ] },
+                              { 'ipv4_addr': net + '5/29', 'generic_system_ids': [ 'fw-2' ] } ],
+        }
+
+    for i in range( 1, sys_count + 1 ):
+        sys_id = 'leaf-' + str( i )
+        tags = [ 'border' + str( i ) ] if i <= 2 else []
+        systems[ sys_id ] = {
+            'node_id': sys_id,
+            'hostname': 'leaf' + str( i ),
+            'system_tags': tags,
+            'bgpService': { 'asn': str( 65100 + i ) },
+            'loopback': '10.255.0.' + str( i ) + '/32',
+            'interface': { 'ae1': { 'intfName': 'ae1', 'tags': [ 'fw_node1' ] },
+                           'ae2': { 'intfName': 'ae2', 'tags': [ 'fw_node2' ] } } if tags else {},
+        }
+
+    security_zones = { 'sz-' + str( i ): { 'id': 'sz-' + str( i ), 'label': 'VRF' + str( i ),
+                                           'vrf_name': 'VRF' + str( i ), 'sz_type': 'evpn',
+                                           'vni_id': 20000 + i, 'vlan_id': 3000 + i,
+                                           'rt_policy': { 'import_RTs': [ str( 20000 + i ) + ':1' ],
+                                                          'export_RTs': [ str( 20000 + i ) + ':1' ] } }
+                       for i in range( 8 ) }
+
+    firewalls = { 'fw-' + str( i ): { 'label': 'fw' + str( i ), 'tags': [ 'fw_node' + str( i ) ],
+                                      'asn': str( 65200 + i ) }
+                  for i in ( 1, 2 ) }
+
+    blueprints = [ { 'id': 'bp-ref', 'label': 'dc1', 'design': 'two_stage_l3clos', 'version': 1 },
+                   { 'id': 'bp-srx', 'label': 'srx', 'design': 'freeform', 'version': 1 } ]
+    for i in range( 2, bp_count ):
+        blueprints.append( { 'id': 'bp-' + str( i ), 'label': 'bp_' + str( i ),
+                             'design': 'freeform', 'version': 1 } )
+
+    return( { 'blueprints': blueprints, 'virtual_networks': vns, 'systems': systems,
+              'firewalls': firewalls, 'security_zones': security_zones, 'property_sets': {},
+              'service_timers': {}, 'deploys': {}, 'rollout_seconds': 1.0, 'failing_systems': set(),
+              'failing_checks': set(), 'check_errors': {}, 'reverts': [],
+              'old_anomalies': {}, 'stuck_systems': set(),
+              'latency': 0.0, 'paging_fields': True, 'busy_replies': [],
+              'tokens': set(), 'check_tokens': False, 'bytes_sent': 0 } )
+
+#
+# Slice a collection if the request asked for a page.  Dict collections
+# keep their insertion order, so pages are stable.  Without echo, the
+# reply doesn't say which page it is or how many entries there are.
+#
+def paginate( items, query, echo = True ):
+    if 'page' not in query:
+        return( items, {} )
+
+    page = int( query[ 'page' ][ 0 ] )
+    page_size = int( query.get( 'page_size', [ '100' ] )[ 0 ] )
+    start = ( page - 1 ) * page_size
+    paging = { 'page': page, 'page_size': page_size, 'total_count': len( items ) } if echo else {}
+
+    if isinstance( items, dict ):
+        return( dict( list( items.items() )[ start : start + page_size ] ), paging )
+
+    return( items[ start : start + page_size ], paging )
+
+
+# Bodies bigger than this are gzipped if the client accepts it
+GZIP_MIN_BYTES = 1024
+
+
+class StandinHandler( BaseHTTPRequestHandler ):
+    fixture = None
+
+    def log_message( self, format, *args ):
+        pass
+
+    def send_json( self, status, body = None, extra_headers = None ):
+        payload = json.dumps( body ).encode() if body is not None else b''
+        headers = dict( { 'Content-Type': 'application/json' }, **( extra_headers or {} ) )
+
+        if self.command == 'GET' and status == 200:
+            headers[ 'ETag' ] = '"' + hashlib.sha1( payload ).hexdigest()[ :16 ] + '"'
+
+            if self.headers.get( 'If-None-Match' ) == headers[ 'ETag' ]:
+                status, payload = 304, b''
+
+        if len( payload ) > GZIP_MIN_BYTES and 'gzip' in self.headers.get( 'Accept-Encoding', '' ):
+            headers[ 'Content-Encoding' ] = 'gzip'
+            payload = gzip.compress( payload, compresslevel = 1 )
+
+        self.send_response( status )
+        for name, value in headers.items():
+            self.send_header( name, value )
+        self.send_header( 'Content-Length', str( len( payload ) ) )
+        self.end_headers()
+        self.wfile.write( payload )
+        self.fixture[ 'bytes_sent' ] += len( payload )
+
+    def read_json( self ):
+        length = int( self.headers.get( 'Content-Length' ) or 0 )
+
+        return( json.loads( self.rfile.read( length ) ) if length else {} )
+
+    def do_HEAD( self ):
+        self.send_json( 200 )
+
+    def do_GET( self ):
+        self.route( 'GET' )
+
+    def do_POST( self ):
+        self.route( 'POST' )
+
+    def do_PATCH( self ):
+        self.route( 'PATCH' )
+
+    def do_PUT( self ):
+        self.route( 'PUT' )
+
+    def do_DELETE( self ):
+        self.route( 'DELETE' )
+
+    def route( self, method ):
+        fx = self.fixture
+        parsed = urlparse( self.path )
+        query = parse_qs( parsed.query )
+        path = parsed.path
+
+        # Seconds every reply takes, to look more like a real controller
+        time.sleep( fx[ 'latency' ] )
+
+        # The next requests are turned away, without being acted on, with
+        # the ( status, Retry-After ) pairs in 'busy_replies'
+        if fx[ 'busy_replies' ]:
+            status, retry_after = fx[ 'busy_replies' ].pop( 0 )
+            self.rfile.read( int( self.headers.get( 'Content-Length' ) or 0 ) )
+            return( self.send_json( status, { 'errors': 'Busy' },
+                                    { 'Retry-After': retry_after } if retry_after else None ) )
+
+        if path == '/api/aaa/login':
+            fx[ 'token_seq' ] = fx.get( 'token_seq', 0 ) + 1
+            token = 'standin-' + secrets.token_hex( 16 )
+            fx[ 'tokens' ].add( token )
+            return( self.send_json( 201, { 'token': token } ) )
+
+        # With check_tokens set, only tokens from login are accepted.  Clear
+        # 'tokens' to expire them all.
+        if fx[ 'check_tokens' ] and self.headers.get( 'AUTHTOKEN' ) not in fx[ 'tokens' ]:
+            return( self.send_json( 401, { 'errors': 'Invalid token' } ) )
+
+        if path == '/api/aaa/logout':
+            return( self.send_json( 200, {} ) )
+
+        # Service timers on a managed system, kept as { 'sys/service': interval }
+        m = re.match( r'/api/systems/([^/]+)/services/?([^/]*)$', path )
+        if m and m.group( 1 ) in fx[ 'systems' ]:
+            body = self.read_json()
+
+            if method == 'PUT':
+                fx[ 'service_timers' ][ m.group( 1 ) + '/' + m.group( 2 ) ] = body[ 'interval' ]
+
+            return( self.send_json( 200, {} ) )
+
+        if path == '/api/blueprints':
+            items, paging = paginate( fx[ 'blueprints' ], query, fx[ 'paging_fields' ] )
+            return( self.send_json( 200, dict( paging, items = items ) ) )
+
+        m = re.match( r'/api/blueprints/([^/]+)(/.*)?$', path )
+        bp = m and [ bp for bp in fx[ 'blueprints' ] if bp[ 'id' ] == m.group( 1 ) ]
+        if not bp:
+            return( self.send_json( 404, { 'errors': 'Not found' } ) )
+
+        rest = m.group( 2 ) or ''
+        parts = rest.split( '/' ) + [ '', '' ]
+
+        if rest == '':
+            return( self.send_json( 200, bp[ 0 ] ) )
+
+        if rest == '/diff-status':
+            return( self.send_json( 200, { 'staging_version': bp[ 0 ][ 'version' ] } ) )
+
+        if rest == '/commit-check' and bp[ 0 ][ 'id' ] in fx[ 'check_errors' ]:
+            return( self.send_json( fx[ 'check_errors' ][ bp[ 0 ][ 'id' ] ], { 'errors': 'Cannot run commit-check' } ) )
+
+        if rest == '/commit-check-result' and bp[ 0 ][ 'id' ] in fx[ 'failing_checks' ]:
+            return( self.send_json( 400, { 'errors': 'Commit-check failed on leaf-1' } ) )
+
+        if rest == '/commit-check' or rest == '/commit-check-result':
+            return( self.send_json( 200, {} ) )
+
+        if rest == '/revert' and method == 'POST':
+            fx[ 'reverts' ].append( bp[ 0 ][ 'id' ] )
+            return( self.send_json( 202, {} ) )
+
+        deploy = fx[ 'deploys' ].setdefault( bp[ 0 ][ 'id' ], { 'version': 0, 'started': 0.0, 'at': 0.0 } )
+
+        if rest == '/deploy' and method == 'PUT':
+            deploy.update( version = self.read_json()[ 'version' ], started = time.monotonic(), at = time.time() )
+            return( self.send_json( 202, {} ) )
+
+        if rest == '/deploy':
+            return( self.send_json( 200, { 'version': deploy[ 'version' ] } ) )
+
+        # Systems take a deploy in turn, spread over rollout_seconds.  Until
+        # its turn a system has a config anomaly, and after it the systems
+        # in failing_systems have a deployment anomaly.  The deployment
+        # anomalies in old_anomalies are left from an earlier deploy and
+        # go once the system takes one.  Systems in stuck_systems never
+        # take a deploy, and raise nothing new.
+        if rest == '/anomalies':
+            items = [ ]
+
+            for turn, sys_id in enumerate( fx[ 'systems' ], 1 ):
+                stuck = sys_id in fx[ 'stuck_systems' ]
+                taken = deploy[ 'version' ] and not stuck and time.monotonic() - deploy[ 'started' ] >= \
+                        turn / len( fx[ 'systems' ] ) * fx[ 'rollout_seconds' ]
+                raised = [ ]
+
+                if sys_id in fx[ 'old_anomalies' ] and not taken:
+                    raised.append( ( 'deployment', fx[ 'old_anomalies' ][ sys_id ], 0.0 ) )
+                if deploy[ 'version' ] and not taken and not stuck:
+                    raised.append( ( 'config', 'out of sync', deploy[ 'at' ] ) )
+                if taken and sys_id in fx[ 'failing_systems' ]:
+                    raised.append( ( 'deployment', 'Commit failed on device', deploy[ 'at' ] ) )
+
+                for kind, actual, changed in raised:
+                    items.append( { 'id': kind + '-' + sys_id, 'anomaly_type': kind, 'severity': 'critical',
+                                    'identity': { 'anomaly_type': kind, 'system_id': sys_id },
+                                    'expected': { 'value': 'in sync' }, 'actual': { 'value': actual },
+                                    'last_modified_at': time.strftime( '%Y-%m-%dT%H:%M:%S', time.gmtime( changed ) ) +
+                                                        '.' + str( int( changed * 1000 ) % 1000 ).zfill( 3 ) + 'Z' } )
+
+            return( self.send_json( 200, { 'items': items, 'count': len( items ) } ) )
+
+        if rest == '/virtual-networks':
+            items, paging = paginate( fx[ 'virtual_networks' ], query, fx[ 'paging_fields' ] )
+            return( self.send_json( 200, dict( paging, virtual_networks = items ) ) )
+
+        if parts[ 1 ] == 'virtual-networks' and parts[ 2 ] in fx[ 'virtual_networks' ]:
+            return( self.send_json( 200, fx[ 'virtual_networks' ][ parts[ 2 ] ] ) )
+
+        qe = self.read_json().get( 'query', '' ) if rest == '/qe' and method == 'POST' else ''
+
+        # The inventory's queries all call the system 'sys': every system,
+        # then their tags, ASN's and loopbacks
+        if qe and "name='sys'" in qe:
+            nodes = [ ( sys_id, sys[ 'hostname' ], 'leaf', sys[ 'system_tags' ], sys[ 'bgpService' ][ 'asn' ],
+                        sys[ 'loopback' ] ) for sys_id, sys in fx[ 'systems' ].items() ]
+            nodes += [ ( fw_id, fw[ 'label' ], 'generic', fw[ 'tags' ], fw[ 'asn' ], '' )
+                       for fw_id, fw in fx[ 'firewalls' ].items() ]
+
+            if "name='tag'" in qe:
+                items = [ { 'tag': { 'label': tag }, 'sys': { 'id': node[ 0 ] } }
+                          for node in nodes for tag in node[ 3 ] ]
+            elif "name='bgp'" in qe:
+                items = [ { 'sys': { 'id': node[ 0 ] }, 'bgp': { 'domain_id': node[ 4 ] } } for node in nodes ]
+            elif "name='lo'" in qe:
+                items = [ { 'sys': { 'id': node[ 0 ] }, 'lo': { 'ipv4_addr': node[ 5 ] } }
+                          for node in nodes if node[ 5 ] ]
+            else:
+                items = [ { 'sys': { 'id': node[ 0 ], 'label': node[ 1 ], 'role': node[ 2 ] } } for node in nodes ]
+
+            return( self.send_json( 200, { 'items': items, 'count': len( items ) } ) )
+
+        # The collectors make two graph queries: tagged border loopbacks and
+        # tagged firewalls
+        if qe and 'loopback' in qe:
+            items = [ { 'tag': { 'label': tag }, 'leaf': { 'id': sys_id, 'label': sys[ 'hostname' ] },
+                        'lo': { 'ipv4_addr': sys[ 'loopback' ] }, 'bgp': { 'domain_id': sys[ 'bgpService' ][ 'asn' ] } }
+                      for sys_id, sys in fx[ 'systems' ].items() for tag in sys[ 'system_tags' ] ]
+            return( self.send_json( 200, { 'items': items, 'count': len( items ) } ) )
+
+        if qe:
+            items = [ { 'tag': { 'label': tag }, 'fw': { 'id': fw_id, 'label': fw[ 'label' ] },
+                        'bgp': { 'domain_id': fw[ 'asn' ] } }
+                      for fw_id, fw in fx[ 'firewalls' ].items() for tag in fw[ 'tags' ] ]
+            return( self.send_json( 200, { 'items': items, 'count': len( items ) } ) )
+
+        if rest == '/security-zones':
+            return( self.send_json( 200, { 'items': fx[ 'security_zones' ] } ) )
+
+        if parts[ 1 ] == 'security-zones' and parts[ 2 ] in fx[ 'security_zones' ]:
+            return( self.send_json( 200, fx[ 'security_zones' ][ parts[ 2 ] ] ) )
+
+        if rest == '/systems':
+            items, paging = paginate( [ { 'system_id': sys_id } for sys_id in fx[ 'systems' ] ], query,
+                                      fx[ 'paging_fields' ] )
+            return( self.send_json( 200, dict( paging, items = items ) ) )
+
+        if rest.endswith( '/config-context' ) and parts[ 2 ] in fx[ 'systems' ]:
+            return( self.send_json( 200, { 'context': json.dumps( fx[ 'systems' ][ parts[ 2 ] ] ) } ) )
+
+        if rest == '/property-sets' and method == 'GET':
+            items, paging = paginate( list( fx[ 'property_sets' ].values() ), query, fx[ 'paging_fields' ] )
+            return( self.send_json( 200, dict( paging, items = items ) ) )
+
+        if rest == '/property-sets' and method == 'POST':
+            ps = self.read_json()
+            fx[ 'ps_seq' ] = fx.get( 'ps_seq', 0 ) + 1
+            ps_id = 'ps-' + str( fx[ 'ps_seq' ] )
+            fx[ 'property_sets' ][ ps_id ] = { 'property_set_id': ps_id, 'label': ps[ 'label' ],
+                                               'values': ps[ 'values' ] }
+            return( self.send_json( 201, { 'id': ps_id } ) )
+
+        if parts[ 1 ] == 'property-sets' and parts[ 2 ] in fx[ 'property_sets' ]:
+            if method == 'PATCH':
+                fx[ 'property_sets' ][ parts[ 2 ] ].update( self.read_json() )
+                return( self.send_json( 204 ) )
+
+            if method == 'DELETE':
+                del fx[ 'property_sets' ][ parts[ 2 ] ]
+                return( self.send_json( 204 ) )
+
+            return( self.send_json( 200, fx[ 'property_sets' ][ parts[ 2 ] ] ) )
+
+        return( self.send_json( 404, { 'errors': 'Not found' } ) )
+
+#
+# Start a stand-in server on a background thread.  Port 0 picks a free
+# port.  Returns the server (call shutdown() when done) and its base URL.
+#
+def start_standin( fixture = None, port = 0 ):
+    handler = type( 'Handler', ( StandinHandler, ), { 'fixture': fixture or make_fixture() } )
+    server = ThreadingHTTPServer( ( '127.0.0.1', port ), handler )
+    threading.Thread( target = server.serve_forever, daemon = True ).start()
+    base_url = 'http://127.0.0.1:' + str( server.server_address[ 1 ] ) + '/api'
+
+    return( server, base_url )
+
+#
+# Serve a fixture until Ctrl-C.  Returns the exit status.
+#
+def main( argv = None ):
+    parser = ap.ArgumentParser( description = 'Local stand-in for the Apstra REST API.' )
+    parser.add_argument( 'port', type=int, nargs='?', default=8443, help='TCP port to listen on (default 8443)' )
+    parser.add_argument( 'vn_count', type=int, nargs='?', default=100,
+                         help='Virtual networks in the fixture (default 100)' )
+    args = parser.parse_args( argv )
+
+    server, base_url = start_standin( make_fixture( args.vn_count ), args.port )
+    print( 'Stand-in Apstra API at ' + base_url + '.  Ctrl-C to stop.\n' )
+
+    try:
+        threading.Event().wait()
+
+    except KeyboardInterrupt:
+        server.shutdown()
+
+    return( 0 )
+
+
+if __name__ == '__main__':
+    quit( main() )
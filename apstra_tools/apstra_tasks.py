@@ -0,0 +1,98 @@
+'''
+apstra_tasks.py
+    Run a small graph of tasks, each started as soon as the tasks it takes
+    its inputs from are done.  Tasks that don't depend on each other run at
+    the same time, so a run takes as long as its longest chain of
+    dependent tasks rather than the sum of them all.
+
+    A task graph is a dict of name -> ( fn, inputs ), where inputs names the
+    tasks whose results fn is called with, in order:
+        tasks = { 'a': ( get_a, [ ] ), 'b': ( get_b, [ ] ),
+                  'ab': ( combine, [ 'a', 'b' ] ) }
+        run_tasks( tasks )[ 'ab' ]
+'''
+
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+TASK_WORKERS = 8
+
+
+#
+# Every task the targets need, directly or through their inputs.  Raises
+# KeyError on an input no task provides, and ValueError on a cycle.
+#
+def needed_tasks( tasks, targets ):
+    needed = { }
+
+    def visit( name, path ):
+        if name in path:
+            raise ValueError( 'Task cycle: ' + ' -> '.join( path + ( name, ) ) )
+
+        if name not in needed:
+            for dep in tasks[ name ][ 1 ]:
+                visit( dep, path + ( name, ) )
+
+            needed[ name ] = tasks[ name ]
+
+    for target in targets:
+        visit( target, ( ) )
+
+    return( needed )
+
+#
+# Run the tasks the targets need (all of them if targets is None), at most
+# workers at once, and return { name: result } for every task that ran.
+# If a task raises, no more tasks are started, the ones running are let
+# finish, and the exception is raised again here.  Pass a dict as timings
+# to get { name: ( start, end ) } in time.monotonic() seconds.
+#
+def run_tasks( tasks, targets = None, workers = TASK_WORKERS, timings = None ):
+    pending = needed_tasks( tasks, list( tasks ) if targets is None else targets )
+    results = { }
+    running = { }
+    timings = timings if timings is not None else { }
+
+    def run_one( name, fn, args ):
+        start = time.monotonic()
+
+        try:
+            return( fn( *args ) )
+
+        finally:
+            timings[ name ] = ( start, time.monotonic() )
+
+    with ThreadPoolExecutor( max_workers = workers ) as pool:
+        while pending or running:
+            for name, ( fn, inputs ) in list( pending.items() ):
+                if all( dep in results for dep in inputs ):
+                    del pending[ name ]
+                    running[ pool.submit( run_one, name, fn, [ results[ dep ] for dep in inputs ] ) ] = name
+
+            done, _ = wait( running, return_when = FIRST_COMPLETED )
+
+            for future in done:
+                name = running.pop( future )
+
+                if future.exception() is not None:
+                    pending.clear()
+                    wait( running )
+                    raise future.exception()
+
+                results[ name ] = future.result()
+
+    return( results )
+
+#
+# One line on how long a run took against the same tasks run one after
+# another, from the timings run_tasks filled in
+#
+def timing_summary( timings ):
+    if not timings:
+        return( 'No tasks ran.' )
+
+    wall = max( end for start, end in timings.values() ) - min( start for start, end in timings.values() )
+    serial = sum( end - start for start, end in timings.values() )
+
+    return( 'Ran ' + str( len( timings ) ) + ' tasks in ' + f'{wall:.2f}' + 's (' + f'{serial:.2f}' +
+            's one after another).' )
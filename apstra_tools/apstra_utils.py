@@ -0,0 +1,1368 @@
+'''
+apstra_utils.py
+    Library of handy fucntions for working with Apstra
+'''
+
+import argparse as ap
+import json
+import getpass
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+# requests (and urllib3 under it) is imported by get_session() the first
+# time a tool actually talks to a controller, so --help and importing the
+# library stay quick
+req = None
+
+###########################
+# Miscellaneous utilities #
+###########################
+
+#
+# Build a parser with the login options every tool takes.  Scripts that
+# need more options add their own before parsing.
+#
+def build_arg_parser( description = 'Generate property sets for SRX blueprint.' ):
+    parser = ap.ArgumentParser( description = description )
+    add_login_args( parser )
+
+    return( parser )
+
+#
+# Add the login options to a parser, or to one subcommand's parser
+#
+def add_login_args( parser ):
+    parser.add_argument( '-u', '--user', type=str, help='Apstra username' )
+    parser.add_argument( '-p', '--password', type=str, help='Apstra password' )
+    parser.add_argument( '-t', '--target', type=str, help='IP/hostname of Apstra instance' )
+    parser.add_argument( '-P', '--port', type=str, help='TCP port of Apstra instance (default 443)' )
+
+#
+# Pull the login options out of parsed arguments
+#
+def login_dict_from_args( args ):
+    login_dict = { 'user': '', 'password': '', 'target': '', 'port': '' }
+
+    if args.user:
+        login_dict[ 'user' ] = args.user
+    if args.password:
+        login_dict[ 'password' ] = args.password
+    if args.target:
+        login_dict[ 'target' ] = args.target
+    if args.port:
+        login_dict[ 'port' ] = args.port
+
+    return login_dict
+
+#
+# Ensure there are no empties in the login dictionary
+#
+def complete_login_dict( login_dict ):
+    while login_dict[ 'user' ] == '':
+        login_dict[ 'user' ] = input( 'API username: ' )
+
+    while login_dict[ 'password' ] == '':
+        login_dict[ 'password' ] = getpass.getpass( 'Password: ' )
+    
+    while login_dict[ 'target' ] == '':
+        login_dict[ 'target' ] = input( 'Target IP/Hostname: ' )
+    
+    while login_dict[ 'port' ] == '':
+        login_dict[ 'port' ] = input( 'Target TCP Port: ' )
+
+    return( login_dict )
+
+#
+# Base URL of the API on the target in a (complete) login dictionary
+#
+def build_base_url( login_dict ):
+    if login_dict[ 'port' ] == '443':
+        base_url = 'https://' + login_dict[ 'target' ] + '/api'
+    else:
+        base_url = 'https://' + login_dict[ 'target' ] + ':' + login_dict[ 'port' ] + '/api'
+
+    return( base_url )
+
+#
+# Stable content hash of any JSON-able value.  Key order doesn't matter.
+#
+def fingerprint( obj ):
+    canon = json.dumps( obj, sort_keys = True, separators = ( ',', ':' ), default = list )
+
+    return( hashlib.sha256( canon.encode() ).hexdigest() )
+
+#
+# Load a JSON state file left by a previous run.  A missing or unreadable
+# file just means we start from scratch.
+#
+def load_state( path ):
+    state = {}
+
+    try:
+        with open( path ) as f:
+            state = json.load( f )
+
+    except ( OSError, ValueError ):
+        print( 'No usable state in ' + path + ', starting fresh.\n' )
+
+    return( state )
+
+#
+# Save a JSON state file.  Write to a temp file and rename it into place so
+# an interrupted run never leaves a half-written file behind.
+#
+def save_state( path, state ):
+    tmp_path = path + '.tmp'
+
+    with open( tmp_path, 'w' ) as f:
+        json.dump( state, f )
+
+    os.replace( tmp_path, path )
+
+
+##########
+# Errors #
+##########
+
+#
+# Failures are raised rather than ending the program, so the library can
+# run inside a long-lived process.  Scripts catch ApstraError at the top,
+# print it and quit.  Each error carries the HTTP status, if there was one.
+#
+class ApstraError( Exception ):
+    def __init__( self, message, status = None ):
+        super().__init__( message )
+        self.status = status
+
+# Login failed or the token was refused (401, 403)
+class AuthError( ApstraError ):
+    pass
+
+# No such blueprint, object or endpoint (404)
+class NotFoundError( ApstraError ):
+    pass
+
+# The controller is busy with something that conflicts (409)
+class ConflictError( ApstraError ):
+    pass
+
+# Worth trying again later: unreachable, overloaded or a 5xx
+class TransientError( ApstraError ):
+    pass
+
+# The request or its input doesn't make sense (400, 422, ...)
+class ValidationError( ApstraError ):
+    pass
+
+ERROR_STATUSES = { 401: AuthError, 403: AuthError, 404: NotFoundError, 409: ConflictError,
+                   429: TransientError }
+
+#
+# Raise the matching ApstraError if a response isn't a 2xx.  what says what
+# we were doing, e.g. 'Getting VN vn-1 in bp-1'.
+#
+def check_response( r, what ):
+    if str(r.status_code)[ 0 ] == '2':
+        return( r )
+
+    if r.status_code in ERROR_STATUSES:
+        error = ERROR_STATUSES[ r.status_code ]
+
+    elif r.status_code >= 500:
+        error = TransientError
+
+    else:
+        error = ValidationError
+
+    raise error( what + ' failed, got HTTP ' + str(r.status_code) + ' error.', r.status_code )
+
+
+######################
+# Request scheduling #
+######################
+
+#
+# Every request to the controller goes through api_request(), which paces
+# it so our tools don't swamp the API the operators' UI also depends on.
+#
+# Two things gate each request:
+#   - A token bucket per endpoint class.  Graph queries and config contexts
+#     are expensive to serve, so they get lower rates than simple GETs.
+#   - An adaptive limit on requests in flight (AIMD).  Each healthy reply
+#     nudges the limit up by about one per round trip; a 429 or 503, or a
+#     reply much slower than that endpoint class usually is, halves it.
+#     'Usually' is a moving average of the class's healthy replies.  Pages
+#     of a collection are a class of their own, so a big page isn't judged
+#     against tiny reads.  429's and 503's are retried after Retry-After
+#     or an exponential wait, as long as retrying can't repeat what the
+#     server already did: GET, HEAD, PUT and DELETE always, and a POST only
+#     when a 429 with Retry-After says it was turned away.
+#
+# Tune with configure_scheduler(), and see what happened with
+# scheduler_stats().
+#
+ENDPOINT_LIMITS = {
+    'qe':             { 'rate': 5.0, 'burst': 5 },
+    'config-context': { 'rate': 10.0, 'burst': 10 },
+    'write':          { 'rate': 10.0, 'burst': 5 },
+    'collection':     { 'rate': 20.0, 'burst': 10 },
+    'default':        { 'rate': 50.0, 'burst': 50 },
+}
+CONCURRENCY = { 'initial': 4, 'min': 1, 'max': 32 }
+# A reply this many times slower than the usual latency for its endpoint
+# class counts as a sign of overload
+LATENCY_TOLERANCE = 3.0
+# Weight of each healthy reply in the moving average of its class's
+# latency
+LATENCY_EMA_WEIGHT = 0.1
+RETRY_STATUSES = ( 429, 503 )
+# Methods that are safe to send again if the server acted on the first try
+IDEMPOTENT_METHODS = ( 'GET', 'HEAD', 'PUT', 'DELETE', 'OPTIONS' )
+MAX_RETRIES = 4
+# Most bodies we keep around for conditional GETs (see below)
+CONDITIONAL_CACHE_BYTES = 64 * 1024 * 1024
+# Path segments that are followed by an ID, for grouping transfer stats
+ID_COLLECTIONS = ( 'blueprints', 'virtual-networks', 'security-zones', 'systems', 'property-sets',
+                   'services' )
+
+_session = None
+_session_lock = threading.Lock()
+
+
+class TokenBucket:
+    def __init__( self, rate, burst ):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.stamp = time.monotonic()
+        self.lock = threading.Lock()
+
+    #
+    # Block until a token is available, then take it
+    def acquire( self ):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min( self.burst, self.tokens + ( now - self.stamp ) * self.rate )
+                self.stamp = now
+
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+
+                wait = ( 1 - self.tokens ) / self.rate
+
+            time.sleep( wait )
+
+
+class AdaptiveLimiter:
+    def __init__( self, initial, minimum, maximum ):
+        self.limit = float( initial )
+        self.minimum = minimum
+        self.maximum = maximum
+        self.in_flight = 0
+        self.last_cut = 0.0
+        self.baseline = { }
+        self.cond = threading.Condition()
+
+    def acquire( self ):
+        with self.cond:
+            while self.in_flight >= int( self.limit ):
+                self.cond.wait()
+
+            self.in_flight += 1
+
+    #
+    # Record how a request went and adjust the limit.  A 429 or 503 says
+    # nothing about the usual latency, so it's left out of the average.
+    def release( self, endpoint, latency, overloaded ):
+        with self.cond:
+            self.in_flight -= 1
+            usual = self.baseline.get( endpoint, latency )
+            slow = latency > usual * LATENCY_TOLERANCE + 0.05
+
+            if not overloaded:
+                self.baseline[ endpoint ] = usual + ( latency - usual ) * LATENCY_EMA_WEIGHT
+
+            if overloaded or slow:
+                # Only cut once per round trip, not once per reply in flight
+                if time.monotonic() - self.last_cut > usual:
+                    self.limit = max( self.minimum, self.limit / 2 )
+                    self.last_cut = time.monotonic()
+
+            else:
+                self.limit = min( self.maximum, self.limit + 1 / self.limit )
+
+            self.cond.notify_all()
+
+
+_buckets = { }
+_limiter = None
+_stats = { }
+_stats_lock = threading.Lock()
+
+#
+# (Re)build the scheduler.  limits updates ENDPOINT_LIMITS per class, e.g.
+# { 'qe': { 'rate': 2, 'burst': 2 } }, and concurrency updates CONCURRENCY.
+#
+def configure_scheduler( limits = None, concurrency = None ):
+    global _limiter
+
+    for endpoint, limit in ( limits or { } ).items():
+        ENDPOINT_LIMITS[ endpoint ] = dict( ENDPOINT_LIMITS.get( endpoint, { } ), **limit )
+
+    CONCURRENCY.update( concurrency or { } )
+
+    _buckets.clear()
+    for endpoint, limit in ENDPOINT_LIMITS.items():
+        _buckets[ endpoint ] = TokenBucket( limit[ 'rate' ], limit[ 'burst' ] )
+
+    _limiter = AdaptiveLimiter( CONCURRENCY[ 'initial' ], CONCURRENCY[ 'min' ], CONCURRENCY[ 'max' ] )
+
+#
+# Which limit class a request falls in.  params are its query parameters.
+#
+def endpoint_class( method, url, params = None ):
+    path = url.split( '?' )[ 0 ]
+
+    if path.endswith( '/qe' ):
+        return( 'qe' )
+
+    if path.endswith( '/config-context' ):
+        return( 'config-context' )
+
+    if method not in ( 'GET', 'HEAD' ):
+        return( 'write' )
+
+    if 'page' in ( params or { } ):
+        return( 'collection' )
+
+    return( 'default' )
+
+#
+# Requests, retries, errors and latency per endpoint class, plus the
+# current concurrency limit
+#
+def scheduler_stats():
+    with _stats_lock:
+        stats = { endpoint: dict( counts ) for endpoint, counts in _stats.items() }
+
+    stats[ 'concurrency_limit' ] = int( _limiter.limit )
+
+    return( stats )
+
+def _count( endpoint, key, amount = 1 ):
+    with _stats_lock:
+        counts = _stats.setdefault( endpoint, { 'requests': 0, 'retries': 0, 'overloaded': 0,
+                                                'reauths': 0, 'seconds': 0.0 } )
+        counts[ key ] += amount
+
+#
+# One pooled session shared by every thread.  The first call imports
+# requests and turns off the warning about the controller's self-signed
+# certificate.
+#
+def get_session():
+    global _session, req
+
+    with _session_lock:
+        if _session is None:
+            import requests as req
+            from urllib3.exceptions import InsecureRequestWarning
+            req.packages.urllib3.disable_warnings( category = InsecureRequestWarning )
+
+            _session = req.Session()
+            _session.verify = False
+            _session.headers[ 'Accept-Encoding' ] = 'gzip, deflate'
+            adapter = req.adapters.HTTPAdapter( pool_connections = 4, pool_maxsize = CONCURRENCY[ 'max' ] )
+            _session.mount( 'https://', adapter )
+            _session.mount( 'http://', adapter )
+
+    return( _session )
+
+#
+# Conditional GETs, for small reads that repeat: the blueprint version a
+# watch polls, the security zone list, the property set listing.  When the
+# controller sends an ETag or Last-Modified with a body, we keep the body
+# and send the validator back next time; a 304 means it hasn't changed and
+# we answer from what we kept.  Bodies are kept per URL and parameters,
+# least recently used first out, up to CONDITIONAL_CACHE_BYTES in total.
+#
+# It's opt-in.  Sweeps (VN pages, single VN's, config contexts of every
+# system) aren't sent conditionally: keeping a body per page or per system
+# would make memory grow with the fabric, and a sweep rarely reads the
+# same thing twice.
+#
+_conditional = OrderedDict()
+_conditional_bytes = 0
+_conditional_lock = threading.Lock()
+_transfer = { }
+
+def _conditional_key( url, params ):
+    return( ( url, tuple( sorted( ( params or { } ).items() ) ) ) )
+
+def _conditional_lookup( key ):
+    with _conditional_lock:
+        entry = _conditional.get( key )
+
+        if entry:
+            _conditional.move_to_end( key )
+
+    return( entry )
+
+def _conditional_store( key, r ):
+    global _conditional_bytes
+
+    etag = r.headers.get( 'ETag' )
+    last_modified = r.headers.get( 'Last-Modified' )
+    size = len( r.content )
+
+    with _conditional_lock:
+        old = _conditional.pop( key, None )
+        if old:
+            _conditional_bytes -= len( old[ 'content' ] )
+
+        # Nothing to validate against, or too big to be worth the memory
+        if not ( etag or last_modified ) or size > CONDITIONAL_CACHE_BYTES // 4:
+            return
+
+        _conditional[ key ] = { 'etag': etag, 'last_modified': last_modified,
+                                'content': r.content, 'encoding': r.encoding }
+        _conditional_bytes += size
+
+        while _conditional_bytes > CONDITIONAL_CACHE_BYTES:
+            _conditional_bytes -= len( _conditional.popitem( last = False )[ 1 ][ 'content' ] )
+
+#
+# Turn a 304 into the 200 it stands for, with the body we kept
+def _not_modified( r, entry ):
+    r.status_code = 200
+    r.reason = 'OK (not modified)'
+    r._content = entry[ 'content' ]
+    r.encoding = entry[ 'encoding' ]
+
+    return( r )
+
+#
+# Drop every body kept for conditional GETs
+def clear_conditional_cache():
+    global _conditional_bytes
+
+    with _conditional_lock:
+        _conditional.clear()
+        _conditional_bytes = 0
+
+#
+# What kind of resource a URL is, with the IDs taken out, e.g.
+# 'blueprints/{id}/virtual-networks'
+def resource_kind( url ):
+    path = urlsplit( url ).path
+    parts = ( path[ 4: ] if path.startswith( '/api' ) else path ).strip( '/' ).split( '/' )
+
+    return( '/'.join( '{id}' if i and parts[ i - 1 ] in ID_COLLECTIONS else part
+                      for i, part in enumerate( parts ) ) or '/' )
+
+#
+# Bytes on the wire (after compression) and once decoded, per kind of
+# resource, plus how many GETs came back 304 and the bytes that saved
+def transfer_stats():
+    with _stats_lock:
+        return( { kind: dict( counts ) for kind, counts in _transfer.items() } )
+
+def _count_transfer( url, r, saved = 0 ):
+    wire = r.raw.tell() if hasattr( r.raw, 'tell' ) else len( r.content )
+
+    with _stats_lock:
+        counts = _transfer.setdefault( resource_kind( url ), { 'requests': 0, 'bytes': 0, 'decoded_bytes': 0,
+                                                               'not_modified': 0, 'saved_bytes': 0 } )
+        counts[ 'requests' ] += 1
+        counts[ 'bytes' ] += wire
+        counts[ 'decoded_bytes' ] += len( r.content )
+        counts[ 'not_modified' ] += 1 if saved else 0
+        counts[ 'saved_bytes' ] += saved
+
+#
+# Send a request to the controller, paced by the scheduler.  Takes the
+# same keyword arguments as requests (params, data, json, timeout, ...)
+# and returns the response.  A token, if given, goes in the AUTHTOKEN
+# header; if it has expired we log in again and replay the request once
+# (see refresh_token).  With conditional set, a GET is sent with the
+# validators of the last body we got for it, and a 304 comes back as that
+# body with a 200.  Raises TransientError if the controller can't be
+# reached.
+#
+def api_request( method, url, token = None, conditional = False, **kwargs ):
+    endpoint = endpoint_class( method, url, kwargs.get( 'params' ) )
+    headers = dict( kwargs.pop( 'headers', None ) or { } )
+    key = _conditional_key( url, kwargs.get( 'params' ) ) if conditional and method == 'GET' else None
+    entry = _conditional_lookup( key ) if key else None
+
+    if entry and entry[ 'etag' ]:
+        headers[ 'If-None-Match' ] = entry[ 'etag' ]
+
+    if entry and entry[ 'last_modified' ]:
+        headers[ 'If-Modified-Since' ] = entry[ 'last_modified' ]
+
+    # Per request, because a CA bundle in the environment overrides the
+    # session's verify setting
+    kwargs.setdefault( 'verify', False )
+
+    attempt = 0
+    refreshed = False
+
+    while True:
+        # Always send the newest token, in case someone else refreshed it
+        if token:
+            headers[ 'AUTHTOKEN' ] = current_token( token )
+
+        # A file body has to be rewound before it can be sent again
+        if hasattr( kwargs.get( 'data' ), 'seek' ):
+            kwargs[ 'data' ].seek( 0 )
+
+        _buckets[ endpoint ].acquire()
+        _limiter.acquire()
+        start = time.monotonic()
+        overloaded = True
+
+        try:
+            r = get_session().request( method, url, headers = headers, **kwargs )
+            overloaded = r.status_code in RETRY_STATUSES
+
+        except ( req.ConnectionError, req.Timeout ) as e:
+            raise TransientError( 'Can not reach ' + url + ': ' + str( e ) )
+
+        finally:
+            latency = time.monotonic() - start
+            _limiter.release( endpoint, latency, overloaded )
+            _count( endpoint, 'requests' )
+            _count( endpoint, 'seconds', latency )
+
+        # The token expired.  Log in again once and replay the request.
+        if r.status_code == 401 and token and not refreshed:
+            refreshed = refresh_token( headers[ 'AUTHTOKEN' ] ) is not None
+
+            if refreshed:
+                _count( endpoint, 'reauths' )
+                continue
+
+        if not overloaded:
+            break
+
+        _count( endpoint, 'overloaded' )
+        retry_after = r.headers.get( 'Retry-After', '' )
+
+        # A 503 to a POST may come after the server acted on it, so only
+        # resend one the server explicitly turned away
+        if attempt == MAX_RETRIES or \
+           not ( method in IDEMPOTENT_METHODS or r.status_code == 429 and retry_after ):
+            break
+
+        _count( endpoint, 'retries' )
+        time.sleep( float( retry_after ) if retry_after.isdigit() else min( 30, 2 ** attempt ) )
+        attempt += 1
+
+    if entry and r.status_code == 304:
+        _count_transfer( url, r, len( entry[ 'content' ] ) )
+        return( _not_modified( r, entry ) )
+
+    _count_transfer( url, r )
+
+    if key and r.status_code == 200:
+        _conditional_store( key, r )
+
+    return( r )
+
+configure_scheduler()
+
+
+########################################################
+# Network operations: reachability, login/logout, etc. #
+########################################################
+
+#
+# Make sure we can reach the target
+def networkOK( url ):
+    try:
+        api_request( 'HEAD', url, timeout = 10 )
+        return True
+    
+    except TransientError:
+        return False
+
+#
+# Tokens expire, and long or parallel runs outlive them.  Callers keep
+# using the token login() gave them; api_request() maps it to the newest
+# one, and on a 401 refresh_token() logs in again with the same
+# credentials.  One lock covers every thread, so a burst of 401's from
+# workers sharing a token costs one login, and the rest just pick up the
+# new token.  The credentials are kept in memory for that.
+#
+_logins = { }
+_token_aliases = { }
+_token_lock = threading.Lock()
+
+#
+# The token to send in place of one that login() handed out
+def current_token( token ):
+    return( _token_aliases.get( token, token ) )
+
+#
+# Replace an expired token.  Returns the new token, or None if we don't
+# know how the stale one was obtained.  If logging in again fails, the
+# credentials stay put for the next 401 to try with.
+def refresh_token( stale ):
+    with _token_lock:
+        current = _token_aliases.get( stale, stale )
+
+        # Someone else already refreshed it
+        if current != stale:
+            return( current )
+
+        credentials = _logins.get( stale )
+
+        if credentials is None:
+            return( None )
+
+        token = request_token( credentials[ 'url' ], credentials[ 'user' ], credentials[ 'password' ] )
+        _logins[ token ] = _logins.pop( stale )
+
+        for old, newest in list( _token_aliases.items() ):
+            if newest == stale:
+                _token_aliases[ old ] = token
+
+        _token_aliases[ stale ] = token
+        print( 'Token expired, logged in again.\n' )
+
+    return( token )
+
+#
+# POST the login and return the token.  Raises AuthError if we're turned
+# down.
+def request_token( url, user, password ):
+    url = url + '/aaa/login'
+    login_payload = { 'username': user, 'password': password }
+    r = api_request( 'POST', url, data = json.dumps(login_payload) )
+
+    if r.status_code != 201:
+        raise AuthError( 'Login failed, got HTTP ' + str(r.status_code) + ' error.', r.status_code )
+
+    return( json.loads(r.text)['token'] )
+
+#
+# Login and grab token.  Raises TransientError if the target can't be
+# reached, and AuthError if it turns us down.
+def login( url, user, password ):
+    if not networkOK( url ):
+        raise TransientError( 'Can not reach AOS instance at ' + url + '.' )
+
+    token = request_token( url, user, password )
+
+    with _token_lock:
+        _logins[ token ] = { 'url': url, 'user': user, 'password': password }
+
+    print( 'Login successful, got a token.\n')
+
+    return( token )
+
+#
+# Logout
+def logout( token, url ):
+    url = url + '/aaa/logout'
+    logout_ok = False
+    r = api_request( 'POST', url, token )
+
+    with _token_lock:
+        _logins.pop( current_token( token ), None )
+
+    if r.status_code == 200:
+        print('Successfully logged out from API.\n')
+        logout_ok = True
+    
+    else:
+        print('Clean logout from API failed.\n')
+    
+    return( logout_ok )
+
+#
+# Page size for the iter_* helpers.  Big enough to keep round trips down,
+# small enough that one page never dominates memory.
+PAGE_SIZE = 500
+
+#
+# Fetch one page of a collection
+def get_page( token, url, page, page_size, conditional = False ):
+    page_params = { 'page': page, 'page_size': page_size }
+    r = api_request( 'GET', url, token, conditional = conditional, params=page_params )
+    check_response( r, 'Getting page ' + str(page) + ' of ' + url )
+
+    return( json.loads( r.text ) )
+
+#
+# Page through a collection and yield its entries one at a time.  While the
+# caller works through one page, the next one is already downloading.  If
+# the caller stops early, we stop fetching.
+#
+# items_key names the collection in the response body.  Collections that
+# come back as a dict (e.g. 'virtual_networks') yield ( id, data ) pairs.
+# Pages are requested until one comes back short, or, if the server gives
+# a 'total_count', until that many entries have arrived.  A server that
+# ignores the page parameters returns everything at once: a reply bigger
+# than a page, or one that starts where the last one did, ends the paging.
+# Pages are only sent as conditional GETs if conditional is set.
+def iter_collection( token, url, items_key, page_size = PAGE_SIZE, conditional = False ):
+    page = 1
+    seen = 0
+    last_first = None
+    prefetch = ThreadPoolExecutor( max_workers = 1 )
+    next_page = prefetch.submit( get_page, token, url, page, page_size, conditional )
+
+    try:
+        while next_page:
+            json_out = next_page.result()
+            items = json_out[ items_key ]
+            total = json_out.get( 'total_count' )
+            next_page = None
+
+            if isinstance( items, dict ):
+                items = items.items()
+
+            first = next( iter( items ), None )
+            if page > 1 and first is not None and first == last_first:
+                break
+
+            last_first = first
+            seen += len( items )
+            more = seen < total if isinstance( total, int ) else len( items ) == page_size
+
+            if more and len( items ) <= page_size:
+                page += 1
+                next_page = prefetch.submit( get_page, token, url, page, page_size, conditional )
+
+            for item in items:
+                yield( item )
+
+            json_out = None
+
+    finally:
+        prefetch.shutdown( wait = False, cancel_futures = True )
+
+
+###############################
+# Interacting with Blueprints #
+###############################
+
+#
+# Get the staging version of a blueprint.  This is a single small request,
+# so it's cheap enough to poll for changes.  Returns '' if we couldn't get
+# it, rather than raising, so pollers just try again.
+def get_bp_version( token, url, bp_uuid ):
+    bp_version = ''
+    url = url + '/blueprints/' + bp_uuid + '/diff-status'
+
+    try:
+        r = api_request( 'GET', url, token, conditional = True )
+
+    except TransientError as e:
+        print( 'Could not get version of blueprint ' + bp_uuid + '.  ' + str( e ) + '\n' )
+        return( bp_version )
+
+    if str(r.status_code)[ 0 ] == '2':
+        bp_version = json.loads( r.text )[ 'staging_version' ]
+
+    else:
+        print( 'Could not get version of blueprint ' + bp_uuid + ', got HTTP ' +
+               str(r.status_code) + ' error.\n' )
+
+    return( bp_version )
+
+#
+# Yield the blueprints on the server one at a time
+def iter_bp_list( token, url, page_size = PAGE_SIZE ):
+    return( iter_collection( token, url + '/blueprints', 'items', page_size ) )
+
+#
+# Blueprint metadata index.  One list call gives us the label, design and
+# version of every blueprint, which is all we need to pick and validate
+# blueprints, so there's no need to download a whole blueprint document.
+# The index is kept per server for BP_INDEX_TTL seconds.
+#
+BP_INDEX_TTL = 60
+_bp_indexes = { }
+_bp_index_lock = threading.Lock()
+
+#
+# Get the index for a server as { 'by_id': { id: { 'id', 'label', 'design',
+# 'version' } }, 'by_label': { label: id } }.  Served from the cache while
+# it's younger than ttl seconds, unless refresh is set.
+def get_bp_index( token, url, ttl = BP_INDEX_TTL, refresh = False ):
+    with _bp_index_lock:
+        cached = _bp_indexes.get( url )
+
+        if cached and not refresh and time.monotonic() - cached[ 0 ] < ttl:
+            return( cached[ 1 ] )
+
+        bp_index = { 'by_id': { }, 'by_label': { } }
+        for bp in iter_bp_list( token, url ):
+            bp_index[ 'by_id' ][ bp[ 'id' ] ] = { 'id': bp[ 'id' ], 'label': bp[ 'label' ],
+                                                  'design': bp.get( 'design', '' ),
+                                                  'version': bp.get( 'version' ) }
+            bp_index[ 'by_label' ][ bp[ 'label' ] ] = bp[ 'id' ]
+
+        _bp_indexes[ url ] = ( time.monotonic(), bp_index )
+
+    return( bp_index )
+
+#
+# Look a blueprint up by UUID or label.  Returns its index entry, or None.
+# A miss refreshes the index once, in case the blueprint is new.
+def find_bp( token, url, bp_name ):
+    for refresh in ( False, True ):
+        bp_index = get_bp_index( token, url, refresh = refresh )
+        bp_id = bp_name if bp_name in bp_index[ 'by_id' ] else bp_index[ 'by_label' ].get( bp_name )
+
+        if bp_id:
+            return( bp_index[ 'by_id' ][ bp_id ] )
+
+    return( None )
+
+#
+# Get UUID of target blueprint
+def get_bp_id( token, url, bp_name ):
+    bp = find_bp( token, url, bp_name )
+
+    if bp is None:
+        raise NotFoundError( 'No blueprint found with name ' + bp_name + '.' )
+
+    print('Got a match for ' + bp_name +
+          '.  UUID is ' + bp[ 'id' ] + '.\n')
+
+    return( bp[ 'id' ] )
+
+#
+# Print the blueprints on the server
+def get_bp_list ( token, url ):
+    print( '\nThis server contains the following blueprints:\n')
+    print(f'{"BP Name":<24}' + f'{"Design":<20}' + 'UUID')
+    print(f'{"-------":<24}' + f'{"------":<20}' + '----')
+
+    for bp in get_bp_index( token, url, refresh = True )[ 'by_id' ].values():
+        print(f'{bp[ 'label' ]:<24}' + f'{bp[ 'design' ]:<20}' + bp[ 'id' ])
+    print( '\n' )
+
+    return( True )
+
+#
+# Get all security zones (VRF's) in a blueprint in one request
+def get_sz_list( token, url, bp_id ):
+    json_out = ''
+    url = url + '/blueprints/' + bp_id + '/security-zones'
+    r = api_request( 'GET', url, token, conditional = True )
+    check_response( r, 'Getting security zones in ' + bp_id )
+
+    json_out = json.loads(r.text)
+    print( 'Getting security zone list from blueprint...\n' )
+
+    return( json_out )
+
+#
+# Get data from a single VN in a blueprint
+def get_vn_data( token, url, bp_id, vn_id ):
+    json_out = ''
+    url = url + '/blueprints/' + bp_id + '/virtual-networks/' + vn_id
+    r = api_request( 'GET', url, token )
+    check_response( r, 'Getting VN ' + vn_id + ' in ' + bp_id )
+
+    json_out = json.loads(r.text)
+    print( 'Getting VN parameters from blueprint...\n' )
+
+    return( json_out )
+
+#
+# Yield ( vn_id, vn_data ) for each VN in a blueprint
+def iter_vn_list( token, url, bp_uuid, page_size = PAGE_SIZE ):
+    url = url + '/blueprints/' + bp_uuid + '/virtual-networks'
+
+    return( iter_collection( token, url, 'virtual_networks', page_size ) )
+
+#
+# Get list of VN's from a blueprint as JSON
+def get_vn_list( token, url, bp_uuid ):
+    json_out = { 'virtual_networks': dict( iter_vn_list( token, url, bp_uuid ) ) }
+    print( 'Getting virtual network list from blueprint...\n' )
+
+    return( json_out )
+
+#
+# Commit-check a blueprint and say whether its rendered config passed.
+# Only a check that found errors on a device returns False.  Anything else
+# (a pending operation, a missing blueprint, a 5xx, an unreachable
+# controller) says nothing about the config, so it raises the matching
+# ApstraError.
+def commit_check_result( token, url, bp_uuid ):
+    check_url = url + '/blueprints/' + bp_uuid + '/commit-check'
+    result_url = url + '/blueprints/' + bp_uuid + '/commit-check-result'
+
+    print( 'Running commit-check on devices in blueprint...\n' )
+    r = api_request( 'POST', check_url, token )
+    check_response( r, 'Commit-check of ' + bp_uuid )
+
+    print( 'Completed commit-check.  Verifying results...\n' )
+    r = api_request( 'GET', result_url, token )
+
+    if r.status_code == 400:
+        print( 'Rendered configuration failed commit-check on at least one device.' )
+        print( 'Please review results in the Apstra IDE to identify errors.\n' )
+        return( False )
+
+    check_response( r, 'Getting the commit-check result of ' + bp_uuid )
+    print( 'Success!\n')
+
+    return( True )
+
+#
+# Run a commit check on a blueprint.  Returns False if it didn't pass, for
+# whatever reason the controller gave.
+def commit_check( token, url, bp_uuid ):
+    try:
+        return( commit_check_result( token, url, bp_uuid ) )
+
+    except ApstraError as e:
+        # No reply at all is still an error for the caller
+        if e.status is None:
+            raise
+
+        print( 'Error:  ' + str( e ) + '  Please check the Apstra logs before trying again.\n' )
+        return( False )
+
+#
+# Deploy staged changes to a blueprint
+def deploy_bp( token, url, bp_uuid ):
+    success = False
+    deploy_version = ''
+    deploy_description = 'Configuration deployed by script.'
+
+    deploy_version = get_deploy_status( token, url, bp_uuid )
+
+    if deploy_version != '':
+        deploy_version += 1
+        url = url + '/blueprints/' + bp_uuid + '/deploy'
+
+        deploy_payload = { 'version': deploy_version, 'description': deploy_description }
+        print( 'Deploying version ' + str(deploy_version) + ' of blueprint...\n' )
+        r = api_request( 'PUT', url, token, data = json.dumps( deploy_payload) )
+        
+        if str(r.status_code)[ 0 ] == '2':
+            success = True
+            print( 'Deployed version ' + str(deploy_version) + ' of blueprint.\n' )
+
+        elif str(r.status_code) == '404':
+            print( 'Error: No blueprint with UUID ' + bp_uuid + ' found.\n' )
+      
+        else:
+            print( 'Unspecified error.  Please check the Apstra logs for details.\n' )     
+
+    else:
+        print( 'Deploy of blueprint failed.\n' )
+
+    return( success )
+
+#
+# Get deploy status of a blueprint
+def get_deploy_status( token, url, bp_uuid ):
+    deploy_version = ''
+    url = url + '/blueprints/' + bp_uuid + '/deploy'
+
+    print( 'Finding current database version of the blueprint...\n' )
+    r = api_request( 'GET', url, token )
+
+    if str(r.status_code)[ 0 ] == '2':
+        deploy_version = json.loads( r.text )[ 'version' ]
+        print( 'Current deployed version is ' + str(deploy_version) + '.\n' )
+
+    elif str(r.status_code) == '404':
+        print( 'Error: No blueprint with UUID ' + bp_uuid + ' found.\n' )
+      
+    else:
+        print( 'Unspecified error.  Please check the Apstra logs for details.\n' )     
+
+    return(deploy_version)
+
+#
+# The anomalies currently raised in a blueprint, each as the controller
+# reports it ( 'anomaly_type', 'identity', 'expected', 'actual', ... ).
+# With anomaly_types, only anomalies of those types, e.g. ( 'config', ).
+def get_anomalies( token, url, bp_id, anomaly_types = None ):
+    url = url + '/blueprints/' + bp_id + '/anomalies'
+    r = api_request( 'GET', url, token )
+    check_response( r, 'Getting anomalies in ' + bp_id )
+
+    return( [ anomaly for anomaly in json.loads( r.text ).get( 'items', [ ] )
+              if anomaly_types is None or anomaly.get( 'anomaly_type' ) in anomaly_types ] )
+
+#
+# Revert blueprint changes to the last deployed state
+def revert_bp( token, url, bp_uuid ):
+    success = False
+    url = url + '/blueprints/' + bp_uuid + '/revert'
+
+    print( 'Reverting staged blueprint back to last commit...\n' )
+    r = api_request( 'POST', url, token )
+
+    if str(r.status_code)[ 0 ] == '2':
+        print( 'Completed revert of blueprint.\n' )
+        success = True
+
+    elif str(r.status_code) == '404':
+        print( 'Error: No blueprint with UUID ' + bp_uuid + ' found.\n' )
+   
+    elif str(r.status_code) == '409':
+        print( 'Error: Blueprint is in create state and can not be reverted.\n' )
+   
+    else:
+        print( 'Unspecified error.  Please check the Apstra logs for details.\n' )     
+
+    return( success )
+
+
+#################
+# Graph queries #
+#################
+
+#
+# Graph queries are built from parameters rather than pasted together, e.g.
+#   graph_query( qe_node( 'tag', name = 'tag' ), qe_out( 'tag' ),
+#                qe_node( 'system', name = 'fw', role = 'generic' ) )
+# and their results are kept in an LRU cache keyed by blueprint, blueprint
+# version and the normalized query.  The graph can't change without the
+# version moving, so repeating a lookup within a version costs nothing,
+# in this run or, in a long-lived process, the next one.
+#
+QUERY_CACHE_SIZE = 256
+_query_cache = OrderedDict()
+_query_cache_lock = threading.Lock()
+_query_stats = { 'hits': 0, 'misses': 0, 'evictions': 0 }
+
+#
+# Quote a value for a query: strings in single quotes, everything else as
+# Python writes it
+def qe_value( value ):
+    if isinstance( value, str ):
+        return( "'" + value.replace( '\\', '\\\\' ).replace( "'", "\\'" ) + "'" )
+
+    return( repr( value ) )
+
+#
+# One node step.  Attributes are sorted, so the same node always comes out
+# the same way.
+def qe_node( node_type = None, name = None, **attrs ):
+    args = [ ]
+
+    if node_type is not None:
+        args.append( qe_value( node_type ) )
+
+    if name is not None:
+        args.append( 'name=' + qe_value( name ) )
+
+    args += [ key + '=' + qe_value( attrs[ key ] ) for key in sorted( attrs ) ]
+
+    return( 'node(' + ', '.join( args ) + ')' )
+
+#
+# Follow an outgoing or incoming relationship, of any type if rel_type is None
+def qe_out( rel_type = None ):
+    return( 'out(' + ( qe_value( rel_type ) if rel_type is not None else '' ) + ')' )
+
+def qe_in( rel_type = None ):
+    return( 'in_(' + ( qe_value( rel_type ) if rel_type is not None else '' ) + ')' )
+
+#
+# Chain steps into a query
+def graph_query( *steps ):
+    return( '.'.join( steps ) )
+
+#
+# Match several paths at once.  Nodes named the same in more than one path
+# are the same node, so this is how a query branches.
+def qe_match( *paths ):
+    return( 'match(' + ', '.join( paths ) + ')' )
+
+#
+# The form of a query used in cache keys: no whitespace outside of quoted
+# strings, so hand-written queries that only differ in spacing share an
+# entry
+def normalize_query( query ):
+    normalized = [ ]
+    quote = None
+    escaped = False
+
+    for char in query.strip():
+        if quote:
+            if escaped:
+                escaped = False
+            elif char == '\\':
+                escaped = True
+            elif char == quote:
+                quote = None
+
+        elif char in '\'"':
+            quote = char
+
+        elif char.isspace():
+            continue
+
+        normalized.append( char )
+
+    return( ''.join( normalized ) )
+
+#
+# Run a graph query on a blueprint and return its items.  bp_version is the
+# blueprint's staging version if the caller already has it; otherwise we
+# ask for it (one small request).  If the version can't be had, or cache
+# is False, the query is sent and nothing is cached.  The items list is
+# shared with the cache, so don't change it.
+def run_query( token, url, bp_id, query, bp_version = None, cache = True ):
+    if cache and bp_version is None:
+        bp_version = get_bp_version( token, url, bp_id )
+
+    key = ( url, bp_id, bp_version, normalize_query( query ) )
+    cache = cache and bp_version != ''
+
+    if cache:
+        with _query_cache_lock:
+            if key in _query_cache:
+                _query_cache.move_to_end( key )
+                _query_stats[ 'hits' ] += 1
+                return( _query_cache[ key ] )
+
+            _query_stats[ 'misses' ] += 1
+
+    r = api_request( 'POST', url + '/blueprints/' + bp_id + '/qe', token,
+                     data = json.dumps( { 'query': query } ) )
+    check_response( r, 'Graph query' )
+    items = json.loads( r.text )[ 'items' ]
+
+    if cache:
+        with _query_cache_lock:
+            _query_cache[ key ] = items
+            _query_cache.move_to_end( key )
+
+            while len( _query_cache ) > QUERY_CACHE_SIZE:
+                _query_cache.popitem( last = False )
+                _query_stats[ 'evictions' ] += 1
+
+    return( items )
+
+#
+# Hits, misses and evictions so far, and how many results are cached
+def query_cache_stats():
+    with _query_cache_lock:
+        return( dict( _query_stats, size = len( _query_cache ), max_size = QUERY_CACHE_SIZE ) )
+
+#
+# Drop every cached query result
+def clear_query_cache():
+    with _query_cache_lock:
+        _query_cache.clear()
+
+
+###############################
+# Operations on property sets #
+###############################
+
+#
+# Yield the property sets in a blueprint one at a time.  A blueprint has
+# only a few, and publishing lists them on every run, so the pages are
+# sent as conditional GETs.
+def iter_ps_list( token, url, bp_uuid, page_size = PAGE_SIZE ):
+    url = url + '/blueprints/' + bp_uuid + '/property-sets'
+
+    return( iter_collection( token, url, 'items', page_size, conditional = True ) )
+
+#
+# Get list of property sets from a blueprint as JSON
+def get_ps_list( token, url, bp_uuid ):
+    json_out = { 'items': list( iter_ps_list( token, url, bp_uuid ) ) }
+    print( 'Getting property set list from blueprint...\n' )
+
+    return( json_out )
+
+#
+# A request body that sends a JSON file wrapped in a prefix and suffix,
+# a block at a time, so a large file is never read into memory whole
+class JsonFileBody:
+    def __init__( self, prefix, path, suffix ):
+        self.parts = [ prefix.encode(), path, suffix.encode() ]
+        self.length = len( self.parts[ 0 ] ) + os.path.getsize( path ) + len( self.parts[ 2 ] )
+        self.file = None
+        self.seek( 0 )
+
+    def __len__( self ):
+        return( self.length )
+
+    def tell( self ):
+        return( self.pos )
+
+    def seek( self, offset, whence = 0 ):
+        self.close()
+        self.part = 0
+        self.pos = 0
+        self.file = open( self.parts[ 1 ], 'rb' )
+
+    def read( self, size = -1 ):
+        chunks = [ ]
+        wanted = size if size >= 0 else self.length
+
+        while wanted > 0 and self.part < 3:
+            if self.part == 1:
+                chunk = self.file.read( wanted )
+
+            else:
+                chunk = self.parts[ self.part ][ self.pos - self.part_start() : ][ : wanted ]
+
+            if not chunk:
+                self.part += 1
+                continue
+
+            chunks.append( chunk )
+            wanted -= len( chunk )
+            self.pos += len( chunk )
+
+        return( b''.join( chunks ) )
+
+    def part_start( self ):
+        return( 0 if self.part == 0 else self.length - len( self.parts[ 2 ] ) )
+
+    def close( self ):
+        if self.file:
+            self.file.close()
+            self.file = None
+
+#
+# Body for a property set POST or PATCH.  values is either the values
+# themselves or the path of a file holding them as JSON, which is
+# streamed from disk.
+def ps_body( ps_label, values ):
+    if isinstance( values, str ):
+        return( JsonFileBody( '{"label": ' + json.dumps( ps_label ) + ', "values": ', values, '}' ) )
+
+    return( json.dumps( { 'label': ps_label, 'values': values } ) )
+
+#
+# Create a new property set in a freeform blueprint
+def post_ps( token, url, bp_uuid, peer_prop_json, ps_label ):
+    ps_id = ''
+    url = url + '/blueprints/' + bp_uuid + '/property-sets'
+    body = ps_body( ps_label, peer_prop_json )
+
+    try:
+        r = api_request( 'POST', url, token, data = body )
+
+    finally:
+        if isinstance( body, JsonFileBody ):
+            body.close()
+
+    check_response( r, 'Publish of property set ' + ps_label )
+
+    ps_id = json.loads(r.text)[ 'id' ]
+    print( 'Published new property set with ID = ' + ps_id + '.\n' )
+    
+    return( ps_id )
+
+#
+# Replace an existing property set in a freeform blueprint
+def patch_ps( token, url, bp_uuid, peer_prop_json, ps_id, ps_label ):
+    url = url + '/blueprints/' + bp_uuid + '/property-sets/' + ps_id
+    body = ps_body( ps_label, peer_prop_json )
+
+    try:
+        r = api_request( 'PATCH', url, token, data = body )
+
+    finally:
+        if isinstance( body, JsonFileBody ):
+            body.close()
+
+    check_response( r, 'Update of property set ' + ps_label )
+
+    print( 'Updated property set ' + ps_label + '.\n' )
+    
+    return( r.status_code )
+
+#
+# Remove a property set from a freeform blueprint
+def delete_ps( token, url, bp_uuid, ps_id, ps_label ):
+    url = url + '/blueprints/' + bp_uuid + '/property-sets/' + ps_id
+
+    r = api_request( 'DELETE', url, token )
+    check_response( r, 'Delete of property set ' + ps_label )
+
+    print( 'Deleted property set ' + ps_label + '.\n' )
+
+    return( r.status_code )
+
+##############################
+# Device (system) operations #
+##############################
+
+#
+# A system's rendered config context.  Only pass conditional = True for a
+# context that's read again and again; in a sweep over every system the
+# kept bodies would grow with the fabric.
+#
+def get_dev_context( token, url, bp_id, sys_id, conditional = False ):
+    dev_context = {}
+    url = url + '/blueprints/' + bp_id + '/systems/' + sys_id + '/config-context'
+
+    r = api_request( 'GET', url, token, conditional = conditional )
+    check_response( r, 'Fetching context for system ID ' + sys_id )
+
+    dev_context = json.loads(r.text)
+    dev_context = json.loads( dev_context[ 'context' ] )
+
+    return( dev_context )
+
+#
+# Yield the system ID of each system in the target blueprint
+def iter_systems_in_bp( token, url, bp_id, page_size = PAGE_SIZE ):
+    url = url + '/blueprints/' + bp_id + '/systems'
+
+    for item in iter_collection( token, url, 'items', page_size ):
+        yield( item[ 'system_id' ] )
+
+#
+# Get a list of systems in the target blueprint
+def get_systems_in_bp( token, url, bp_id, ):
+    return( list( iter_systems_in_bp( token, url, bp_id ) ) )
+
+#
+# Set the service timers ( service name -> interval in seconds ) on a
+# managed system.  With a journal, timers it has as already set to the
+# same interval are skipped, and each one set is recorded.
+def set_service_timers( token, url, sys_id, service_timers, journal = None ):
+    base_url = url + '/systems/' + sys_id + '/services/'
+
+    for k, v in service_timers.items():
+        svc_url = base_url + k
+        payload = { 'name': k, 'interval': v }
+        unit = 'timer/' + sys_id + '/' + k
+
+        if journal and journal.done( unit, v ):
+            continue
+
+        print( 'Setting interval ' + str( v ) + 's for service ' + k )
+
+        # Becasue bgp and route services require a POST before we can PUT...
+        if k == 'bgp' or k == 'route':
+            r = api_request( 'POST', base_url, token, json = payload )
+
+        r = api_request( 'PUT', svc_url, token, json = payload )
+        check_response( r, 'Setting the ' + k + ' timer on ' + sys_id )
+
+        if journal:
+            journal.record( unit, v )
+
+    return()
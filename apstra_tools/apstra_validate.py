@@ -0,0 +1,190 @@
+'''
+apstra_validate.py
+    Checks the peering addresses in a property set's 'vrfs' list before we
+    publish it, rather than finding out at commit-check:
+      - every leaf and firewall address is inside its VN's subnet
+      - no address is used twice in a VRF
+      - no two VN subnets on the same firewall overlap
+    A subnet or address that isn't IPv4 at all is reported too, and the
+    rest of its entry is checked without it.
+    Addresses and prefixes are packed into integer arrays and checked in
+    bulk with NumPy, so tens of thousands of entries take milliseconds, and
+    every problem is reported at once.
+
+    NumPy is optional.  Without it, check() returns None and the caller
+    skips validation.  It's only imported when the first check runs, so
+    tools that never validate don't pay for loading it.
+'''
+
+import socket
+from array import array
+
+np = None
+
+
+#
+# Import NumPy the first time it's needed.  False if it isn't installed.
+#
+def have_numpy():
+    global np
+
+    if np is None:
+        try:
+            import numpy as np
+
+        except ImportError:
+            np = False
+
+    return( np is not False )
+
+#
+# int -> 'a.b.c.d'
+#
+def int_to_ip( value ):
+    value = int( value )
+
+    return( '.'.join( str( ( value >> shift ) & 255 ) for shift in ( 24, 16, 8, 0 ) ) )
+
+
+#
+# The addresses of a 'vrfs' list, packed flat.  Entries can be added one at
+# a time, e.g. while a property set is being streamed, and only a few
+# integers per address are kept.  Addresses are stored as the 4 packed
+# bytes inet_pton gives us, which NumPy reads in one go.  What can't be
+# packed goes straight into bad as a violation.
+#
+class AddressTable:
+    def __init__( self ):
+        self.bad = [ ]
+        self.vrf_codes = { }
+        self.tag_codes = { }
+        self.entry_vrf = array( 'l' )
+        self.entry_vlan = array( 'l' )
+        self.entry_net = bytearray()
+        self.entry_bits = array( 'b' )
+        self.peer_entry = array( 'l' )
+        self.peer_addr = bytearray()
+        self.peer_tag = array( 'l' )
+        self.peer_fw = array( 'b' )
+
+    def __len__( self ):
+        return( len( self.entry_vrf ) )
+
+    def add( self, vrf_entry ):
+        if not vrf_entry.get( 'ipv4_subnet' ):
+            return
+
+        where = 'VRF ' + vrf_entry[ 'name' ] + ' vlan ' + str( vrf_entry[ 'vlan_id' ] )
+
+        try:
+            net, bits = vrf_entry[ 'ipv4_subnet' ].split( '/' )
+            packed_net = socket.inet_pton( socket.AF_INET, net )
+            bits = int( bits )
+
+            if not 0 <= bits <= 32:
+                raise ValueError( bits )
+
+        except ( OSError, ValueError ):
+            self.bad.append( where + ': subnet ' + vrf_entry[ 'ipv4_subnet' ] + ' is not an IPv4 prefix' )
+            return
+
+        entry = len( self.entry_vrf )
+        self.entry_vrf.append( self.vrf_codes.setdefault( vrf_entry[ 'name' ], len( self.vrf_codes ) ) )
+        self.entry_vlan.append( vrf_entry[ 'vlan_id' ] or 0 )
+        self.entry_net += packed_net
+        self.entry_bits.append( bits )
+
+        for is_fw, peers in ( ( 0, vrf_entry[ 'leaves' ] ), ( 1, vrf_entry[ 'firewalls' ] ) ):
+            for peer in peers:
+                if not peer[ 'ip4' ]:
+                    continue
+
+                try:
+                    packed_addr = socket.inet_pton( socket.AF_INET, peer[ 'ip4' ] )
+
+                except OSError:
+                    self.bad.append( where + ': ' + peer[ 'tag' ] + ' address ' + peer[ 'ip4' ] +
+                                     ' is not an IPv4 address' )
+                    continue
+
+                self.peer_entry.append( entry )
+                self.peer_addr += packed_addr
+                self.peer_tag.append( self.tag_codes.setdefault( peer[ 'tag' ], len( self.tag_codes ) ) )
+                self.peer_fw.append( is_fw )
+
+    #
+    # Every problem found, as readable strings.  None if NumPy isn't there.
+    def check( self ):
+        if not have_numpy():
+            return( None )
+
+        vrf_names = { code: name for name, code in self.vrf_codes.items() }
+        tag_names = { code: tag for tag, code in self.tag_codes.items() }
+        entry_vrf = np.asarray( self.entry_vrf, dtype = np.int64 )
+        entry_vlan = np.asarray( self.entry_vlan, dtype = np.int64 )
+        bits = np.asarray( self.entry_bits, dtype = np.int64 )
+        host_mask = ( np.int64( 1 ) << ( 32 - bits ) ) - 1
+        start = np.frombuffer( self.entry_net, dtype = '>u4' ).astype( np.int64 ) & ~host_mask
+        end = start | host_mask
+        peer_entry = np.asarray( self.peer_entry, dtype = np.int64 )
+        peer_addr = np.frombuffer( self.peer_addr, dtype = '>u4' ).astype( np.int64 )
+        peer_tag = np.asarray( self.peer_tag, dtype = np.int64 )
+        peer_fw = np.asarray( self.peer_fw, dtype = np.int8 )
+        violations = list( self.bad )
+
+        def describe( entry ):
+            return( 'VRF ' + vrf_names[ int( entry_vrf[ entry ] ) ] + ' vlan ' + str( entry_vlan[ entry ] ) +
+                    ' (' + int_to_ip( start[ entry ] ) + '/' + str( bits[ entry ] ) + ')' )
+
+        # Containment: the address with the host bits cleared must be the
+        # VN's network
+        outside = np.nonzero( ( peer_addr & ~host_mask[ peer_entry ] ) != start[ peer_entry ] )[ 0 ]
+        for peer in outside:
+            violations.append( describe( peer_entry[ peer ] ) + ': ' + tag_names[ int( peer_tag[ peer ] ) ] +
+                               ' address ' + int_to_ip( peer_addr[ peer ] ) + ' is outside the subnet' )
+
+        # Duplicates: the same address twice under one VRF
+        keys = ( entry_vrf[ peer_entry ].astype( np.int64 ) << 32 ) | peer_addr
+        uniq, inverse, counts = np.unique( keys, return_inverse = True, return_counts = True )
+        by_key = np.argsort( inverse, kind = 'stable' )
+        key_start = np.cumsum( counts ) - counts
+        for dup in np.nonzero( counts > 1 )[ 0 ]:
+            peers = by_key[ key_start[ dup ] : key_start[ dup ] + counts[ dup ] ]
+            users = [ tag_names[ int( peer_tag[ peer ] ) ] + ' on vlan ' + str( entry_vlan[ peer_entry[ peer ] ] )
+                      for peer in peers ]
+            violations.append( 'VRF ' + vrf_names[ int( uniq[ dup ] >> 32 ) ] + ': address ' +
+                               int_to_ip( uniq[ dup ] & 0xFFFFFFFF ) + ' is used ' + str( len( peers ) ) +
+                               ' times (' + ', '.join( users ) + ')' )
+
+        # Overlaps: sort each firewall's subnets by start, and any subnet
+        # starting before the furthest end seen so far overlaps the subnet
+        # that reached it
+        seen = set()
+        for tag in np.unique( peer_tag[ peer_fw == 1 ] ):
+            entries = np.unique( peer_entry[ ( peer_fw == 1 ) & ( peer_tag == tag ) ] )
+            entries = entries[ np.argsort( start[ entries ], kind = 'stable' ) ]
+            ends = end[ entries ]
+            reach = np.maximum.accumulate( ends )
+            holder = np.maximum.accumulate( np.where( ends == reach, np.arange( len( entries ) ), 0 ) )
+
+            for i in np.nonzero( start[ entries[ 1: ] ] <= reach[ :-1 ] )[ 0 ]:
+                pair = ( int( entries[ holder[ i ] ] ), int( entries[ i + 1 ] ) )
+
+                if pair not in seen:
+                    seen.add( pair )
+                    violations.append( tag_names[ int( tag ) ] + ': ' + describe( pair[ 0 ] ) +
+                                       ' overlaps ' + describe( pair[ 1 ] ) )
+
+        return( violations )
+
+#
+# Check a whole 'vrfs' list.  Returns the problems found, or None if NumPy
+# isn't installed.
+#
+def check_vrf_entries( vrf_entries ):
+    table = AddressTable()
+
+    for vrf_entry in vrf_entries:
+        table.add( vrf_entry )
+
+    return( table.check() )
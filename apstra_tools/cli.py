@@ -0,0 +1,67 @@
+'''
+cli.py
+    One command for all of the tools:
+        apstra-tools vrf-ps -s dc1 -d srx
+        apstra-tools deploy -y srx1 srx2 --wait 600
+        apstra-tools job status
+
+    Each subcommand lives in its own module, which is only imported once
+    it's chosen, so listing the commands or asking one for --help doesn't
+    load requests, NumPy or the rest of the library.  Installed by
+    'pip install .' as the apstra-tools console script; from a checkout,
+    'python -m apstra_tools ...' does the same.
+'''
+
+import importlib
+import sys
+
+# name -> ( module in this package, one line of help ).  Every module has
+# main( argv ).
+COMMANDS = {
+    'vrf-ps':     ( 'gen_srx_network_ps_vrf', 'Generate per-VRF BGP peering property sets for an SRX blueprint' ),
+    'type5-ps':   ( 'gen_srx_network_ps_type5', 'Generate type-5 interconnect property sets for an SRX blueprint' ),
+    'deploy':     ( 'deploy_blueprints', 'Commit-check and deploy many blueprints at once' ),
+    'set-timers': ( 'set_timers', 'Shorten service timers on every system in a blueprint (demos only)' ),
+    'service':    ( 'apstra_service', 'Run the resident worker' ),
+    'job':        ( 'apstra_job', 'Send a job to the resident worker' ),
+    'export':     ( 'apstra_export', 'Export every system\'s config context in a blueprint to gzipped NDJSON' ),
+    'inventory':  ( 'apstra_inventory', 'Sync blueprints into a local SQLite inventory and query it' ),
+    'standin':    ( 'apstra_standin', 'Serve a local stand-in for the Apstra API' ),
+    'memdiff':    ( 'apstra_memprofile', 'Compare two --memprofile reports for memory regressions' ),
+}
+
+
+#
+# Usage, with the list of commands
+#
+def usage():
+    lines = [ 'usage: apstra-tools <command> [ options ]', '', 'Commands:' ]
+    lines += [ '  ' + f'{name:<12}' + help_text for name, ( module, help_text ) in COMMANDS.items() ]
+    lines += [ '', 'Run apstra-tools <command> --help for the options of each.' ]
+
+    return( '\n'.join( lines ) )
+
+#
+# Import the chosen command and hand it the rest of the arguments.
+# Returns its exit status.
+#
+def main( argv = None ):
+    argv = sys.argv[ 1: ] if argv is None else argv
+
+    if not argv or argv[ 0 ] in ( '-h', '--help' ):
+        print( usage() )
+        return( 0 )
+
+    if argv[ 0 ] not in COMMANDS:
+        print( 'Error.  Unknown command ' + argv[ 0 ] + '.\n\n' + usage() )
+        return( 2 )
+
+    # So argparse in the command reports itself as 'apstra-tools <command>'
+    sys.argv[ 0 ] = 'apstra-tools ' + argv[ 0 ]
+    command = importlib.import_module( __package__ + '.' + COMMANDS[ argv[ 0 ] ][ 0 ] )
+
+    return( command.main( argv[ 1: ] ) )
+
+
+if __name__ == '__main__':
+    sys.exit( main() )
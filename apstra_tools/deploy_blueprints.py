@@ -0,0 +1,122 @@
+'''
+deploy_blueprints.py
+    Commit-check and deploy a list of blueprints in one go, e.g. all of the
+    freeform SRX blueprints after a fleet-wide change.  Commit-checks run
+    concurrently, blueprints that pass are deployed in parallel, and with
+    --revert-failed the ones that fail are reverted to their last deployed
+    state.  With --wait, each deploy is followed out to every system in the
+    blueprint, and the systems that failed or didn't finish in time are
+    listed.  Prints one report at the end, and can save it as JSON.
+
+    Blueprints can be given by UUID or label, on the command line or one
+    per line in a file.  With --journal FILE each deploy is recorded, and
+    --resume skips the blueprints already deployed at their current version.
+'''
+
+import json
+
+from apstra_tools import apstra_utils as aosUtil
+from apstra_tools import apstra_orchestrate as orchestrate
+from apstra_tools import apstra_journal as journaling
+
+
+#
+# Resolve the blueprints, confirm, then commit-check and deploy them all.
+# Returns the report, or None if the user backed out.
+#
+def deploy( argv ):
+    parser = aosUtil.build_arg_parser( 'Commit-check and deploy many blueprints at once.' )
+    parser.add_argument( 'blueprints', nargs='*', help='Blueprint UUIDs or labels' )
+    parser.add_argument( '-f', '--file', type=str, help='File with one blueprint UUID or label per line' )
+    parser.add_argument( '-w', '--workers', type=int, default=4,
+                         help='Blueprints to work on at the same time (default 4)' )
+    parser.add_argument( '--revert-failed', action='store_true',
+                         help='Revert blueprints that fail commit-check' )
+    parser.add_argument( '-y', '--yes', action='store_true', help='Deploy without asking first' )
+    parser.add_argument( '--wait', type=float, default=0, metavar='SECONDS',
+                         help='Follow each deploy until every system has taken it, for up to SECONDS' )
+    parser.add_argument( '-r', '--report', type=str, help='Also write the report to this JSON file' )
+    journaling.add_journal_args( parser )
+    args = parser.parse_args( argv )
+
+    wanted = list( args.blueprints )
+    if args.file:
+        with open( args.file ) as f:
+            wanted += [ line.strip() for line in f if line.strip() ]
+
+    if not wanted:
+        parser.error( 'no blueprints given' )
+
+    journal = journaling.journal_from_args( parser, args )
+
+    login_dict = aosUtil.login_dict_from_args( args )
+    login_dict = aosUtil.complete_login_dict( login_dict )
+    base_url = aosUtil.build_base_url( login_dict )
+    token = aosUtil.login( base_url, login_dict[ 'user' ], login_dict ['password' ] )
+
+    #
+    # Map whatever we were given to blueprint UUIDs from the blueprint index,
+    # which takes one list call
+    #
+    labels = { }
+    bp_ids = [ ]
+    for name in wanted:
+        bp = aosUtil.find_bp( token, base_url, name )
+
+        if bp is None:
+            raise aosUtil.NotFoundError( 'No blueprint found with UUID or name ' + name + '.' )
+
+        labels[ bp[ 'id' ] ] = bp[ 'label' ]
+        if bp[ 'id' ] not in bp_ids:
+            bp_ids.append( bp[ 'id' ] )
+
+    if not args.yes:
+        print( 'About to commit-check and deploy ' + str( len( bp_ids ) ) + ' blueprints:' )
+        for bp_id in bp_ids:
+            print( '  ' + labels[ bp_id ] + ' (' + bp_id + ')' )
+
+        if input( '\nContinue? [y|n]:  ' ) not in ( 'y', 'Y' ):
+            if journal:
+                journal.close()
+
+            aosUtil.logout( token, base_url )
+            return( None )
+
+    report = orchestrate.check_and_deploy( token, base_url, bp_ids, args.workers, args.revert_failed, journal,
+                                           args.wait )
+    orchestrate.print_report( report, labels )
+
+    if args.report:
+        with open( args.report, 'w' ) as f:
+            json.dump( { bp_id: dict( result, label = labels[ bp_id ] ) for bp_id, result in report.items() },
+                       f, indent = 2 )
+
+    if journal:
+        journal.close()
+
+    aosUtil.logout( token, base_url )
+
+    return( report )
+
+#
+# Run the tool.  Returns the exit status: 1 if anything failed, be it a
+# commit-check, a deploy, a rollout or a revert.
+#
+def main( argv = None ):
+    print( '\n\n' )
+
+    try:
+        report = deploy( argv )
+
+    except aosUtil.ApstraError as e:
+        print( 'Error.  ' + str( e ) + '  Quitting.\n' )
+        return( 1 )
+
+    if report and orchestrate.failed_blueprints( report ):
+        return( 1 )
+
+    return( 0 )
+
+
+if __name__ == '__main__':
+    quit( main() )
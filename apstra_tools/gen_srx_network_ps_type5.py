@@ -0,0 +1,34 @@
+'''
+gen_srx_network_ps_type5.py
+    This script will grab details from an Apstra reference design blueprint
+    and generate property sets for a freeform blueprint than configures
+    the edge firewalls connected to that RefDes blueprint for Type 5
+    interconnect between the blueprints.
+
+    Runs on the shared pipeline in apstra_pipeline.py with the 'type5'
+    output: the border ASN's and loopbacks, the firewall ASN's, and the L3
+    VNI and route targets of every EVPN VRF, published as type5_properties.
+    That takes the security zone list and two graph queries, however many
+    VRFs and VN's the fabric has.
+'''
+
+from apstra_tools import apstra_utils as aosUtil
+from apstra_tools import apstra_pipeline as pipeline
+
+
+#
+# Run the generator.  Returns the exit status.
+#
+def main( argv = None ):
+    try:
+        pipeline.main( 'Generate type-5 interconnect property sets for an SRX blueprint.', [ 'type5' ], argv )
+
+    except aosUtil.ApstraError as e:
+        print( 'Error.  ' + str( e ) + '  Quitting.\n' )
+        return( 1 )
+
+    return( 0 )
+
+
+if __name__ == '__main__':
+    quit( main() )
@@ -0,0 +1,35 @@
+'''
+gen_srx_network_ps_vrf.py
+    This script will grab details from an Apstra reference design blueprint
+    and generate property sets for a freeform blueprint than configures
+    the edge firewalls connected to that RefDes blueprint for BGP in each
+    VRF defined in the RefDes blueprint.
+
+    The collection, property set building and publishing all live in
+    apstra_pipeline.py, shared with the type-5 generator.  Use
+    --outputs to build more than one property set from a single pass
+    over the reference blueprint.
+
+    Last Updated:  2025-05-20 at 13:15
+'''
+
+from apstra_tools import apstra_utils as aosUtil
+from apstra_tools import apstra_pipeline as pipeline
+
+
+#
+# Run the generator.  Returns the exit status.
+#
+def main( argv = None ):
+    try:
+        pipeline.main( 'Generate per-VRF BGP peering property sets for an SRX blueprint.', [ 'vrf' ], argv )
+
+    except aosUtil.ApstraError as e:
+        print( 'Error.  ' + str( e ) + '  Quitting.\n' )
+        return( 1 )
+
+    return( 0 )
+
+
+if __name__ == '__main__':
+    quit( main() )
@@ -0,0 +1,91 @@
+'''
+apstra_set_timers.py
+    Used primarily for demos, this tool sets several Apstra service
+    timers to shorter intervals, thus speeding up anomaly detection
+    and reporting on the Apstra dashboard.  It is not intended for
+    production, as the timer values are too short for networks larger
+    than a few managed systems.  You should use this in conjunction
+    with a configlet to speed up LLDP failure detection.  In Junos,
+    it would look like this:
+
+    protocols {
+        lldp {
+            advertisement-interval 5;
+            hold-multiplier 3;
+        }
+    }
+
+    With --journal FILE, each timer set is recorded as it's done, and a
+    sweep that died partway through can be rerun with --resume to pick up
+    where it left off.  --memprofile FILE reports the memory used while
+    logging in, choosing the blueprint and setting the timers.
+'''
+
+from apstra_tools import apstra_utils as aosUtil
+from apstra_tools import apstra_journal as journaling
+from apstra_tools import apstra_memprofile as memprofile
+
+service_timers = { 'bgp': 33, 'route': 33, 'interface': 10, 'lldp': 10 }
+
+
+#
+# Pick a blueprint and shorten the timers on every system in it.  Returns
+# the exit status.
+#
+def main( argv = None ):
+    src_uuid = ''
+    print( '\n\n' )
+
+    try:
+        parser = aosUtil.build_arg_parser( 'Shorten Apstra service timers on every system in a blueprint.' )
+        journaling.add_journal_args( parser )
+        memprofile.add_memprofile_args( parser )
+        args = parser.parse_args( argv )
+        journal = journaling.journal_from_args( parser, args )
+        profile = memprofile.MemProfile() if args.memprofile else None
+
+        with memprofile.profile_phase( profile, 'login' ):
+            login_dict = aosUtil.login_dict_from_args( args )
+            login_dict = aosUtil.complete_login_dict( login_dict )
+
+            base_url = aosUtil.build_base_url( login_dict )
+
+            token = aosUtil.login( base_url, login_dict[ 'user' ], login_dict ['password' ] )
+
+        with memprofile.profile_phase( profile, 'choose_bp' ):
+            aosUtil.get_bp_list( token, base_url )
+
+            while src_uuid == '':
+                bp = aosUtil.find_bp( token, base_url, input( 'Enter UUID or name of desired blueprint: ' ) )
+
+                if bp is None:
+                    print( 'Error.  No such blueprint.\n' )
+                    continue
+
+                src_uuid = bp[ 'id' ]
+
+        with memprofile.profile_phase( profile, 'timers' ):
+            for system in aosUtil.iter_systems_in_bp( token, base_url, src_uuid ):
+                print( 'Device: ' + str(system) )
+                aosUtil.set_service_timers( token, base_url, system, service_timers, journal )
+                print ( '\n' )
+
+        if journal:
+            journal.close()
+
+        aosUtil.logout( token, base_url )
+
+        if profile:
+            profile.print_report()
+            profile.save( args.memprofile )
+            profile.stop()
+
+    except aosUtil.ApstraError as e:
+        print( 'Error.  ' + str( e ) + '  Quitting.\n' )
+        return( 1 )
+
+    return( 0 )
+
+
+if __name__ == '__main__':
+    quit( main() )
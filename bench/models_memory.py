@@ -0,0 +1,88 @@
+'''
+models_memory.py
+    Compares the memory held by raw virtual network JSON against the same
+    data decoded into the slot-based models in
+    apstra_tools/apstra_models.py.  The VN payloads are synthetic but shaped
+    like what Apstra returns, with the usual mix of fields the tools never
+    read.
+
+    Run from the top of the repo:
+        python -m bench.models_memory [ number_of_vns ]
+'''
+
+import gc
+import json
+import sys
+import tracemalloc
+
+from apstra_tools.apstra_models import vn_list_from_api
+
+
+#
+# Build a /virtual-networks style response with count VN's, encoded the
+# way it comes off the wire
+#
+def make_vn_json( count ):
+    vns = {}
+
+    for i in range( count ):
+        vn_id = 'vn-' + str( i ).zfill( 8 )
+        third = ( i // 256 ) % 256
+        fourth = i % 256
+        vns[ vn_id ] = {
+            'id': vn_id,
+            'label': 'vn_' + str( i ),
+            'vn_type': 'vxlan',
+            'vn_id': str( 10000 + i ),
+            'security_zone_id': 'sz-' + str( i % 64 ),
+            'reserved_vlan_id': 100 + ( i % 3900 ),
+            'ipv4_enabled': True,
+            'ipv4_subnet': '10.' + str( third ) + '.' + str( fourth ) + '.0/29',
+            'virtual_gateway_ipv4': '10.' + str( third ) + '.' + str( fourth ) + '.1',
+            'virtual_gateway_ipv4_enabled': True,
+            'ipv6_enabled': False,
+            'dhcp_service': 'dhcpServiceDisabled',
+            'rt_policy': { 'import_RTs': None, 'export_RTs': None },
+            'tags': [ 'peer_to_fw' ] if i % 4 == 0 else [],
+            'bound_to': [ { 'system_id': 'leaf-' + str( n ), 'vlan_id': 100 + ( i % 3900 ),
+                            'access_switch_node_ids': [] } for n in range( 2 ) ],
+            'svi_ips': [ { 'system_id': 'leaf-' + str( n ), 'ipv4_mode': 'enabled',
+                           'ipv4_addr': '10.' + str( third ) + '.' + str( fourth ) + '.' + str( 2 + n ) + '/29',
+                           'ipv6_mode': 'disabled', 'ipv6_addr': None } for n in range( 2 ) ],
+            'floating_ips': [ { 'id': 'fip-' + str( i ) + '-' + str( n ),
+                                'ipv4_addr': '10.' + str( third ) + '.' + str( fourth ) + '.' + str( 4 + n ) + '/29',
+                                'ipv6_addr': None, 'label': '',
+                                'generic_system_ids': [ 'fw-' + str( n ) ] } for n in range( 2 ) ],
+            'create_policy_tagged': True,
+            'l3_mtu': 9000,
+        }
+
+    return( json.dumps( { 'virtual_networks': vns } ) )
+
+#
+# Bytes still allocated after running decode() on the raw response
+#
+def measure( raw, decode ):
+    gc.collect()
+    tracemalloc.start()
+    data = decode( raw )
+    gc.collect()
+    held, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return( held, peak, data )
+
+
+count = int( sys.argv[ 1 ] ) if len( sys.argv ) > 1 else 20000
+raw = make_vn_json( count )
+
+dict_held, dict_peak, vn_dicts = measure( raw, json.loads )
+vn_dicts = None
+model_held, model_peak, vn_models = measure( raw, lambda r: vn_list_from_api( json.loads( r ) ) )
+
+print( '\nVirtual networks: ' + str( count ) + '\n' )
+print( f'{"":<16}' + f'{"held (MiB)":>12}' + f'{"peak (MiB)":>12}' )
+print( f'{"raw dicts":<16}' + f'{dict_held / 2**20:>12.1f}' + f'{dict_peak / 2**20:>12.1f}' )
+print( f'{"models":<16}' + f'{model_held / 2**20:>12.1f}' + f'{model_peak / 2**20:>12.1f}' )
+print( '\nModels hold ' + f'{100 * ( 1 - model_held / dict_held ):.0f}' +
+       '% less memory than the raw JSON.\n' )
@@ -0,0 +1,54 @@
+'''
+paging_memory.py
+    Peak memory of pulling a large VN collection from the stand-in API in
+    one response (get_vn_list) versus paging through it (iter_vn_list) and
+    keeping only the peering VN's as models, which is what the generators do.
+
+    Run from the top of the repo:
+        python -m bench.paging_memory [ number_of_vns ]
+'''
+
+import gc
+import sys
+import tracemalloc
+
+from apstra_tools import apstra_utils as aosUtil
+from apstra_tools.apstra_models import VirtualNetwork
+from apstra_tools.apstra_standin import make_fixture, start_standin
+
+
+#
+# Peak bytes allocated while running fn()
+#
+def peak_of( fn ):
+    gc.collect()
+    tracemalloc.start()
+    result = fn()
+    peak = tracemalloc.get_traced_memory()[ 1 ]
+    tracemalloc.stop()
+
+    return( peak, result )
+
+def whole_list():
+    vn_json = aosUtil.get_vn_list( 'token', base_url, 'bp-ref' )
+
+    return( [ VirtualNetwork.from_api( vn_data, vn_id )
+              for vn_id, vn_data in vn_json[ 'virtual_networks' ].items()
+              if 'peer_to_fw' in vn_data[ 'tags' ] ] )
+
+def paged():
+    return( [ VirtualNetwork.from_api( vn_data, vn_id )
+              for vn_id, vn_data in aosUtil.iter_vn_list( 'token', base_url, 'bp-ref', 1000 )
+              if 'peer_to_fw' in vn_data[ 'tags' ] ] )
+
+
+count = int( sys.argv[ 1 ] ) if len( sys.argv ) > 1 else 50000
+server, base_url = start_standin( make_fixture( count ) )
+
+list_peak, list_vns = peak_of( whole_list )
+page_peak, page_vns = peak_of( paged )
+server.shutdown()
+
+print( '\nVirtual networks: ' + str( count ) + ', peering VNs kept: ' + str( len( page_vns ) ) + '\n' )
+print( f'{"get_vn_list":<16}' + f'{list_peak / 2**20:>10.1f} MiB peak' )
+print( f'{"iter_vn_list":<16}' + f'{page_peak / 2**20:>10.1f} MiB peak\n' )
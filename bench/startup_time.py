@@ -0,0 +1,65 @@
+'''
+startup_time.py
+    How long the tools take to start, and which heavy modules they load
+    on the way.  Each case runs in a fresh interpreter several times and
+    the median wall time is reported, next to a bare interpreter for
+    reference.  Listing the commands and --help should stay close to the
+    bare interpreter; requests is only paid for once a session is made.
+
+    Run from the top of the repo:
+        python -m bench.startup_time [ runs ]
+'''
+
+import statistics
+import subprocess
+import sys
+import time
+
+HEAVY_MODULES = ( 'requests', 'urllib3', 'numpy' )
+
+# name -> statement run in a fresh interpreter
+CASES = {
+    'python (bare)':           'pass',
+    'apstra-tools --help':     'from apstra_tools import cli; cli.main( [ "--help" ] )',
+    'apstra-tools vrf-ps -h':  'from apstra_tools import cli; cli.main( [ "vrf-ps", "--help" ] )',
+    'apstra-tools deploy -h':  'from apstra_tools import cli; cli.main( [ "deploy", "--help" ] )',
+    'import apstra_pipeline':  'import apstra_tools.apstra_pipeline',
+    'first get_session()':     'from apstra_tools import apstra_utils; apstra_utils.get_session()',
+}
+
+# Runs the statement, then reports which heavy modules got loaded on stderr
+WRAPPER = '''
+import sys
+try:
+    {statement}
+except SystemExit:
+    pass
+sys.stderr.write( ",".join( m for m in {heavy!r} if m in sys.modules ) )
+'''
+
+
+#
+# Median seconds to run statement in a new interpreter, and the heavy
+# modules it loaded
+#
+def time_case( statement, runs ):
+    code = WRAPPER.format( statement = statement, heavy = HEAVY_MODULES )
+    times = [ ]
+
+    for _ in range( runs ):
+        start = time.perf_counter()
+        done = subprocess.run( [ sys.executable, '-c', code ], stdout = subprocess.DEVNULL,
+                               stderr = subprocess.PIPE, text = True, check = True )
+        times.append( time.perf_counter() - start )
+
+    return( statistics.median( times ), done.stderr.strip() or '-' )
+
+
+runs = int( sys.argv[ 1 ] ) if len( sys.argv ) > 1 else 9
+
+print( '\nMedian of ' + str( runs ) + ' runs\n' )
+for name, statement in CASES.items():
+    seconds, loaded = time_case( statement, runs )
+    print( f'{name:<28}' + f'{seconds * 1000:>8.0f} ms   loads ' + loaded )
+
+print()
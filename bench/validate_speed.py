@@ -0,0 +1,66 @@
+'''
+validate_speed.py
+    Times the IP validation in apstra_tools/apstra_validate.py on a
+    synthetic 'vrfs' list, with a few broken entries mixed in so every check has
+    something to report.  Packing the addresses is a plain Python pass
+    over the entries; the checks themselves run on the packed arrays.
+
+    Run from the top of the repo:
+        python -m bench.validate_speed [ number_of_entries ]
+'''
+
+import sys
+import time
+
+from apstra_tools.apstra_validate import AddressTable, have_numpy
+
+
+#
+# count VRF entries across 64 VRFs, each a /29 with two leaves and two
+# firewalls, then break three of them
+#
+def make_vrf_entries( count ):
+    vrfs = [ ]
+
+    for i in range( count ):
+        net = '10.' + str( i // 8192 ) + '.' + str( ( i // 32 ) % 256 ) + '.' + str( ( i % 32 ) * 8 )
+        base = net.rsplit( '.', 1 )[ 0 ] + '.'
+        last = ( i % 32 ) * 8
+        vrfs.append( { 'name': 'VRF' + str( i % 64 ), 'vlan_id': 100 + i % 3900,
+                       'ipv4_subnet': net + '/29',
+                       'leaves': [ { 'tag': 'border1', 'ip4': base + str( last + 2 ) },
+                                   { 'tag': 'border2', 'ip4': base + str( last + 3 ) } ],
+                       'firewalls': [ { 'tag': 'fw_node1', 'ip4': base + str( last + 4 ) },
+                                      { 'tag': 'fw_node2', 'ip4': base + str( last + 5 ) } ] } )
+
+    # Outside its subnet, a duplicate in one VRF, and an overlapping subnet
+    vrfs[ 1 ][ 'firewalls' ][ 0 ][ 'ip4' ] = '192.168.0.1'
+    vrfs[ 64 ][ 'leaves' ][ 1 ][ 'ip4' ] = vrfs[ 64 ][ 'leaves' ][ 0 ][ 'ip4' ]
+    vrfs[ 2 ][ 'ipv4_subnet' ] = vrfs[ 2 ][ 'ipv4_subnet' ].split( '/' )[ 0 ] + '/28'
+
+    return( vrfs )
+
+
+if __name__ == '__main__':
+    count = int( sys.argv[ 1 ] ) if len( sys.argv ) > 1 else 50000
+
+    if not have_numpy():
+        print( 'NumPy isn\'t installed, nothing to time.\n' )
+        quit()
+
+    vrfs = make_vrf_entries( count )
+    start = time.perf_counter()
+    table = AddressTable()
+    for vrf_entry in vrfs:
+        table.add( vrf_entry )
+
+    packed = time.perf_counter()
+    violations = table.check()
+    checked = time.perf_counter()
+
+    for violation in violations:
+        print( violation )
+
+    print( '\n' + str( count ) + ' entries: packed in ' + str( round( ( packed - start ) * 1000, 1 ) ) +
+           ' ms, checked in ' + str( round( ( checked - packed ) * 1000, 1 ) ) + ' ms, ' +
+           str( len( violations ) ) + ' problems.\n' )
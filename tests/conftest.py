@@ -0,0 +1,29 @@
+'''
+conftest.py
+    A stand-in API (apstra_tools/apstra_standin.py) per test, so the tests
+    exercise the library over real HTTP without a controller.
+'''
+
+import pytest
+
+from apstra_tools import apstra_utils as aosUtil
+from apstra_tools.apstra_standin import make_fixture, start_standin
+
+
+#
+# ( fixture, base URL ) of a fresh stand-in with 100 VN's.  Change the
+# fixture dict to change what the stand-in serves.  A later stand-in can
+# get the same port, so the bodies kept for conditional GETs and the
+# cached query results go with it.
+#
+@pytest.fixture
+def standin():
+    fixture = make_fixture( 100 )
+    server, base_url = start_standin( fixture )
+
+    yield( fixture, base_url )
+
+    server.shutdown()
+    server.server_close()
+    aosUtil.clear_conditional_cache()
+    aosUtil.clear_query_cache()
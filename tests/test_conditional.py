@@ -0,0 +1,73 @@
+'''
+test_conditional.py
+    Conditional GETs against the stand-in: an unchanged resource isn't
+    sent again, transfer_stats() counts what that saved, and sweeps don't
+    keep their bodies.
+'''
+
+from apstra_tools import apstra_utils as aosUtil
+
+SZ_KIND = 'blueprints/{id}/security-zones'
+
+
+def transfer( kind ):
+    return( aosUtil.transfer_stats().get( kind, { 'requests': 0, 'bytes': 0, 'decoded_bytes': 0,
+                                                  'not_modified': 0, 'saved_bytes': 0 } ) )
+
+
+#
+# Bodies kept for conditional GETs to URLs under base_url
+#
+def kept( base_url ):
+    with aosUtil._conditional_lock:
+        return( [ url for url, params in aosUtil._conditional if url.startswith( base_url ) ] )
+
+
+def test_unchanged_resource_comes_back_304( standin ):
+    fixture, base_url = standin
+    before = transfer( SZ_KIND )
+
+    first = aosUtil.get_sz_list( 'token', base_url, 'bp-ref' )
+    sent = fixture[ 'bytes_sent' ]
+    second = aosUtil.get_sz_list( 'token', base_url, 'bp-ref' )
+    after = transfer( SZ_KIND )
+
+    assert second == first
+    # The second reply had no body
+    assert fixture[ 'bytes_sent' ] == sent
+    assert after[ 'requests' ] - before[ 'requests' ] == 2
+    assert after[ 'not_modified' ] - before[ 'not_modified' ] == 1
+    assert after[ 'saved_bytes' ] - before[ 'saved_bytes' ] == after[ 'decoded_bytes' ] - before[ 'decoded_bytes' ] > 0
+
+
+def test_changed_resource_is_sent_again( standin ):
+    fixture, base_url = standin
+    before = transfer( SZ_KIND )
+
+    aosUtil.get_sz_list( 'token', base_url, 'bp-ref' )
+    fixture[ 'security_zones' ][ 'sz-0' ][ 'vrf_name' ] = 'renamed'
+    zones = aosUtil.get_sz_list( 'token', base_url, 'bp-ref' )
+
+    assert zones[ 'items' ][ 'sz-0' ][ 'vrf_name' ] == 'renamed'
+    assert transfer( SZ_KIND )[ 'not_modified' ] == before[ 'not_modified' ]
+
+
+def test_wire_bytes_are_compressed( standin ):
+    fixture, base_url = standin
+    before = transfer( 'blueprints/{id}/virtual-networks' )
+
+    list( aosUtil.iter_vn_list( 'token', base_url, 'bp-ref' ) )
+    after = transfer( 'blueprints/{id}/virtual-networks' )
+
+    assert after[ 'bytes' ] - before[ 'bytes' ] < ( after[ 'decoded_bytes' ] - before[ 'decoded_bytes' ] ) / 2
+
+
+def test_sweeps_are_not_kept( standin ):
+    fixture, base_url = standin
+
+    list( aosUtil.iter_vn_list( 'token', base_url, 'bp-ref', page_size = 10 ) )
+    for sys_id in aosUtil.iter_systems_in_bp( 'token', base_url, 'bp-ref' ):
+        aosUtil.get_dev_context( 'token', base_url, 'bp-ref', sys_id )
+    aosUtil.get_sz_list( 'token', base_url, 'bp-ref' )
+
+    assert kept( base_url ) == [ base_url + '/blueprints/bp-ref/security-zones' ]
@@ -0,0 +1,75 @@
+'''
+test_export.py
+    Exporting config contexts from the stand-in, and resuming an export
+    that was cut short.
+'''
+
+import gzip
+import json
+
+from apstra_tools import apstra_export as export
+
+
+def exported( path ):
+    with gzip.open( path, 'rt' ) as f:
+        return( [ json.loads( line ) for line in f ] )
+
+
+def raw_size( path ):
+    with gzip.open( path, 'rb' ) as f:
+        return( len( f.read() ) )
+
+
+def test_export_writes_every_context( standin, tmp_path ):
+    fixture, base_url = standin
+    path = str( tmp_path / 'dc1.ndjson.gz' )
+
+    stats = export.export_contexts( 'token', base_url, 'bp-ref', path, workers = 2 )
+
+    records = exported( path )
+    assert sorted( record[ 'system_id' ] for record in records ) == sorted( fixture[ 'systems' ] )
+    assert records[ 0 ][ 'context' ] == fixture[ 'systems' ][ records[ 0 ][ 'system_id' ] ]
+    assert stats[ 'written' ] == len( fixture[ 'systems' ] )
+    assert stats[ 'bytes' ] == raw_size( path )
+
+
+def test_resume_keeps_complete_lines_and_fetches_the_rest( standin, tmp_path ):
+    fixture, base_url = standin
+    path = str( tmp_path / 'dc1.ndjson.gz' )
+
+    # An export that died partway through a line.  The kept line isn't
+    # all ASCII, so its size in bytes and in characters differ.
+    kept = json.dumps( { 'blueprint': 'bp-ref', 'system_id': 'leaf-1', 'context': { 'hostname': 'leaf-ü' } },
+                       ensure_ascii = False ) + '\n'
+    with gzip.open( path, 'wt', encoding = 'utf-8' ) as f:
+        f.write( kept + '{"blueprint":"bp-ref","system_id":"leaf-2","cont' )
+
+    stats = export.export_contexts( 'token', base_url, 'bp-ref', path, workers = 2, resume = True )
+
+    records = exported( path )
+    assert sorted( record[ 'system_id' ] for record in records ) == sorted( fixture[ 'systems' ] )
+    assert records[ 0 ][ 'context' ] == { 'hostname': 'leaf-ü' }
+    assert stats[ 'kept' ] == 1
+    assert stats[ 'written' ] == len( fixture[ 'systems' ] ) - 1
+    assert stats[ 'bytes' ] == raw_size( path )
+    assert not ( tmp_path / 'dc1.ndjson.gz.partial' ).exists()
+
+    # A finished export resumes to itself
+    stats = export.export_contexts( 'token', base_url, 'bp-ref', path, workers = 2, resume = True )
+    assert ( stats[ 'kept' ], stats[ 'written' ] ) == ( len( fixture[ 'systems' ] ), 0 )
+    assert len( exported( path ) ) == len( fixture[ 'systems' ] )
+
+
+def test_truncated_file_reads_up_to_the_break( tmp_path ):
+    path = str( tmp_path / 'cut.ndjson.gz' )
+    with gzip.open( path, 'wb' ) as f:
+        f.write( b'{"system_id":"a"}\n{"system_id":"b"}\n' * 50 )
+
+    with open( path, 'rb' ) as f:
+        data = f.read()
+    with open( path, 'wb' ) as f:
+        f.write( data[ :len( data ) // 2 ] )
+
+    ids = [ sys_id for sys_id, line in export.read_export( path ) ]
+    assert len( ids ) < 100
+    assert ids == [ 'a', 'b' ] * ( len( ids ) // 2 ) + [ 'a' ] * ( len( ids ) % 2 )
@@ -0,0 +1,71 @@
+'''
+test_inventory.py
+    Syncing the SQLite inventory from the stand-in, and answering from it.
+'''
+
+import pytest
+
+from apstra_tools import apstra_inventory as inventory
+from apstra_tools import apstra_utils as aosUtil
+
+
+def test_only_changed_blueprints_are_fetched_again( standin, tmp_path ):
+    fixture, base_url = standin
+    path = str( tmp_path / 'inventory.db' )
+
+    summary = inventory.sync( 'token', base_url, path )
+    assert sorted( summary[ 'fetched' ] ) == [ 'bp-ref', 'bp-srx' ]
+
+    summary = inventory.sync( 'token', base_url, path )
+    assert summary == { 'fetched': [ ], 'current': [ 'bp-ref', 'bp-srx' ], 'dropped': [ ] }
+
+    # A change without a new version isn't seen
+    fixture[ 'virtual_networks' ][ 'vn-0' ][ 'tags' ] = [ 'quarantine' ]
+    inventory.sync( 'token', base_url, path )
+    with inventory.Inventory( path ) as inv:
+        assert inv.find_tagged( 'quarantine' ) == [ ]
+
+    fixture[ 'blueprints' ][ 0 ][ 'version' ] += 1
+    summary = inventory.sync( 'token', base_url, path )
+    assert summary == { 'fetched': [ 'bp-ref' ], 'current': [ 'bp-srx' ], 'dropped': [ ] }
+
+    with inventory.Inventory( path ) as inv:
+        assert inv.versions() == { 'bp-ref': 2, 'bp-srx': 1 }
+        assert inv.find_tagged( 'quarantine' ) == [ ( 'dc1', 'vn', 'vn-0', 'vn_0', 'quarantine' ) ]
+        assert len( list( inv.virtual_networks( 'bp-ref', 'peer_to_fw' ) ) ) == 49
+
+
+def test_blueprints_that_are_gone_are_dropped( standin, tmp_path ):
+    fixture, base_url = standin
+    path = str( tmp_path / 'inventory.db' )
+    inventory.sync( 'token', base_url, path )
+
+    del fixture[ 'blueprints' ][ 1 ]
+
+    # Not when syncing only some blueprints
+    assert inventory.sync( 'token', base_url, path, [ 'dc1' ] )[ 'dropped' ] == [ ]
+    assert inventory.sync( 'token', base_url, path )[ 'dropped' ] == [ 'bp-srx' ]
+
+    with inventory.Inventory( path ) as inv:
+        assert inv.versions() == { 'bp-ref': 1 }
+
+    with pytest.raises( aosUtil.NotFoundError ):
+        inventory.sync( 'token', base_url, path, [ 'srx' ] )
+
+
+def test_stored_blueprint_reads_back( standin, tmp_path ):
+    fixture, base_url = standin
+    path = str( tmp_path / 'inventory.db' )
+    inventory.sync( 'token', base_url, path, [ 'bp-ref' ] )
+
+    with inventory.Inventory( path ) as inv:
+        vns = list( inv.virtual_networks( 'bp-ref' ) )
+        assert [ vn.id for vn in vns ] == list( fixture[ 'virtual_networks' ] )
+        assert vns[ 0 ].svi_ips[ 0 ].ipv4_addr == '10.0.0.2'
+        assert vns[ 0 ].floating_ips[ 1 ].generic_system_ids == ( 'fw-2', )
+
+        assert inv.sz_index( 'bp-ref' )[ 'sz-3' ].import_rts == ( '20003:1', )
+        assert [ ( system.node_id, system.role, system.asn, system.loopback )
+                 for system in inv.systems_tagged( 'bp-ref', 'border*' ) ] == \
+               [ ( 'leaf-1', 'border1', '65101', '10.255.0.1/32' ), ( 'leaf-2', 'border2', '65102', '10.255.0.2/32' ) ]
+        assert [ row[ 1 ] for row in inv.find_asn( '65201' ) ] == [ 'fw-1' ]
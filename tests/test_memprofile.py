@@ -0,0 +1,89 @@
+'''
+test_memprofile.py
+    Memory reports by phase, and telling when a phase regressed.
+'''
+
+import json
+
+from apstra_tools import apstra_memprofile as memprofile
+
+MB = 1024 * 1024
+
+
+def report( **growth ):
+    return( { 'phases': [ { 'phase': name, 'start_bytes': 10 * MB, 'peak_bytes': 10 * MB + size,
+                            'end_bytes': 10 * MB } for name, size in growth.items() ] } )
+
+
+def test_growth_past_tolerance_is_a_regression():
+    old = report( collect = 20 * MB, build = 20 * MB )
+    new = report( collect = 21 * MB, build = 23 * MB )
+
+    regressions = memprofile.compare_reports( old, new )
+
+    assert regressions == [ 'build: peak grew by 23.0 MiB, was 20.0 MiB' ]
+    assert memprofile.compare_reports( old, new, tolerance = 0.20 ) == [ ]
+
+
+def test_small_phases_need_to_grow_by_min_bytes():
+    old = report( login = 100 * 1024 )
+    new = report( login = 900 * 1024 )
+
+    # Nine times bigger, but still under a MiB more
+    assert memprofile.compare_reports( old, new ) == [ ]
+    assert memprofile.compare_reports( old, new, min_bytes = 512 * 1024 ) != [ ]
+
+
+def test_growth_is_counted_from_where_the_phase_started():
+    old = report( build = 20 * MB )
+    new = report( build = 20 * MB )
+    # Started and peaked 50 MiB higher, but grew no more
+    new[ 'phases' ][ 0 ][ 'start_bytes' ] += 50 * MB
+    new[ 'phases' ][ 0 ][ 'peak_bytes' ] += 50 * MB
+
+    assert memprofile.compare_reports( old, new ) == [ ]
+
+
+def test_phases_in_only_one_report_are_left_out():
+    old = report( collect = 1 * MB, gone = 1 * MB )
+    new = report( collect = 1 * MB, added = 100 * MB )
+
+    assert memprofile.compare_reports( old, new ) == [ ]
+
+
+def test_main_exits_1_on_a_regression( tmp_path, capsys ):
+    paths = [ ]
+    for name, growth in ( ( 'old', 20 * MB ), ( 'new', 30 * MB ) ):
+        paths.append( str( tmp_path / ( name + '.json' ) ) )
+        with open( paths[ -1 ], 'w' ) as f:
+            json.dump( report( build = growth ), f )
+
+    assert memprofile.main( paths ) == 1
+    assert 'build: peak grew by 30.0 MiB' in capsys.readouterr().out
+    assert memprofile.main( paths + [ '--tolerance', '60' ] ) == 0
+
+
+def test_phases_are_recorded_and_saved( tmp_path ):
+    profile = memprofile.MemProfile( top = 2 )
+
+    try:
+        with profile.phase( 'build' ):
+            held = [ bytearray( 1024 ) for i in range( 1024 ) ]
+
+        with memprofile.profile_phase( profile, 'drop' ):
+            del held
+
+        profile.save( str( tmp_path / 'mem.json' ) )
+
+    finally:
+        profile.stop()
+
+    with open( str( tmp_path / 'mem.json' ) ) as f:
+        saved = json.load( f )
+
+    build, drop = saved[ 'phases' ]
+    assert [ build[ 'phase' ], drop[ 'phase' ] ] == [ 'build', 'drop' ]
+    assert build[ 'end_bytes' ] - build[ 'start_bytes' ] > 1000 * 1024
+    assert drop[ 'end_bytes' ] < drop[ 'start_bytes' ]
+    assert len( build[ 'top' ] ) <= 2
+    assert saved[ 'peak_bytes' ] >= build[ 'peak_bytes' ]
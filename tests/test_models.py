@@ -0,0 +1,29 @@
+'''
+test_models.py
+    Decoding blueprint entities into the compact models.
+'''
+
+from apstra_tools import apstra_pipeline as pipeline
+from apstra_tools.apstra_models import VirtualNetwork, SecurityZone
+
+
+def test_prefix_bits():
+    assert VirtualNetwork.from_api( { 'ipv4_subnet': '10.1.2.0/24' }, 'vn1' ).prefix_bits == '24'
+
+
+def test_l2_only_vn_has_no_prefix_bits():
+    assert VirtualNetwork.from_api( { 'ipv4_subnet': '' }, 'vn1' ).prefix_bits is None
+    assert VirtualNetwork.from_api( { 'ipv4_subnet': None }, 'vn1' ).prefix_bits is None
+    assert VirtualNetwork.from_api( { }, 'vn1' ).prefix_bits is None
+
+
+def test_l2_only_vns_are_skipped():
+    sz_index = { 'sz1': SecurityZone( 'sz1', vrf_name = 'blue' ) }
+    vns = [ VirtualNetwork( 'vn1', security_zone_id = 'sz1', ipv4_subnet = '10.1.2.0/24' ),
+            VirtualNetwork( 'vn2', security_zone_id = 'sz1' ) ]
+    counts = { }
+
+    entries = list( pipeline.iter_vrf_entries( 'token', 'url', 'bp', vns, sz_index, [ ], [ ], counts = counts ) )
+
+    assert [ entry[ 'ipv4_subnet' ] for entry in entries ] == [ '10.1.2.0/24' ]
+    assert counts == { 'rebuilt': 1, 'total': 1, 'skipped': 1 }
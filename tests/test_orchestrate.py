@@ -0,0 +1,160 @@
+'''
+test_orchestrate.py
+    Commit-check, deploy and rollout of several blueprints against the
+    stand-in, with a journal.
+'''
+
+import pytest
+
+from apstra_tools import apstra_journal as journaling
+from apstra_tools import apstra_orchestrate as orchestrate
+
+
+@pytest.fixture( autouse = True )
+def quick_rollouts( monkeypatch, standin ):
+    fixture, base_url = standin
+    fixture[ 'rollout_seconds' ] = 0.2
+    monkeypatch.setitem( orchestrate.ROLLOUT_POLL, 'initial', 0.05 )
+    monkeypatch.setitem( orchestrate.ROLLOUT_POLL, 'max', 0.2 )
+    monkeypatch.setattr( orchestrate, 'ROLLOUT_SETTLE', 0.05 )
+
+
+def test_failed_rollout_is_redone_on_resume( standin, tmp_path ):
+    fixture, base_url = standin
+    path = str( tmp_path / 'deploy.journal' )
+    fixture[ 'failing_systems' ] = { 'leaf-3' }
+
+    journal = journaling.Journal( path )
+    report = orchestrate.check_and_deploy( 'token', base_url, [ 'bp-ref' ], journal = journal, wait = 10 )
+    journal.close()
+
+    assert report[ 'bp-ref' ][ 'deployed' ] is True
+    assert report[ 'bp-ref' ][ 'rollout' ] is False
+    assert list( report[ 'bp-ref' ][ 'devices' ][ 'failed' ] ) == [ 'leaf-3' ]
+    assert journaling.read_journal( path ) == { }
+
+    # Fixed on the device; the resumed run deploys and follows it again
+    fixture[ 'failing_systems' ] = set()
+    journal = journaling.Journal( path, resume = True )
+    report = orchestrate.check_and_deploy( 'token', base_url, [ 'bp-ref' ], journal = journal, wait = 10 )
+    journal.close()
+
+    assert report[ 'bp-ref' ][ 'commit_check' ] is True
+    assert report[ 'bp-ref' ][ 'rollout' ] is True
+    assert journaling.read_journal( path ) == { 'deploy/bp-ref': [ 1, 'rolled_out' ] }
+
+    # And now it's done
+    journal = journaling.Journal( path, resume = True )
+    report = orchestrate.check_and_deploy( 'token', base_url, [ 'bp-ref' ], journal = journal, wait = 10 )
+    journal.close()
+
+    assert report[ 'bp-ref' ] == { 'commit_check': None, 'deployed': True, 'rollout': True, 'reverted': None }
+
+
+def test_deploy_without_wait_is_recorded_at_once( standin, tmp_path ):
+    fixture, base_url = standin
+    path = str( tmp_path / 'deploy.journal' )
+
+    journal = journaling.Journal( path )
+    orchestrate.check_and_deploy( 'token', base_url, [ 'bp-ref', 'bp-srx' ], journal = journal )
+    journal.close()
+
+    assert journaling.read_journal( path ) == { 'deploy/bp-ref': 1, 'deploy/bp-srx': 1 }
+
+    # A plain deploy isn't enough for a run that waits for the rollout
+    journal = journaling.Journal( path, resume = True )
+    report = orchestrate.check_and_deploy( 'token', base_url, [ 'bp-ref' ], journal = journal, wait = 10 )
+    journal.close()
+
+    assert report[ 'bp-ref' ][ 'commit_check' ] is True
+    assert report[ 'bp-ref' ][ 'rollout' ] is True
+
+
+def test_rollout_follows_the_anomalies( standin ):
+    fixture, base_url = standin
+    fixture[ 'failing_systems' ] = { 'leaf-2' }
+
+    report = orchestrate.check_and_deploy( 'token', base_url, [ 'bp-ref' ], wait = 10 )
+    devices = report[ 'bp-ref' ][ 'devices' ]
+
+    assert sorted( devices[ 'succeeded' ] ) == [ 'leaf-1', 'leaf-3', 'leaf-4' ]
+    assert devices[ 'failed' ] == { 'leaf-2': 'Commit failed on device' }
+    assert orchestrate.failed_blueprints( report ) == [ 'bp-ref' ]
+
+
+def test_rollout_times_out( standin ):
+    fixture, base_url = standin
+    fixture[ 'rollout_seconds' ] = 60
+
+    report = orchestrate.check_and_deploy( 'token', base_url, [ 'bp-ref' ], wait = 0.3 )
+
+    assert report[ 'bp-ref' ][ 'rollout' ] is False
+    assert report[ 'bp-ref' ][ 'devices' ][ 'timed_out' ] == list( fixture[ 'systems' ] )
+
+
+def test_only_real_commit_check_failures_are_reverted( standin ):
+    fixture, base_url = standin
+    fixture[ 'blueprints' ].append( { 'id': 'bp-busy', 'label': 'busy', 'design': 'freeform', 'version': 1 } )
+    fixture[ 'failing_checks' ] = { 'bp-srx' }
+    fixture[ 'check_errors' ] = { 'bp-busy': 409 }
+
+    report = orchestrate.check_and_deploy( 'token', base_url, [ 'bp-ref', 'bp-srx', 'bp-busy' ],
+                                           revert_failed = True )
+
+    assert fixture[ 'reverts' ] == [ 'bp-srx' ]
+    assert report[ 'bp-srx' ][ 'commit_check' ] is False
+    assert report[ 'bp-srx' ][ 'reverted' ] is True
+    assert report[ 'bp-busy' ][ 'commit_check' ] is None
+    assert report[ 'bp-busy' ][ 'reverted' ] is None
+    assert '409' in report[ 'bp-busy' ][ 'check_error' ]
+    assert sorted( orchestrate.failed_blueprints( report ) ) == [ 'bp-busy', 'bp-srx' ]
+
+
+def test_unavailable_commit_check_is_not_reverted( standin ):
+    fixture, base_url = standin
+    fixture[ 'check_errors' ] = { 'bp-ref': 503 }
+
+    report = orchestrate.check_and_deploy( 'token', base_url, [ 'bp-ref' ], revert_failed = True )
+
+    assert fixture[ 'reverts' ] == [ ]
+    assert report[ 'bp-ref' ][ 'deployed' ] is None
+    assert '503' in report[ 'bp-ref' ][ 'check_error' ]
+
+
+def test_anomaly_left_from_an_earlier_deploy_is_not_a_failure( standin ):
+    fixture, base_url = standin
+    fixture[ 'old_anomalies' ] = { 'leaf-2': 'Commit failed on device' }
+
+    report = orchestrate.check_and_deploy( 'token', base_url, [ 'bp-ref' ], wait = 10 )
+    devices = report[ 'bp-ref' ][ 'devices' ]
+
+    # leaf-2 took this deploy, which cleared the old anomaly
+    assert report[ 'bp-ref' ][ 'rollout' ] is True
+    assert sorted( devices[ 'succeeded' ] ) == [ 'leaf-1', 'leaf-2', 'leaf-3', 'leaf-4' ]
+    assert devices[ 'failed' ] == { }
+
+
+def test_system_stuck_on_an_earlier_deploy_is_stale( standin ):
+    fixture, base_url = standin
+    fixture[ 'old_anomalies' ] = { 'leaf-2': 'Commit failed on device' }
+    fixture[ 'stuck_systems' ] = { 'leaf-2' }
+
+    report = orchestrate.check_and_deploy( 'token', base_url, [ 'bp-ref' ], wait = 10 )
+    devices = report[ 'bp-ref' ][ 'devices' ]
+
+    assert report[ 'bp-ref' ][ 'rollout' ] is False
+    assert sorted( devices[ 'succeeded' ] ) == [ 'leaf-1', 'leaf-3', 'leaf-4' ]
+    assert devices[ 'failed' ] == { }
+    assert devices[ 'stale' ] == { 'leaf-2': 'Commit failed on device' }
+    assert orchestrate.failed_blueprints( report ) == [ 'bp-ref' ]
+
+
+def test_system_without_anomalies_waits_for_the_deployed_version( standin, monkeypatch ):
+    fixture, base_url = standin
+    # The blueprint is deployed again, by someone else, straight away
+    monkeypatch.setattr( orchestrate.aosUtil, 'get_deploy_status', lambda token, url, bp_id: 7 )
+
+    rollout = orchestrate.wait_for_rollout( 'token', base_url, 'bp-ref', 1, 10, settle = 0 )
+
+    assert rollout[ 'succeeded' ] == [ ]
+    assert rollout[ 'timed_out' ] == list( fixture[ 'systems' ] )
@@ -0,0 +1,105 @@
+'''
+test_paging.py
+    iter_collection against the stand-in: the page parameters are sent and
+    honored, with or without the server echoing them, and a caller that
+    stops early stops the fetching too.
+'''
+
+from itertools import islice
+
+from apstra_tools import apstra_utils as aosUtil
+
+VN_KIND = 'blueprints/{id}/virtual-networks'
+
+
+#
+# GETs of the VN list made so far
+#
+def vn_list_requests():
+    return( aosUtil.transfer_stats().get( VN_KIND, { } ).get( 'requests', 0 ) )
+
+
+def test_pages_cover_the_collection_in_order( standin ):
+    fixture, base_url = standin
+    before = vn_list_requests()
+
+    vns = list( aosUtil.iter_vn_list( 'token', base_url, 'bp-ref', page_size = 30 ) )
+
+    assert [ vn_id for vn_id, vn_data in vns ] == list( fixture[ 'virtual_networks' ] )
+    # 30 + 30 + 30 + 10
+    assert vn_list_requests() - before == 4
+
+
+def test_total_count_ends_paging( standin ):
+    fixture, base_url = standin
+    before = vn_list_requests()
+
+    vns = list( aosUtil.iter_vn_list( 'token', base_url, 'bp-ref', page_size = 50 ) )
+
+    assert len( vns ) == 100
+    # Two full pages make up the total_count, so no empty one is needed
+    assert vn_list_requests() - before == 2
+
+
+def test_pages_without_page_fields( standin ):
+    fixture, base_url = standin
+    fixture[ 'paging_fields' ] = False
+    before = vn_list_requests()
+
+    vns = list( aosUtil.iter_vn_list( 'token', base_url, 'bp-ref', page_size = 30 ) )
+
+    assert [ vn_id for vn_id, vn_data in vns ] == list( fixture[ 'virtual_networks' ] )
+    # The short fourth page ends it
+    assert vn_list_requests() - before == 4
+
+    before = vn_list_requests()
+    vns = list( aosUtil.iter_vn_list( 'token', base_url, 'bp-ref', page_size = 50 ) )
+
+    assert len( vns ) == 100
+    # Two full pages, then an empty one to find the end
+    assert vn_list_requests() - before == 3
+
+
+def test_list_collection_pages( standin ):
+    fixture, base_url = standin
+
+    systems = list( aosUtil.iter_systems_in_bp( 'token', base_url, 'bp-ref', page_size = 3 ) )
+
+    assert systems == list( fixture[ 'systems' ] )
+
+
+def test_stopping_early_stops_fetching( standin ):
+    fixture, base_url = standin
+    before = vn_list_requests()
+    vns = aosUtil.iter_vn_list( 'token', base_url, 'bp-ref', page_size = 5 )
+
+    first = list( islice( vns, 3 ) )
+    vns.close()
+
+    assert [ vn_id for vn_id, vn_data in first ] == [ 'vn-0', 'vn-1', 'vn-2' ]
+    # The first page, and at most the one being prefetched, out of 20
+    assert vn_list_requests() - before <= 2
+
+
+def test_server_that_ignores_paging( standin ):
+    fixture, base_url = standin
+    before = aosUtil.transfer_stats().get( 'blueprints/{id}/security-zones', { } ).get( 'requests', 0 )
+
+    # The zone list comes back whole, bigger than a page
+    zones = list( aosUtil.iter_collection( 'token', base_url + '/blueprints/bp-ref/security-zones', 'items',
+                                           page_size = 2 ) )
+
+    assert len( zones ) == len( fixture[ 'security_zones' ] )
+    assert aosUtil.transfer_stats()[ 'blueprints/{id}/security-zones' ][ 'requests' ] - before == 1
+
+
+def test_server_that_ignores_paging_with_a_page_sized_reply( standin ):
+    fixture, base_url = standin
+    before = aosUtil.transfer_stats().get( 'blueprints/{id}/security-zones', { } ).get( 'requests', 0 )
+
+    # Exactly a page's worth comes back every time: the repeat ends it
+    zones = list( aosUtil.iter_collection( 'token', base_url + '/blueprints/bp-ref/security-zones', 'items',
+                                           page_size = len( fixture[ 'security_zones' ] ) ) )
+
+    assert len( zones ) == len( fixture[ 'security_zones' ] )
+    assert aosUtil.transfer_stats()[ 'blueprints/{id}/security-zones' ][ 'requests' ] - before == 2
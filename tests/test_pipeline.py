@@ -0,0 +1,63 @@
+'''
+test_pipeline.py
+    Building the generators' property sets from the stand-in's reference
+    blueprint.
+'''
+
+import re
+
+from apstra_tools import apstra_pipeline as pipeline
+
+
+def rebuilt( capsys ):
+    return( re.search( r'Rebuilt (\d+) of (\d+) VRF entries', capsys.readouterr().out ).groups() )
+
+
+def test_vrf_entries_are_reused_across_runs( standin, tmp_path, capsys ):
+    fixture, base_url = standin
+    state_path = str( tmp_path / 'state.json' )
+    peering = len( [ vn for vn in fixture[ 'virtual_networks' ].values() if 'peer_to_fw' in vn[ 'tags' ] ] )
+
+    def run():
+        caches = pipeline.load_caches( state_path, 'bp-ref' )
+        results = pipeline.generate( 'token', base_url, 'bp-ref', [ 'vrf' ], caches, { 'validate': False } )
+        pipeline.save_caches( state_path, 'bp-ref', caches )
+        return( results[ 'vrf' ] )
+
+    first = run()
+    assert rebuilt( capsys ) == ( str( peering ), str( peering ) )
+
+    # Nothing changed, so every entry comes from the state file
+    assert run() == first
+    assert rebuilt( capsys ) == ( '0', str( peering ) )
+
+    # Only the VN that changed is rebuilt
+    fixture[ 'virtual_networks' ][ 'vn-0' ][ 'reserved_vlan_id' ] = 999
+    fixture[ 'blueprints' ][ 0 ][ 'version' ] += 1
+    third = run()
+    assert rebuilt( capsys ) == ( '1', str( peering ) )
+    assert [ vrf[ 'vlan_id' ] for vrf in third[ 'vrfs' ] if vrf[ 'ipv4_subnet' ] == '10.0.0.0/29' ] == [ 999 ]
+
+    # A state file for another blueprint isn't used
+    assert pipeline.load_caches( state_path, 'bp-srx' ) == { }
+
+
+def test_type5_parameters( standin ):
+    fixture, base_url = standin
+    # Only EVPN VRFs with an L3 VNI have type-5 routes
+    fixture[ 'security_zones' ][ 'sz-8' ] = { 'id': 'sz-8', 'label': 'default', 'vrf_name': 'default',
+                                              'sz_type': 'l3_fabric' }
+    fixture[ 'security_zones' ][ 'sz-9' ] = { 'id': 'sz-9', 'label': 'AVRF', 'vrf_name': 'AVRF',
+                                              'sz_type': 'evpn', 'vni_id': None }
+    fixture[ 'security_zones' ][ 'sz-3' ][ 'rt_policy' ][ 'import_RTs' ].append( '65000:3' )
+
+    type5 = pipeline.generate( 'token', base_url, 'bp-ref', [ 'type5' ], { }, { 'validate': False } )[ 'type5' ]
+
+    assert type5[ 'asn' ] == { 'border1': '65101', 'leaf1': '65101', 'border2': '65102', 'leaf2': '65102',
+                               'fw_node1': '65201', 'fw_node2': '65202' }
+    assert type5[ 'borders' ] == [ { 'tag': 'border1', 'asn': '65101', 'loopback': '10.255.0.1' },
+                                   { 'tag': 'border2', 'asn': '65102', 'loopback': '10.255.0.2' } ]
+    assert type5[ 'firewalls' ] == [ { 'tag': 'fw_node1', 'asn': '65201' }, { 'tag': 'fw_node2', 'asn': '65202' } ]
+    assert [ vrf[ 'name' ] for vrf in type5[ 'vrfs' ] ] == [ 'VRF' + str( i ) for i in range( 8 ) ]
+    assert type5[ 'vrfs' ][ 3 ] == { 'name': 'VRF3', 'l3_vni': 20003,
+                                     'import_rts': [ '20003:1', '65000:3' ], 'export_rts': [ '20003:1' ] }
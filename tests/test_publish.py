@@ -0,0 +1,86 @@
+'''
+test_publish.py
+    Publishing property sets into the stand-in's freeform blueprint.
+'''
+
+import json
+
+from apstra_tools import apstra_utils as aosUtil
+from apstra_tools import apstra_pipeline as pipeline
+from apstra_tools.apstra_journal import Journal
+
+
+def labels( fixture ):
+    return( sorted( ps[ 'label' ] for ps in fixture[ 'property_sets' ].values() ) )
+
+
+def drop_ps( fixture, label ):
+    for ps_id, ps in list( fixture[ 'property_sets' ].items() ):
+        if ps[ 'label' ] == label:
+            del fixture[ 'property_sets' ][ ps_id ]
+
+
+def vrf_results( base_url ):
+    return( pipeline.generate( 'token', base_url, 'bp-ref', [ 'vrf' ], { }, { 'validate': False } ) )
+
+
+def shard_labels( values, shard_bytes ):
+    return( [ 'peer_properties_shard_' + str( i ) for i in range( pipeline.shard_count_for( values, shard_bytes ) ) ] )
+
+
+def test_sharding_keeps_the_unsharded_set_unless_asked( standin ):
+    fixture, base_url = standin
+    results = vrf_results( base_url )
+
+    pipeline.publish( 'token', base_url, 'bp-srx', results )
+    assert labels( fixture ) == [ 'peer_properties' ]
+
+    # Look-alikes of shard labels are left alone
+    aosUtil.post_ps( 'token', base_url, 'bp-srx', { }, 'peer_properties_shard_old' )
+    pipeline.publish( 'token', base_url, 'bp-srx', results, { 'shard_bytes': 4000 } )
+
+    shards = shard_labels( results[ 'vrf' ], 4000 )
+    assert len( shards ) > 1
+    assert labels( fixture ) == sorted( [ 'peer_properties', 'peer_properties_index',
+                                          'peer_properties_shard_old' ] + shards )
+
+    pipeline.publish( 'token', base_url, 'bp-srx', results, { 'shard_bytes': 4000, 'remove_unsharded': True } )
+    assert labels( fixture ) == sorted( [ 'peer_properties_index', 'peer_properties_shard_old' ] + shards )
+
+
+def test_a_set_that_fits_is_not_sharded( standin ):
+    fixture, base_url = standin
+    results = vrf_results( base_url )
+
+    pipeline.publish( 'token', base_url, 'bp-srx', results,
+                      { 'shard_bytes': len( json.dumps( results[ 'vrf' ] ) ) + 1 } )
+
+    assert labels( fixture ) == [ 'peer_properties' ]
+
+
+def test_journal_does_not_hide_a_missing_shard( standin, tmp_path ):
+    fixture, base_url = standin
+    results = vrf_results( base_url )
+    path = str( tmp_path / 'journal' )
+
+    journal = Journal( path )
+    pipeline.publish( 'token', base_url, 'bp-srx', results, { 'shard_bytes': 4000 }, journal )
+    journal.close()
+
+    # As if the run died after the shards but before the index, and a
+    # shard has since been removed on the server
+    with open( path ) as f:
+        lines = [ line for line in f if '"ps/bp-srx/peer_properties"' not in line ]
+    with open( path, 'w' ) as f:
+        f.writelines( lines )
+    drop_ps( fixture, 'peer_properties_index' )
+    drop_ps( fixture, 'peer_properties_shard_0' )
+
+    journal = Journal( path, resume = True )
+    pipeline.publish( 'token', base_url, 'bp-srx', results, { 'shard_bytes': 4000 }, journal )
+    journal.close()
+
+    shards = shard_labels( results[ 'vrf' ], 4000 )
+    assert labels( fixture ) == sorted( [ 'peer_properties_index' ] + shards )
+    # Every shard but the missing one was skipped
+    assert journal.skipped == len( shards ) - 1
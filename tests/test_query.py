@@ -0,0 +1,77 @@
+'''
+test_query.py
+    Building graph queries, and caching their results per blueprint
+    version.
+'''
+
+from apstra_tools import apstra_utils as aosUtil
+
+
+FW_QUERY = aosUtil.graph_query( aosUtil.qe_node( 'system', name = 'fw', system_type = 'server' ),
+                                aosUtil.qe_out( 'tag' ), aosUtil.qe_node( 'tag', name = 'tag' ) )
+
+
+def test_builders():
+    assert aosUtil.qe_node( 'system', name = 'sys', role = 'leaf', deploy_mode = 'deploy' ) == \
+           "node('system', name='sys', deploy_mode='deploy', role='leaf')"
+    assert aosUtil.qe_value( "it's" ) == "'it\\'s'"
+    assert aosUtil.qe_value( 3 ) == '3'
+    assert aosUtil.qe_in() == 'in_()'
+    assert aosUtil.qe_match( 'a', 'b' ) == 'match(a, b)'
+
+
+def test_normalize_query_only_drops_whitespace_outside_quotes():
+    assert aosUtil.normalize_query( " node( 'system',\n  name = 'sys' ) " ) == "node('system',name='sys')"
+    assert aosUtil.normalize_query( "node(label='a b')" ) == "node(label='a b')"
+    assert aosUtil.normalize_query( 'node(label="a \' b")' ) == 'node(label="a \' b")'
+    # An escaped quote doesn't end the string
+    assert aosUtil.normalize_query( "node(label='it\\'s a b')" ) == "node(label='it\\'s a b')"
+
+
+def stats_since( before ):
+    after = aosUtil.query_cache_stats()
+
+    return( { key: after[ key ] - before[ key ] for key in ( 'hits', 'misses', 'evictions' ) } )
+
+
+def test_results_are_cached_per_version( standin ):
+    fixture, base_url = standin
+    before = aosUtil.query_cache_stats()
+
+    first = aosUtil.run_query( 'token', base_url, 'bp-ref', FW_QUERY, 1 )
+    # Spelled differently, but the same query
+    assert aosUtil.run_query( 'token', base_url, 'bp-ref', FW_QUERY.replace( ',', ', ' ), 1 ) is first
+    assert stats_since( before ) == { 'hits': 1, 'misses': 1, 'evictions': 0 }
+
+    # A new version of the blueprint is asked again
+    fixture[ 'firewalls' ][ 'fw-1' ][ 'asn' ] = '65299'
+    second = aosUtil.run_query( 'token', base_url, 'bp-ref', FW_QUERY, 2 )
+    assert second != first
+    assert stats_since( before ) == { 'hits': 1, 'misses': 2, 'evictions': 0 }
+
+    # The version is looked up if the caller doesn't have it
+    fixture[ 'blueprints' ][ 0 ][ 'version' ] = 2
+    assert aosUtil.run_query( 'token', base_url, 'bp-ref', FW_QUERY ) is second
+    assert stats_since( before ) == { 'hits': 2, 'misses': 2, 'evictions': 0 }
+
+    # Uncached queries are neither looked up nor counted
+    aosUtil.run_query( 'token', base_url, 'bp-ref', FW_QUERY, cache = False )
+    assert stats_since( before ) == { 'hits': 2, 'misses': 2, 'evictions': 0 }
+
+
+def test_least_recently_used_result_is_evicted( standin, monkeypatch ):
+    fixture, base_url = standin
+    monkeypatch.setattr( aosUtil, 'QUERY_CACHE_SIZE', 2 )
+    aosUtil.clear_query_cache()
+    before = aosUtil.query_cache_stats()
+
+    for version in ( 1, 2, 1, 3 ):
+        aosUtil.run_query( 'token', base_url, 'bp-ref', FW_QUERY, version )
+
+    # Version 2 went: version 1 was used after it
+    assert stats_since( before ) == { 'hits': 1, 'misses': 3, 'evictions': 1 }
+    assert aosUtil.query_cache_stats()[ 'size' ] == 2
+
+    aosUtil.run_query( 'token', base_url, 'bp-ref', FW_QUERY, 1 )
+    aosUtil.run_query( 'token', base_url, 'bp-ref', FW_QUERY, 2 )
+    assert stats_since( before ) == { 'hits': 2, 'misses': 4, 'evictions': 2 }
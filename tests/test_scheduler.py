@@ -0,0 +1,84 @@
+'''
+test_scheduler.py
+    The adaptive concurrency limit in apstra_utils, and which requests are
+    retried when the controller is busy.
+'''
+
+import pytest
+
+from apstra_tools import apstra_utils as aosUtil
+
+
+def test_collection_pages_have_their_own_class():
+    url = 'https://apstra/api/blueprints/bp-1/virtual-networks'
+
+    assert aosUtil.endpoint_class( 'GET', url, { 'page': 1, 'page_size': 500 } ) == 'collection'
+    assert aosUtil.endpoint_class( 'GET', url ) == 'default'
+    assert aosUtil.endpoint_class( 'POST', url ) == 'write'
+
+
+def test_baseline_follows_typical_latency():
+    limiter = aosUtil.AdaptiveLimiter( 8, 1, 32 )
+
+    # Mostly 100 ms, with the odd 10 ms reply
+    for latency in [ 0.1, 0.1, 0.1, 0.01 ] * 50:
+        limiter.acquire()
+        limiter.release( 'default', latency, False )
+
+    assert 0.07 < limiter.baseline[ 'default' ] < 0.1
+
+
+def test_typical_replies_dont_cut_the_limit():
+    limiter = aosUtil.AdaptiveLimiter( 8, 1, 32 )
+
+    for latency in [ 0.2, 0.05, 0.3, 0.1 ] * 50:
+        limiter.acquire()
+        limiter.release( 'collection', latency, False )
+
+    assert limiter.limit > 8
+
+
+def test_overload_halves_the_limit():
+    limiter = aosUtil.AdaptiveLimiter( 8, 1, 32 )
+    limiter.acquire()
+    limiter.release( 'default', 0.1, True )
+
+    assert limiter.limit == 4
+    assert 'default' not in limiter.baseline
+
+
+def retries_of( endpoint ):
+    return( aosUtil.scheduler_stats().get( endpoint, { } ).get( 'retries', 0 ) )
+
+
+def test_busy_get_is_retried( standin ):
+    fixture, base_url = standin
+    fixture[ 'busy_replies' ] = [ ( 503, '0' ) ]
+    before = retries_of( 'default' )
+
+    zones = aosUtil.get_sz_list( 'token', base_url, 'bp-ref' )
+
+    assert len( zones[ 'items' ] ) == len( fixture[ 'security_zones' ] )
+    assert retries_of( 'default' ) - before == 1
+
+
+def test_post_is_not_retried_on_503( standin ):
+    fixture, base_url = standin
+    fixture[ 'busy_replies' ] = [ ( 503, '0' ) ]
+    before = retries_of( 'write' )
+
+    with pytest.raises( aosUtil.TransientError ):
+        aosUtil.post_ps( 'token', base_url, 'bp-srx', { }, 'once' )
+
+    assert retries_of( 'write' ) - before == 0
+
+
+def test_post_turned_away_with_retry_after_is_retried( standin ):
+    fixture, base_url = standin
+    fixture[ 'busy_replies' ] = [ ( 429, '0' ) ]
+    before = retries_of( 'write' )
+
+    aosUtil.post_ps( 'token', base_url, 'bp-srx', { }, 'once' )
+
+    assert retries_of( 'write' ) - before == 1
+    assert [ ps[ 'label' ] for ps in fixture[ 'property_sets' ].values() ] == [ 'once' ]
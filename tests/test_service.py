@@ -0,0 +1,86 @@
+'''
+test_service.py
+    The resident worker's job API, in front of the stand-in.
+'''
+
+import json
+import urllib.error
+import urllib.request
+
+import pytest
+
+from apstra_tools import apstra_service as service
+
+
+#
+# POST body to a job endpoint and return ( HTTP status, decoded reply )
+#
+def post( service_url, kind, body ):
+    request = urllib.request.Request( service_url + '/jobs/' + kind, data = body,
+                                      headers = { 'Content-Type': 'application/json' } )
+
+    try:
+        with urllib.request.urlopen( request ) as r:
+            return( r.status, json.loads( r.read() ) )
+
+    except urllib.error.HTTPError as e:
+        return( e.code, json.loads( e.read() ) )
+
+
+@pytest.fixture
+def service_url():
+    server, base_url = service.start_service( service.Worker(), '127.0.0.1:0' )
+
+    yield( base_url )
+
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.mark.parametrize( 'kind, body', [
+    ( 'commit_check', b'[ 1, 2 ]' ),
+    ( 'commit_check', b'{ "bp": "x", "login": "not a dict" }' ),
+    ( 'commit_check', b'{ "bp": "x", "login": { "user": "admin" } }' ),
+    ( 'commit_check', b'{ "bp": 7 }' ),
+    ( 'commit_check', b'{ }' ),
+    ( 'reboot', b'{ "bp": "x" }' ),
+    ( 'set_timers', b'{ "bp": "x", "timers": { "bgp": "soon" } }' ),
+    ( 'generate', b'{ "src": "a", "dst": "b", "outputs": [ "nope" ] }' ),
+    ( 'generate', b'{ "src": "a", "dst": "b", "outputs": [ { } ] }' ),
+    ( 'generate', b'{ "src": "a", "dst": "b", "options": { "shard_bytes": "big" } }' ),
+    ( 'generate', b'{ "src": "a", "dst": "b", "options": { "validate": 1 } }' ),
+] )
+def test_malformed_jobs_are_turned_away( service_url, kind, body ):
+    status, reply = post( service_url, kind, body )
+
+    assert status == 400
+    assert reply[ 'error' ] == 'ValidationError'
+
+
+@pytest.mark.parametrize( 'option', [ 'stream_dir', 'inventory' ] )
+def test_jobs_cant_set_local_paths( service_url, option ):
+    body = json.dumps( { 'src': 'a', 'dst': 'b', 'options': { option: '/etc' } } ).encode()
+
+    status, reply = post( service_url, 'generate', body )
+
+    assert status == 400
+    assert option in reply[ 'message' ]
+
+
+def test_loopback_only():
+    assert service.is_loopback( '127.0.0.1' )
+    assert service.is_loopback( 'localhost' )
+    assert service.is_loopback( '[::1]' )
+    assert not service.is_loopback( '0.0.0.0' )
+    assert not service.is_loopback( '10.0.0.5' )
+
+    with pytest.raises( SystemExit ):
+        service.main( [ '--listen', '0.0.0.0:8765' ] )
+
+
+def test_well_formed_jobs_pass():
+    service.check_job( 'generate', { 'src': 'a', 'dst': 'b', 'outputs': [ 'vrf', 'type5' ], 'publish': False,
+                                     'options': { 'shard_bytes': 100000, 'validate': False } } )
+    service.check_job( 'set_timers', { 'bp': 'x', 'timers': { 'bgp': 33 },
+                                       'login': { 'user': 'admin', 'password': 'pw', 'target': '10.0.0.1',
+                                                  'port': '443' } } )
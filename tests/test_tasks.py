@@ -0,0 +1,83 @@
+'''
+test_tasks.py
+    Running a graph of tasks: what gets run, in what order, and what
+    happens when a task fails.
+'''
+
+import threading
+
+import pytest
+
+from apstra_tools import apstra_tasks as tasking
+
+
+def test_inputs_are_passed_in_order():
+    tasks = { 'a': ( lambda: 'a', [ ] ), 'b': ( lambda: 'b', [ ] ),
+              'ab': ( lambda a, b: a + b, [ 'a', 'b' ] ), 'ba': ( lambda b, a: b + a, [ 'b', 'a' ] ) }
+
+    assert tasking.run_tasks( tasks ) == { 'a': 'a', 'b': 'b', 'ab': 'ab', 'ba': 'ba' }
+
+
+def test_only_the_tasks_a_target_needs_are_run():
+    ran = [ ]
+
+    def task( name ):
+        def fn( *args ):
+            ran.append( name )
+            return( name )
+        return( fn )
+
+    tasks = { 'a': ( task( 'a' ), [ ] ), 'b': ( task( 'b' ), [ 'a' ] ),
+              'c': ( task( 'c' ), [ ] ), 'd': ( task( 'd' ), [ 'c' ] ) }
+
+    assert sorted( tasking.needed_tasks( tasks, [ 'b' ] ) ) == [ 'a', 'b' ]
+    assert sorted( tasking.run_tasks( tasks, [ 'b' ] ) ) == [ 'a', 'b' ]
+    assert ran == [ 'a', 'b' ]
+
+
+def test_cycles_are_found_before_anything_runs():
+    ran = [ ]
+    tasks = { 'a': ( lambda c: ran.append( 'a' ), [ 'c' ] ), 'b': ( lambda a: ran.append( 'b' ), [ 'a' ] ),
+              'c': ( lambda b: ran.append( 'c' ), [ 'b' ] ), 'd': ( lambda: ran.append( 'd' ), [ ] ) }
+
+    with pytest.raises( ValueError, match = 'a -> c -> b -> a' ):
+        tasking.run_tasks( tasks )
+
+    assert ran == [ ]
+
+
+def test_unknown_input_is_a_key_error():
+    with pytest.raises( KeyError ):
+        tasking.needed_tasks( { 'a': ( lambda x: x, [ 'x' ] ) }, [ 'a' ] )
+
+
+def test_failure_stops_dependents_and_is_raised_again():
+    ran = [ ]
+    finished = threading.Event()
+
+    def fail():
+        raise RuntimeError( 'no data' )
+
+    def slow():
+        # Still running when 'bad' fails; it's let finish
+        finished.wait( 0.2 )
+        ran.append( 'slow' )
+        finished.set()
+
+    tasks = { 'bad': ( fail, [ ] ), 'slow': ( slow, [ ] ),
+              'after': ( lambda x: ran.append( 'after' ), [ 'bad' ] ),
+              'later': ( lambda x: ran.append( 'later' ), [ 'slow' ] ) }
+
+    with pytest.raises( RuntimeError, match = 'no data' ):
+        tasking.run_tasks( tasks )
+
+    assert ran == [ 'slow' ]
+
+
+def test_timings_cover_every_task_run():
+    timings = { }
+    tasking.run_tasks( { 'a': ( lambda: 1, [ ] ), 'b': ( lambda a: a + 1, [ 'a' ] ) }, timings = timings )
+
+    assert sorted( timings ) == [ 'a', 'b' ]
+    assert timings[ 'a' ][ 1 ] <= timings[ 'b' ][ 0 ]
+    assert tasking.timing_summary( timings ).startswith( 'Ran 2 tasks in ' )
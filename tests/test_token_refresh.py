@@ -0,0 +1,91 @@
+'''
+test_token_refresh.py
+    A token that expires mid-run is replaced by logging in again, once,
+    and the refused request is replayed.
+'''
+
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from apstra_tools import apstra_utils as aosUtil
+
+
+def reauths( endpoint = 'default' ):
+    return( aosUtil.scheduler_stats().get( endpoint, { } ).get( 'reauths', 0 ) )
+
+
+def test_expired_token_is_refreshed_and_replayed( standin ):
+    fixture, base_url = standin
+    fixture[ 'check_tokens' ] = True
+    token = aosUtil.login( base_url, 'admin', 'admin' )
+    before = reauths()
+
+    # Expire every token the stand-in handed out
+    fixture[ 'tokens' ].clear()
+    zones = aosUtil.get_sz_list( token, base_url, 'bp-ref' )
+
+    assert len( zones[ 'items' ] ) == len( fixture[ 'security_zones' ] )
+    assert reauths() - before == 1
+    # Callers keep the token they had, and it maps to the new one
+    assert aosUtil.current_token( token ) in fixture[ 'tokens' ]
+    assert aosUtil.current_token( token ) != token
+
+    aosUtil.logout( token, base_url )
+
+
+def test_parallel_401s_cost_one_login( standin ):
+    fixture, base_url = standin
+    fixture[ 'check_tokens' ] = True
+    token = aosUtil.login( base_url, 'admin', 'admin' )
+    logins = fixture[ 'token_seq' ]
+
+    fixture[ 'tokens' ].clear()
+    with ThreadPoolExecutor( max_workers = 8 ) as pool:
+        versions = list( pool.map( lambda i: aosUtil.get_bp_version( token, base_url, 'bp-ref' ), range( 16 ) ) )
+
+    assert versions == [ 1 ] * 16
+    assert fixture[ 'token_seq' ] == logins + 1
+
+    aosUtil.logout( token, base_url )
+
+
+def test_unknown_token_is_not_refreshed( standin ):
+    fixture, base_url = standin
+    fixture[ 'check_tokens' ] = True
+
+    with pytest.raises( aosUtil.AuthError ) as e:
+        aosUtil.get_sz_list( 'made-up-token', base_url, 'bp-ref' )
+
+    assert e.value.status == 401
+
+
+def test_failed_relogin_keeps_the_credentials( standin, monkeypatch ):
+    fixture, base_url = standin
+    fixture[ 'check_tokens' ] = True
+    token = aosUtil.login( base_url, 'admin', 'admin' )
+    request_token = aosUtil.request_token
+    attempts = [ ]
+
+    # The first login after the token expires hits a blip
+    def flaky_request_token( url, user, password ):
+        attempts.append( user )
+
+        if len( attempts ) == 1:
+            raise aosUtil.TransientError( 'Login failed, got HTTP 503 error.', 503 )
+
+        return( request_token( url, user, password ) )
+
+    monkeypatch.setattr( aosUtil, 'request_token', flaky_request_token )
+    fixture[ 'tokens' ].clear()
+
+    with pytest.raises( aosUtil.TransientError ):
+        aosUtil.get_sz_list( token, base_url, 'bp-ref' )
+
+    # The next 401 logs in again with the same credentials
+    zones = aosUtil.get_sz_list( token, base_url, 'bp-ref' )
+
+    assert len( zones[ 'items' ] ) == len( fixture[ 'security_zones' ] )
+    assert attempts == [ 'admin', 'admin' ]
+
+    aosUtil.logout( token, base_url )
@@ -0,0 +1,67 @@
+'''
+test_validate.py
+    The peering address checks in apstra_validate.
+'''
+
+import pytest
+
+from apstra_tools.apstra_validate import check_vrf_entries
+
+pytest.importorskip( 'numpy' )
+
+
+def entry( name, vlan, subnet, leaves = ( ), fws = ( ) ):
+    return( { 'name': name, 'vlan_id': vlan, 'ipv4_subnet': subnet,
+              'leaves': [ { 'tag': tag, 'ip4': ip4 } for tag, ip4 in leaves ],
+              'firewalls': [ { 'tag': tag, 'ip4': ip4 } for tag, ip4 in fws ] } )
+
+
+def test_clean_entries_pass():
+    assert check_vrf_entries( [ entry( 'blue', 10, '10.0.0.0/29', [ ( 'border1', '10.0.0.2' ) ],
+                                       [ ( 'fw_node1', '10.0.0.4' ) ] ),
+                                entry( 'red', 11, '10.0.0.8/29', [ ( 'border1', '10.0.0.10' ) ],
+                                       [ ( 'fw_node1', '10.0.0.12' ) ] ) ] ) == [ ]
+
+
+def test_empty_input():
+    assert check_vrf_entries( [ ] ) == [ ]
+
+
+def test_address_outside_its_subnet():
+    violations = check_vrf_entries( [ entry( 'blue', 10, '10.0.0.0/29', [ ( 'border1', '10.0.0.9' ) ] ) ] )
+
+    assert violations == [ 'VRF blue vlan 10 (10.0.0.0/29): border1 address 10.0.0.9 is outside the subnet' ]
+
+
+def test_duplicate_peer_in_a_vrf():
+    violations = check_vrf_entries( [ entry( 'blue', 10, '10.0.0.0/29', [ ( 'border1', '10.0.0.2' ) ],
+                                             [ ( 'fw_node1', '10.0.0.2' ) ] ) ] )
+
+    assert violations == [ 'VRF blue: address 10.0.0.2 is used 2 times (border1 on vlan 10, fw_node1 on vlan 10)' ]
+
+
+def test_same_address_in_two_vrfs_is_fine():
+    assert check_vrf_entries( [ entry( 'blue', 10, '10.0.0.0/29', [ ( 'border1', '10.0.0.2' ) ] ),
+                                entry( 'red', 11, '10.0.0.0/29', [ ( 'border1', '10.0.0.2' ) ] ) ] ) == [ ]
+
+
+def test_overlap_across_vrfs_on_a_shared_firewall():
+    violations = check_vrf_entries( [ entry( 'blue', 10, '10.0.0.0/28', fws = [ ( 'fw_node1', '10.0.0.4' ) ] ),
+                                      entry( 'red', 11, '10.0.0.8/29', fws = [ ( 'fw_node1', '10.0.0.12' ) ] ),
+                                      entry( 'green', 12, '10.0.0.8/29', fws = [ ( 'fw_node2', '10.0.0.12' ) ] ) ] )
+
+    assert violations == [ 'fw_node1: VRF blue vlan 10 (10.0.0.0/28) overlaps VRF red vlan 11 (10.0.0.8/29)' ]
+
+
+@pytest.mark.parametrize( 'subnet, peer, problem', [
+    ( '10.0.0.0/29', 'fe80::1', 'VRF blue vlan 10: border1 address fe80::1 is not an IPv4 address' ),
+    ( '10.0.0.0/29', '10.0.0', 'VRF blue vlan 10: border1 address 10.0.0 is not an IPv4 address' ),
+    ( 'fe80::/64', '10.0.0.2', 'VRF blue vlan 10: subnet fe80::/64 is not an IPv4 prefix' ),
+    ( '10.0.0.0/33', '10.0.0.2', 'VRF blue vlan 10: subnet 10.0.0.0/33 is not an IPv4 prefix' ),
+] )
+def test_bad_addresses_are_violations( subnet, peer, problem ):
+    violations = check_vrf_entries( [ entry( 'blue', 10, subnet, [ ( 'border1', peer ) ] ),
+                                      entry( 'red', 11, '10.0.0.8/29', [ ( 'border1', '10.0.0.20' ) ] ) ] )
+
+    # The rest of the set is still checked
+    assert violations == [ problem, 'VRF red vlan 11 (10.0.0.8/29): border1 address 10.0.0.20 is outside the subnet' ]